@@ -0,0 +1,387 @@
+"""
+Analysis of the hand histories written by HandHistory. Works out, for a directory of logs:
+    how often hands go to a showdown
+    how big the pots are, in big blinds
+    which hand types win
+    how many big blinds AIs win per hand, by how cocky they are (in bands of BAND_WIDTH)
+and, if a player is given, how that player did.
+
+The logs are memory mapped and each hand is decoded and added to running totals one at a time, so the logs never
+have to fit in memory. Each file is done by a separate process, and the totals of the files are added up at the end.
+
+Each log file gets an index file next to it (the log's path with .idx added), so the hands of one player, or the hands
+won with one hand type, can be found without reading the whole log. An index is made the first time a log is
+analysed, and made again if the log has grown since.
+
+Index file format (all little endian):
+    header: 4 bytes b"PKHI", uint16 format version, 2 bytes unused, uint64 size of the log when it was indexed,
+        uint32 hand count, uint32 key count
+    offsets: uint32 offset of each record in the log, hand count of them
+    keys: for each key, uint8 kind (PLAYER or HAND_TYPE), uint8 name length, uint32 first posting, uint32 posting
+        count, name in UTF-8
+    postings: uint32 hand numbers (indexes into the offsets). The postings of each key are together, in hand order
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from math import floor, log2, sqrt
+
+import HandHistory
+import House
+
+INDEX_MAGIC = b"PKHI"
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct("<4sHxxQII")
+KEY = struct.Struct("<BBII")
+PLAYER, HAND_TYPE = 0, 1
+INDEX_SUFFIX = ".idx"
+
+BAND_WIDTH = 0.05  # Width of each band of AI cockyness
+POT_BUCKETS = 16  # Pot size buckets, each twice as wide as the last. Bucket i is pots below 2 ** i big blinds
+HAND_TYPES = House.Hand().hand_types
+
+
+def _uint32s(data):
+    """Returns an array of the little endian uint32s in data"""
+    values = array("I", bytes(data))
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+class HandIndex:
+    """A memory mapped index of one hand history file"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)  # Raises ValueError if path is empty
+        try:
+            self._read_keys()
+        except struct.error:
+            self.close()
+            raise ValueError(f"{path} is a truncated hand history index")
+        except ValueError:
+            self.close()
+            raise
+
+    def _read_keys(self):
+        magic, version, self.log_size, self.hand_count, key_count = INDEX_HEADER.unpack_from(self._map, 0)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION:
+            raise ValueError(f"{self.path} is not a version {INDEX_VERSION} hand history index")
+
+        self._offsets_start = INDEX_HEADER.size
+        offset = self._offsets_start + 4 * self.hand_count
+        self._keys = {}  # (kind, name): (first posting, posting count)
+        for _ in range(key_count):
+            kind, length, first, count = KEY.unpack_from(self._map, offset)
+            offset += KEY.size
+            name = self._map[offset: offset + length].decode(errors="replace")
+            offset += length
+            self._keys[kind, name] = (first, count)
+        self._postings_start = offset
+
+        posting_count = max((first + count for first, count in self._keys.values()), default=0)
+        if self._postings_start + 4 * posting_count > len(self._map):
+            raise ValueError(f"{self.path} is a truncated hand history index")
+
+    def close(self):
+        self._map.close()
+
+    def offsets(self):
+        """Returns the offset in the log of every record"""
+        return _uint32s(self._map[self._offsets_start: self._offsets_start + 4 * self.hand_count])
+
+    def names(self, kind):
+        """Returns the names of the keys of a kind, such as every player in the log"""
+        return [name for key_kind, name in self._keys if key_kind == kind]
+
+    def hands(self, kind, name):
+        """Returns the hand numbers of a key, such as the hands played by a player"""
+        first, count = self._keys.get((kind, name), (0, 0))
+        start = self._postings_start + 4 * first
+        return _uint32s(self._map[start: start + 4 * count])
+
+
+def index_path(log_path):
+    return log_path + INDEX_SUFFIX
+
+
+def too_short(log_path):
+    """
+    Returns True, and warns, if a log is too short to have a header, such as one the writer made but never wrote to.
+    These are skipped instead of being read
+    """
+    if os.path.getsize(log_path) >= HandHistory.HEADER.size:
+        return False
+    print(f"Skipping {log_path}: too short to be a hand history file", file=sys.stderr)
+    return True
+
+
+def build_index(log_path, each=None):
+    """Reads a log and writes its index file, replacing any old one. each, if given, is called with every hand read"""
+    if os.path.getsize(log_path) < HandHistory.HEADER.size:
+        raise ValueError(f"{log_path} is too short to be a hand history file")
+
+    with open(log_path, "rb") as file:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        HandHistory.check_header(data, log_path)
+        offsets = array("I")
+        postings = {}  # (kind, name): list of hand numbers
+        for number, offset in enumerate(HandHistory.record_offsets(data)):
+            offsets.append(offset)
+            hand = HandHistory.decode(data, offset)
+            if each is not None:
+                each(hand)
+            for player in hand["players"]:
+                postings.setdefault((PLAYER, player["name"]), []).append(number)
+            postings.setdefault((HAND_TYPE, hand["hand_type"]), []).append(number)
+        log_size = len(data)
+    finally:
+        data.close()
+
+    keys = bytearray()
+    all_postings = array("I")
+    for (kind, name), numbers in sorted(postings.items()):
+        encoded = name.encode()[:255]
+        keys += KEY.pack(kind, len(encoded), len(all_postings), len(numbers)) + encoded
+        all_postings.extend(numbers)
+
+    if sys.byteorder == "big":
+        offsets.byteswap()
+        all_postings.byteswap()
+
+    temporary = index_path(log_path) + ".tmp"
+    with open(temporary, "wb") as file:
+        file.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, log_size, len(offsets), len(postings)))
+        file.write(offsets.tobytes())
+        file.write(keys)
+        file.write(all_postings.tobytes())
+    os.replace(temporary, index_path(log_path))  # So a half written index is never read
+
+
+def _current_index(log_path):
+    """Returns the HandIndex of a log, or None if it is missing, broken or the log has grown since it was made"""
+    path = index_path(log_path)
+    if not os.path.exists(path):
+        return None
+    try:
+        index = HandIndex(path)
+    except (ValueError, struct.error):
+        return None
+    if index.log_size != os.path.getsize(log_path):
+        index.close()
+        return None
+    return index
+
+
+def open_index(log_path):
+    """Returns the HandIndex of a log, making it first if it is missing or out of date"""
+    index = _current_index(log_path)
+    if index is None:
+        build_index(log_path)
+        index = HandIndex(index_path(log_path))
+    return index
+
+
+def new_totals():
+    """Returns empty totals, which file_stats adds to and merge adds together"""
+    return {"hands": 0, "showdowns": 0, "pot_buckets": [0] * POT_BUCKETS, "pot_sum": 0.0,
+            "hand_types": {name: 0 for name in HAND_TYPES},
+            "bands": {},  # band number: {"hands", "wins", "sum", "sum_sq"} of big blinds won per hand
+            "player": {"hands": 0, "wins": 0, "showdowns": 0, "showdowns_won": 0, "sum": 0.0, "sum_sq": 0.0}}
+
+
+def add_hand(totals, hand, player=None):
+    """Adds one decoded hand to totals. player is the name of a player to keep totals for"""
+    big_blind = hand["min_bet"] or 1
+    went_to_showdown = len(hand["showdown"]) > 1
+    totals["hands"] += 1
+    totals["showdowns"] += went_to_showdown
+    totals["hand_types"][hand["hand_type"]] += 1
+
+    pot = hand["pot"] / big_blind
+    totals["pot_sum"] += pot
+    bucket = 0 if pot < 1 else int(log2(pot)) + 1
+    totals["pot_buckets"][min(bucket, POT_BUCKETS - 1)] += 1
+
+    for seat, seated in enumerate(hand["players"]):
+        won = (seated["end_money"] - seated["money"]) / big_blind
+        if seated["ai"]:
+            band = totals["bands"].setdefault(floor(seated["cockyness"] / BAND_WIDTH),
+                                              {"hands": 0, "wins": 0, "sum": 0.0, "sum_sq": 0.0})
+            band["hands"] += 1
+            band["wins"] += seat in hand["winners"]
+            band["sum"] += won
+            band["sum_sq"] += won * won
+
+        if seated["name"] == player:
+            stats = totals["player"]
+            stats["hands"] += 1
+            stats["wins"] += seat in hand["winners"]
+            stats["showdowns"] += went_to_showdown and seat in hand["showdown"]
+            stats["showdowns_won"] += went_to_showdown and seat in hand["winners"]
+            stats["sum"] += won
+            stats["sum_sq"] += won * won
+
+
+def read_hands(log_path, player=None, hand_type=None):
+    """
+    Yields the decoded hands of one log. If player or hand_type is given, only the hands with that player in, or won
+    with that hand type, are read, using the index
+    """
+    if too_short(log_path):
+        return
+    index = open_index(log_path)
+    try:
+        if player is not None and hand_type is not None:
+            numbers = sorted(set(index.hands(PLAYER, player)) & set(index.hands(HAND_TYPE, hand_type)))
+        elif player is not None:
+            numbers = index.hands(PLAYER, player)
+        elif hand_type is not None:
+            numbers = index.hands(HAND_TYPE, hand_type)
+        else:
+            numbers = range(index.hand_count)
+        offsets = index.offsets()
+    finally:
+        index.close()
+
+    with open(log_path, "rb") as file:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        for number in numbers:
+            yield HandHistory.decode(data, offsets[number])
+    finally:
+        data.close()
+
+
+def file_stats(log_path, player=None, hand_type=None):
+    """Returns the totals of the hands of one log that read_hands picks"""
+    totals = new_totals()
+    if too_short(log_path):
+        return totals
+    if player is None and hand_type is None:
+        index = _current_index(log_path)
+        if index is None:  # Every hand has to be read anyway, so the index is made in the same pass
+            build_index(log_path, lambda hand: add_hand(totals, hand))
+            return totals
+        index.close()
+
+    for hand in read_hands(log_path, player, hand_type):
+        add_hand(totals, hand, player)
+    return totals
+
+
+def merge(totals, other):
+    """Adds the totals other into totals"""
+    for key in ("hands", "showdowns", "pot_sum"):
+        totals[key] += other[key]
+    totals["pot_buckets"] = [a + b for a, b in zip(totals["pot_buckets"], other["pot_buckets"])]
+    for name, count in other["hand_types"].items():
+        totals["hand_types"][name] += count
+    for band, stats in other["bands"].items():
+        total = totals["bands"].setdefault(band, {"hands": 0, "wins": 0, "sum": 0.0, "sum_sq": 0.0})
+        for key in total:
+            total[key] += stats[key]
+    for key in totals["player"]:
+        totals["player"][key] += other["player"][key]
+
+
+def mean_interval(stats):
+    """Returns (mean big blinds won per hand, half width of its 95% confidence interval), as in Arena.summarise"""
+    n = stats["hands"]
+    if n == 0:
+        return 0.0, 0.0
+    mean = stats["sum"] / n
+    variance = max(stats["sum_sq"] / n - mean * mean, 0) * n / max(n - 1, 1)
+    return mean, 1.96 * sqrt(variance / n)
+
+
+def analyse(paths, player=None, hand_type=None, workers=None):
+    """Returns the totals of many logs, each worked out in its own process"""
+    totals = new_totals()
+    if len(paths) <= 1 or workers == 1:
+        for path in paths:
+            merge(totals, file_stats(path, player, hand_type))
+        return totals
+
+    with ProcessPoolExecutor(workers) as pool:
+        for stats in pool.map(file_stats, paths, [player] * len(paths), [hand_type] * len(paths)):
+            merge(totals, stats)
+    return totals
+
+
+def print_report(totals, player=None):
+    hands = totals["hands"]
+    print(f"Hands: {hands}")
+    if not hands:
+        return
+
+    print(f"Went to showdown: {totals['showdowns'] / hands:.1%}")
+    print(f"Mean pot: {totals['pot_sum'] / hands:.1f} big blinds")
+    print("\nPot size (big blinds)")
+    most = max(totals["pot_buckets"])
+    for bucket, count in enumerate(totals["pot_buckets"]):
+        if count:
+            print(f"    < {2 ** bucket:<6} {count:>8} {'#' * max(1, 40 * count // most)}")
+
+    print("\nWinning hand types")
+    for name in HAND_TYPES:
+        if totals["hand_types"][name]:
+            print(f"    {name:<10} {totals['hand_types'][name] / hands:7.2%}")
+
+    print("\nAI cockyness      hands   win rate   big blinds per hand")
+    for band in sorted(totals["bands"]):
+        stats = totals["bands"][band]
+        mean, interval = mean_interval(stats)
+        print(f"    {band * BAND_WIDTH:+.2f} to {(band + 1) * BAND_WIDTH:+.2f} {stats['hands']:>8} "
+              f"{stats['wins'] / stats['hands']:9.1%}   {mean:+.3f} ± {interval:.3f}")
+
+    if player is not None:
+        stats = totals["player"]
+        mean, interval = mean_interval(stats)
+        print(f"\n{player}: {stats['hands']} hands, won {stats['wins']}, went to showdown {stats['showdowns']} times "
+              f"and won {stats['showdowns_won']} of them, {mean:+.3f} ± {interval:.3f} big blinds per hand")
+
+
+def describe(hand):
+    """Returns a hand from HandHistory.decode as text, with the cards shown as faces"""
+    def faces(ids):
+        return " ".join(House.CARDS[i].face for i in ids)
+
+    lines = [f"Big blind ${hand['min_bet']}, board {faces(hand['board'])}"]
+    for player in hand["players"]:
+        lines.append(f"    {player['name']}: {faces(player['hole'])}, ${player['money']} -> ${player['end_money']}")
+    for street, actions in zip(HandHistory.STREETS, hand["streets"]):
+        for seat, action, amount in actions:
+            name = hand["players"][seat]["name"]
+            lines.append(f"    {street}: {name} " + (f"bets ${amount}" if action == "B" else
+                                                    "folds" if action == "F" else "quits"))
+    winners = ", ".join(hand["players"][seat]["name"] for seat in hand["winners"])
+    lines.append(f"    {winners} won ${hand['pot']} with a {hand['hand_type']}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyses the hand histories in a directory")
+    parser.add_argument("directory", help="directory of hand history files (see House.py --history)")
+    parser.add_argument("--player", help="only hands with this player in, and their results")
+    parser.add_argument("--hand-type", choices=HAND_TYPES, help="only hands won with this hand type")
+    parser.add_argument("--prefix", default="hands", help="file name prefix of the logs")
+    parser.add_argument("--workers", type=int, default=None, help="processes to use, default: CPU count")
+    parser.add_argument("--show", type=int, default=0, metavar="N", help="also print the first N hands")
+    args = parser.parse_args()
+
+    files = [log for log in HandHistory.log_files(args.directory, args.prefix) if not too_short(log)]
+    print_report(analyse(files, args.player, args.hand_type, args.workers), args.player)
+
+    hands = (hand for log in files for hand in read_hands(log, args.player, args.hand_type))
+    for hand in islice(hands, args.show):
+        print()
+        print(describe(hand))
@@ -0,0 +1,232 @@
+"""
+Self-play arena for tuning the AI. Plays many headless tables at once in a pool of processes, with each table seating
+AIs that use different parameters ("variants"), and works out how many big blinds each variant wins per hand.
+
+A variant is a name and a dict of AI attributes to change, for example
+    {"tight": {"fold_threshold": 1.0}, "bluffer": {"bluff_chance": 0.3, "cockyness": 0.5}}
+Any attribute of AI can be set, such as cockyness, fold_threshold, bluff_chance, conf_exponent, value_exponent and
+sim_time. The AIs are normal AIs, so unless a variant or --sim-time changes it they decide just like at a real table.
+
+Each finished table is written to the results file as one line of JSON, so a long run can be stopped and started
+again, and only the tables that aren't in the file yet are played. The first line of the file is the settings of the
+run ({"config": {...}}: the variants, hands per table, seats and sim time), and a run with different settings refuses
+to add to it, as its tables couldn't be compared.
+"""
+import argparse
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from math import sqrt
+
+import Equity
+import House
+
+DEFAULT_VARIANTS = {
+    "default": {},
+    "tight": {"fold_threshold": 1.0},
+    "loose": {"fold_threshold": 0.6},
+    "bluffer": {"bluff_chance": 0.3},
+}
+DEFAULT_SIM_TIME = None  # Seconds each AI decision may simulate for, or None to keep the AI's own sim_time
+
+
+class VariantFactory:
+    """
+    Makes the AIs for a table. Used as Table.ai_factory, so when an AI goes bankrupt it is replaced by another AI of
+    the same variant
+    """
+
+    def __init__(self, variants, seating, sim_time=DEFAULT_SIM_TIME):
+        self.variants = variants
+        self.seating = seating  # List of variant names, one for each seat
+        self.sim_time = sim_time
+        self.seated = []  # Variant names of the AIs made so far that are still playing
+
+    def __call__(self, min_bet, current_names):
+        # Picks the first seat whose variant has fewer AIs playing than it should
+        for name in self.seating:
+            if self.seated.count(name) < self.seating.count(name):
+                break
+
+        ai = House.AI(min_bet, current_names)
+        if self.sim_time is not None:
+            ai.sim_time = self.sim_time
+        for attribute, value in self.variants[name].items():
+            if not hasattr(ai, attribute):  # A misspelt attribute would otherwise be set and never used
+                raise AttributeError(f"Variant {name!r} sets {attribute!r}, which AI doesn't have")
+            setattr(ai, attribute, value)
+        ai.variant = name
+        self.seated.append(name)
+        return ai
+
+    def remove(self, ai):
+        """Called when an AI leaves the table, so it gets replaced by the same variant"""
+        self.seated.remove(ai.variant)
+
+
+def play_table(job, variants, seating, hands, sim_time=DEFAULT_SIM_TIME):
+    """
+    Plays hands hands on one headless table. Returns a dict of the job number and, for each variant, the number of
+    hands played and the sum of the big blinds won per hand
+    """
+    random.seed(job)
+    Equity.seed_simulations(job)
+    factory = VariantFactory(variants, seating, sim_time)
+    table = House.Table(create_socket=False, headless=True)
+    table.ai_factory = factory
+
+    results = {name: {"hands": 0, "sum": 0.0} for name in variants}
+    before = {}  # Money of each player at the start of the hand, and the big blind then
+    big_blind = table.min_bet
+
+    def count_hand(_):
+        nonlocal before, big_blind
+        # AIs that joined at the start of this hand aren't in before, so they start counting from the next one
+        for player in before:
+            result = results[player.variant]
+            result["hands"] += 1
+            result["sum"] += (player.money - before[player]) / big_blind
+
+        for player in before:
+            if player not in table.player_list:
+                factory.remove(player)
+
+        before = {p: p.money for p in table.player_list + table.players_to_add}
+        big_blind = table.min_bet
+
+    table.play_headless(hands, ai_count=len(seating), after_hand=count_hand)
+    return {"job": job, "seating": seating, "results": results}
+
+
+def read_results(path):
+    """
+    Returns (settings of the run, list of table results) from the results file. The settings are None if the file
+    doesn't exist or has no settings line
+    """
+    if not os.path.exists(path):
+        return None, []
+
+    config = None
+    done = []
+    with open(path) as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:  # A line cut off when a run was stopped
+                continue
+            if "config" in result:
+                config = result["config"]
+            else:
+                done.append(result)
+    return config, done
+
+
+def cut_torn_line(path):
+    """Removes a last line cut off when a run was stopped, so the next result starts on a line of its own"""
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
+
+
+def summarise(done):
+    """
+    Adds up the table results. Returns a dict of variant name to (hands, mean big blinds won per hand, half width of
+    the 95% confidence interval of the mean).
+    The hands on one table aren't independent, as the same AIs play with the same stacks, so the interval comes from
+    how much each table's mean differs from the overall mean. It is infinite with only one table
+    """
+    tables = {}
+    for table in done:
+        for name, result in table["results"].items():
+            if result["hands"]:
+                tables.setdefault(name, []).append((result["hands"], result["sum"]))
+
+    summary = {}
+    for name, results in tables.items():
+        n = sum(hands for hands, _ in results)
+        mean = sum(won for _, won in results) / n
+        k = len(results)
+        if k < 2:
+            summary[name] = (n, mean, float("inf"))
+            continue
+        # Each table weighted by its hands, so this is the variance of the mean over all the hands
+        variance = sum((won - mean * hands) ** 2 for hands, won in results) * k / (k - 1) / (n * n)
+        summary[name] = (n, mean, 1.96 * sqrt(variance))
+    return summary
+
+
+def run(variants=None, tables=40, hands=200, seats=3, workers=None, path="arena_results.jsonl",
+        sim_time=DEFAULT_SIM_TIME):
+    """
+    Plays tables headless tables of hands hands each over a pool of worker processes, and appends each result to path
+    as it finishes. Tables already in path are skipped. Returns the summary from summarise
+    """
+    if variants is None:
+        variants = DEFAULT_VARIANTS
+    names = sorted(variants)
+    for name in names:  # Makes an AI of each variant, so a misspelt attribute is found before anything is played
+        VariantFactory(variants, [name], sim_time)(10, [])
+    config = json.loads(json.dumps({"variants": variants, "hands": hands, "seats": seats, "sim_time": sim_time}))
+
+    old_config, done = read_results(path)
+    if old_config is None and done:
+        raise ValueError(f"{path} has results but no settings line, so it can't be added to")
+    if old_config is not None and old_config != config:
+        raise ValueError(f"{path} has results from a run with different settings: {old_config}")
+
+    if os.path.exists(path):
+        cut_torn_line(path)
+    if old_config is None:
+        with open(path, "w") as f:
+            f.write(json.dumps({"config": config}) + "\n")
+    done_jobs = set(table["job"] for table in done)
+
+    # Rotates which variants sit where, so every variant gets every seat
+    jobs = [(job, [names[(job + seat) % len(names)] for seat in range(seats)])
+            for job in range(tables) if job not in done_jobs]
+    print(f"{len(done_jobs)} tables already played, {len(jobs)} to play")
+
+    pool = ProcessPoolExecutor(workers)
+    try:
+        futures = [pool.submit(play_table, job, variants, seating, hands, sim_time) for job, seating in jobs]
+        with open(path, "a") as f:
+            for future in as_completed(futures):
+                table = future.result()
+                f.write(json.dumps(table) + "\n")
+                f.flush()
+                done.append(table)
+                print(f"Table {table['job']} done ({len(done)}/{tables})")
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+    return summarise(done)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plays AI variants against each other on headless tables")
+    parser.add_argument("variants", nargs="?", help="JSON file of {variant name: {AI attribute: value}}")
+    parser.add_argument("--tables", type=int, default=40)
+    parser.add_argument("--hands", type=int, default=200, help="hands played on each table")
+    parser.add_argument("--seats", type=int, default=3, help="AIs on each table")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, defaults to the CPU count")
+    parser.add_argument("--sim-time", type=float, default=DEFAULT_SIM_TIME,
+                        help="most seconds per AI decision. Lower is faster, but plays less like a normal AI")
+    parser.add_argument("--out", default="arena_results.jsonl", help="results file, appended to as tables finish")
+    args = parser.parse_args()
+
+    chosen_variants = None
+    if args.variants:
+        with open(args.variants) as variants_file:
+            chosen_variants = json.load(variants_file)
+
+    try:
+        final = run(chosen_variants, args.tables, args.hands, args.seats, args.workers, args.out, args.sim_time)
+    except ValueError as e:
+        parser.exit(1, f"{e}\nUse another --out file for these settings\n")
+    except AttributeError as e:
+        parser.exit(1, f"{e}\n")
+    print()
+    for variant, (n, ev, interval) in sorted(final.items(), key=lambda item: -item[1][1]):
+        print(f"{variant:>12}: {ev:+.3f} ± {interval:.3f} big blinds per hand over {n} hands")
@@ -0,0 +1,264 @@
+"""
+Benchmarks for the speed of the poker engine. Run this file to measure:
+    hand evaluations per second for 5, 6 and 7 card hands (Evaluator.evaluate and Hand.best)
+    showdowns per second (Table.best_player)
+    simulated runouts per second against 1 to 8 opponents (Equity.simulate)
+    boards per second of a preflop range against every hand (Range.equity)
+    AI decisions per second (AI.ask_bet)
+    headless hands per second (Table.play_headless)
+
+Every benchmark uses fixed seeds and is run a number of times, and the 10th, 50th and 90th percentiles of the
+results are reported. Results can be saved as a JSON baseline, and a later run can be compared against it, which
+reports every benchmark whose median got slower by more than the tolerance.
+"""
+import argparse
+import json
+import random
+import sys
+from time import perf_counter
+
+import Equity
+import EquityCache
+import Evaluator
+import House
+import Range
+import Timing
+
+REPEATS = 5
+
+
+def percentiles(values):
+    """Returns a dict of the 10th, 50th and 90th percentiles of a list of values"""
+    values = sorted(values)
+
+    def at(fraction):
+        return values[min(int(fraction * len(values)), len(values) - 1)]
+
+    return {"p10": at(0.1), "p50": at(0.5), "p90": at(0.9)}
+
+
+def _random_hands(size, count, seed):
+    rng = random.Random(seed)
+    return [rng.sample(range(52), size) for _ in range(count)]
+
+
+def bench_evaluate(size, count=20000):
+    """Evaluator.evaluate calls per second on hands of size cards"""
+    hands = _random_hands(size, count, size)
+    rates = []
+    for _ in range(REPEATS):
+        start = perf_counter()
+        for hand in hands:
+            Evaluator.evaluate(hand)
+        rates.append(count / (perf_counter() - start))
+    return rates
+
+
+def bench_best(size, count=2000):
+    """Hand.best calls per second on hands of size cards"""
+    hands = [House.Hand([House.CARDS[c] for c in ids[:2]], [House.CARDS[c] for c in ids[2:]])
+             for ids in _random_hands(size, count, size)]
+    rates = []
+    for _ in range(REPEATS):
+        start = perf_counter()
+        for hand in hands:
+            hand.best()
+        rates.append(count / (perf_counter() - start))
+    return rates
+
+
+def bench_showdown(players=4, count=1000):
+    """Table.best_player calls per second at a showdown on the river between players players"""
+    rng = random.Random(players)
+    showdowns = []
+    for _ in range(count):
+        deck = rng.sample(range(52), 5 + 2 * players)
+        board = [House.CARDS[c] for c in deck[:5]]
+        showdown = []
+        for i in range(players):
+            player = House.Player(str(i))
+            player.give_hole([House.CARDS[deck[5 + 2 * i]], House.CARDS[deck[6 + 2 * i]]])
+            player.add_flop(board)
+            showdown.append(player)
+        showdowns.append(showdown)
+
+    rates = []
+    for _ in range(REPEATS):
+        start = perf_counter()
+        for showdown in showdowns:
+            House.Table.best_player(showdown)
+        rates.append(count / (perf_counter() - start))
+    return rates
+
+
+def bench_sim(opponents, sim_time=0.2):
+    """Simulated runouts per second from the flop against a number of opponents"""
+    hole = [House.Card("AH").id, House.Card("KH").id]
+    board = [House.Card(face).id for face in ["2H", "7C", "9D"]]
+    rates = []
+    for repeat in range(REPEATS):
+        start = perf_counter()
+        count = Equity.simulate(hole, board, opponents, min_sims=0, min_time=sim_time, seed=repeat, exact=False)[2]
+        rates.append(count / (perf_counter() - start))
+    return rates
+
+
+def bench_range(samples=200):
+    """Boards per second checked by Range.equity, for a wide preflop range against every hand"""
+    mine = Range.parse("22+, A2s+, K9s+, QTs+, JTs, ATo+, KJo+")
+    theirs = Range.parse("any")
+    rates = []
+    for repeat in range(REPEATS):
+        start = perf_counter()
+        boards = Range.equity(mine, theirs, samples=samples, seed=repeat)[2]
+        rates.append(boards / (perf_counter() - start))
+    return rates
+
+
+def _decision_spot(rng):
+    """Sets up 3 AIs at a random point in a hand, and returns the AI to make the next bet"""
+    ais = []
+    for _ in range(3):
+        ais.append(House.AI(10, [ai.name for ai in ais]))
+    for ai in ais:
+        ai.headless = True
+        ai.begin_round(ais)
+        ai.start_round([other for other in ais if other is not ai])
+
+    deck = list(range(52))
+    rng.shuffle(deck)
+    board = [House.CARDS[c] for c in deck[6: 6 + rng.choice([0, 3, 4, 5])]]
+    for i, ai in enumerate(ais):
+        ai.give_hole([House.CARDS[deck[2 * i]], House.CARDS[deck[2 * i + 1]]])
+        ai.add_flop(board)
+    return ais[0]
+
+
+def bench_decisions(count=20):
+    """AI.ask_bet calls per second, with the equity cache cleared first. Also returns each decision's latency"""
+    rates = []
+    latencies = []
+    for repeat in range(REPEATS):
+        random.seed(repeat)
+        rng = random.Random(repeat)
+        spots = [_decision_spot(rng) for _ in range(count)]
+        EquityCache.CACHE.clear()
+
+        start = perf_counter()
+        for ai in spots:
+            decision_start = perf_counter()
+            ai.ask_bet(10)
+            latencies.append(perf_counter() - decision_start)
+        rates.append(count / (perf_counter() - start))
+    return rates, latencies
+
+
+def bench_hands(count=20):
+    """Headless hands per second between 3 AIs. Also returns each hand's latency"""
+    rates = []
+    latencies = []
+    for repeat in range(REPEATS):
+        random.seed(repeat)
+        EquityCache.CACHE.clear()
+        table = House.Table(create_socket=False, headless=True)
+
+        def hand_done(_):
+            nonlocal hand_start
+            latencies.append(perf_counter() - hand_start)
+            hand_start = perf_counter()
+
+        start = hand_start = perf_counter()
+        table.play_headless(count, after_hand=hand_done)
+        rates.append(count / (perf_counter() - start))
+    return rates, latencies
+
+
+def run_all(quick=False):
+    """Runs every benchmark. Returns a dict of benchmark name to percentiles. quick runs smaller benchmarks"""
+    scale = 10 if quick else 1
+    results = {}
+
+    for size in (5, 6, 7):
+        results[f"evaluate_{size}_per_s"] = percentiles(bench_evaluate(size, 20000 // scale))
+        results[f"hand_best_{size}_per_s"] = percentiles(bench_best(size, 2000 // scale))
+        print(f"Evaluated {size} card hands")
+
+    results["showdown_4_players_per_s"] = percentiles(bench_showdown(4, 1000 // scale))
+    print("Found showdown winners")
+
+    for opponents in range(1, 9):
+        results[f"sim_{opponents}_opponents_runouts_per_s"] = percentiles(bench_sim(opponents, 0.2 / scale))
+    print("Simulated runouts")
+
+    results["range_vs_any_boards_per_s"] = percentiles(bench_range(200 // scale))
+    print("Worked out range equity")
+
+    rates, latencies = bench_decisions(max(20 // scale, 2))
+    results["ai_decisions_per_s"] = percentiles(rates)
+    results["ai_decision_latency_s"] = percentiles(latencies)
+    print("Made AI decisions")
+
+    rates, latencies = bench_hands(max(20 // scale, 2))
+    results["headless_hands_per_s"] = percentiles(rates)
+    results["headless_hand_latency_s"] = percentiles(latencies)
+    print("Played headless hands")
+
+    return results
+
+
+def compare(results, baseline, tolerance=0.1):
+    """
+    Returns a list of messages for each benchmark whose median is more than tolerance (a fraction) worse than in the
+    baseline. Rates (per_s) are worse when lower, latencies (_s) are worse when higher
+    """
+    slowdowns = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+
+        new, old = result["p50"], baseline[name]["p50"]
+        if name.endswith("per_s"):
+            worse = new < old * (1 - tolerance)
+        else:
+            worse = new > old * (1 + tolerance)
+
+        if worse:
+            slowdowns.append(f"{name}: {old:.6g} -> {new:.6g}")
+    return slowdowns
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks the poker engine")
+    parser.add_argument("--save", help="save the results as a JSON baseline to this file")
+    parser.add_argument("--compare", help="compare the results to the JSON baseline in this file")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="fraction a median can get worse by")
+    parser.add_argument("--quick", action="store_true", help="run smaller benchmarks")
+    parser.add_argument("--timings", action="store_true", help="print the time spent in each phase of a hand")
+    args = parser.parse_args()
+
+    if args.timings:
+        Timing.TIMINGS.enable()
+
+    all_results = run_all(args.quick)
+    print()
+    for benchmark, numbers in all_results.items():
+        print(f"{benchmark:>40}: p10 {numbers['p10']:12.6g}  p50 {numbers['p50']:12.6g}  p90 {numbers['p90']:12.6g}")
+
+    if args.save:
+        with open(args.save, "w") as baseline_file:
+            json.dump(all_results, baseline_file, indent=2)
+        print("Saved baseline to", args.save)
+
+    if args.timings:
+        print()
+        Timing.TIMINGS.dump()
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            found = compare(all_results, json.load(baseline_file), args.tolerance)
+        if found:
+            print("\nSlower than the baseline:")
+            for message in found:
+                print("   ", message)
+            sys.exit(1)
+        print("\nNo slowdowns compared to the baseline")
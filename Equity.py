@@ -0,0 +1,349 @@
+"""
+Monte Carlo equity engine used by AI.sim. Works out how often a hand wins or draws against a number of opponents with
+random hole cards, by dealing out many random runouts of the rest of the board.
+
+If numpy is installed, thousands of runouts are drawn at once as integer arrays and every seat is evaluated with
+vectorised table lookups. Without numpy the same sampling is done in a plain python loop over Evaluator.evaluate.
+Cards are passed in as integer ids, as used by Evaluator.
+
+On the turn and river there are few enough ways for the hand to finish that simulate can go though every board
+completion and every set of opponent hole cards instead, and give the exact answer.
+
+Instead of sampling for a fixed time, simulate can be given the win probabilities where a decision would change. It
+then stops as soon as the estimate is confidently on one side of all of them, with a time limit as a backstop.
+
+use_process_pool() makes simulate split its runouts across worker processes, each with its own random stream, and
+add up the results. It is off until turned on.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import combinations
+from math import ceil, comb, sqrt
+from random import Random
+from time import time
+
+import Evaluator
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, the python engine is used instead
+    np = None
+
+BATCH_SIZE = 4096  # Number of runouts drawn at once by the numpy engine
+EXACT_LIMIT = 50000  # Largest number of hands to evaluate to get an exact answer instead of sampling
+Z_SCORE = 2.58  # How many standard errors the win probability must be from a threshold to stop sampling (99%)
+MAX_ERROR = 0.02  # Largest standard error to stop sampling at, even if there are no thresholds to worry about
+
+if np is not None:
+    # Sorted keys and matching strengths of Evaluator.RANK_TABLE, so a key can be looked up with np.searchsorted
+    _RANK_KEYS = np.array(sorted(Evaluator.RANK_TABLE), dtype=np.int64)
+    _RANK_STRENGTHS = np.array([Evaluator.RANK_TABLE[k] for k in _RANK_KEYS.tolist()], dtype=np.int64)
+    _FLUSH_STRENGTHS = np.array(Evaluator.FLUSH_TABLE, dtype=np.int64)
+    _RANK_KEY_OF = np.array(Evaluator.RANK_KEY_OF, dtype=np.int64)
+    _SUIT_OF = np.array(Evaluator.SUIT_OF, dtype=np.int64)
+    _BIT_OF = np.array(Evaluator.BIT_OF, dtype=np.int64)
+
+
+def evaluate_many(cards):
+    """
+    Vectorised version of Evaluator.evaluate. cards is a numpy integer array of shape (n, 5 to 7) of card ids.
+    Returns an array of n strengths. Needs numpy
+    """
+    keys = _RANK_KEY_OF[cards].sum(axis=1)
+    strengths = _RANK_STRENGTHS[np.searchsorted(_RANK_KEYS, keys)]
+
+    suits = _SUIT_OF[cards]
+    bits = _BIT_OF[cards]
+    for suit in range(4):
+        in_suit = suits == suit
+        is_flush = in_suit.sum(axis=1) >= 5
+        if is_flush.any():
+            masks = np.where(in_suit, bits, 0).sum(axis=1)  # Values in one suit are all different, so sum is OR
+            strengths = np.where(is_flush, _FLUSH_STRENGTHS[masks], strengths)
+
+    return strengths
+
+
+def remaining_cards(hole, board):
+    """Returns the list of card ids not in hole or board"""
+    dead = set(hole) | set(board)
+    return [c for c in range(52) if c not in dead]
+
+
+def _batch_numpy(hole, board, playercount, deck, size, rng):
+    """Plays size random runouts with numpy. Returns the number of wins and draws"""
+    missing = 5 - len(board)
+    to_draw = 2 * playercount + missing
+
+    # A random permutation of the deck for each runout, of which only the first to_draw cards are used
+    order = rng.random((size, len(deck))).argsort(axis=1)[:, :to_draw]
+    drawn = deck[order]
+
+    full_board = np.empty((size, 5), dtype=np.int64)
+    full_board[:, :len(board)] = board
+    full_board[:, len(board):] = drawn[:, :missing]
+
+    my_strength = evaluate_many(np.hstack([np.tile(hole, (size, 1)), full_board]))
+
+    best_other = np.zeros(size, dtype=np.int64)
+    for i in range(playercount):
+        other_hole = drawn[:, missing + 2 * i: missing + 2 * i + 2]
+        best_other = np.maximum(best_other, evaluate_many(np.hstack([other_hole, full_board])))
+
+    wins = int((my_strength > best_other).sum())
+    draws = int((my_strength == best_other).sum())
+    return wins, draws
+
+
+def _batch_python(hole, board, playercount, deck, size, rng):
+    """Plays size random runouts with a python loop. Returns the number of wins and draws"""
+    missing = 5 - len(board)
+    to_draw = 2 * playercount + missing
+    evaluate = Evaluator.evaluate
+
+    wins = 0
+    draws = 0
+    for _ in range(size):
+        drawn = rng.sample(deck, to_draw)
+        full_board = board + drawn[:missing]
+        my_strength = evaluate(hole + full_board)
+
+        best_other = 0
+        for i in range(missing, to_draw, 2):
+            other = evaluate(drawn[i: i + 2] + full_board)
+            if other > best_other:
+                best_other = other
+
+        if my_strength > best_other:
+            wins += 1
+        elif my_strength == best_other:
+            draws += 1
+
+    return wins, draws
+
+
+def exact_cost(board_size, playercount):
+    """
+    Returns the number of hands exact_counts has to evaluate for a board of board_size cards, or None if there is no
+    exact method for that many players
+    """
+    if playercount > 2:
+        return None
+
+    deck_size = 50 - board_size
+    missing = 5 - board_size
+    return comb(deck_size, missing) * (1 + comb(deck_size - missing, 2))
+
+
+def uses_exact(board_size, playercount):
+    """Returns True if simulate will give the exact answer for a board of board_size cards"""
+    cost = exact_cost(board_size, playercount)
+    return cost is not None and cost <= EXACT_LIMIT
+
+
+def exact_counts(hole, board, playercount):
+    """
+    Goes though every way the board can be finished, and every set of hole cards for 1 or 2 other players. Returns the
+    number of wins, draws and possible outcomes, where every outcome is equally likely
+    """
+    evaluate = Evaluator.evaluate
+    deck = remaining_cards(hole, board)
+    missing = 5 - len(board)
+
+    total_win = 0
+    total_draw = 0
+    count = 0
+    for completion in combinations(deck, missing):
+        full_board = board + list(completion)
+        my_strength = evaluate(hole + full_board)
+        rest = [c for c in deck if c not in completion]
+
+        less = 0  # Number of hole cards for another player that lose to me
+        less_or_equal = 0  # Number that lose or draw with me
+        less_with_card = [0] * 52  # Number of hole cards that lose to me that contain each card
+        less_or_equal_with_card = [0] * 52
+        pairs = []
+        for other_hole in combinations(rest, 2):
+            strength = evaluate(list(other_hole) + full_board)
+            if strength <= my_strength:
+                pairs.append((other_hole, strength < my_strength))
+                less_or_equal += 1
+                less_or_equal_with_card[other_hole[0]] += 1
+                less_or_equal_with_card[other_hole[1]] += 1
+                if strength < my_strength:
+                    less += 1
+                    less_with_card[other_hole[0]] += 1
+                    less_with_card[other_hole[1]] += 1
+
+        if playercount == 1:
+            total_win += less
+            total_draw += less_or_equal - less
+            count += comb(len(rest), 2)
+            continue
+
+        # Two players. For each hole cards of the first player, count the hole cards of the second player that don't
+        # share a card with the first and also lose (or draw) to me. The first player's own cards are counted in both
+        # of its card counts, so 1 is added back
+        all_less = 0
+        all_less_or_equal = 0
+        for (a, b), is_less in pairs:
+            all_less_or_equal += less_or_equal - less_or_equal_with_card[a] - less_or_equal_with_card[b] + 1
+            if is_less:
+                all_less += less - less_with_card[a] - less_with_card[b] + 1
+
+        total_win += all_less
+        total_draw += all_less_or_equal - all_less
+        count += comb(len(rest), 2) * comb(len(rest) - 2, 2)
+
+    return total_win, total_draw, count
+
+
+_pool = None  # The ProcessPoolExecutor used by simulate, or None to simulate in this process
+_pool_workers = 1
+_seeds = None  # Random that simulations without a seed draw their seed from, or None for unseeded simulations
+
+
+def use_process_pool(workers=None):
+    """
+    Makes simulate split its runouts between a pool of worker processes. workers defaults to the number of CPUs.
+    With 1 worker the simulation stays in this process
+    """
+    global _pool, _pool_workers
+    stop_process_pool()
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    _pool_workers = workers
+    if workers > 1:
+        _pool = ProcessPoolExecutor(workers)
+
+
+def stop_process_pool():
+    """Shuts down the worker processes started by use_process_pool, so simulate runs in this process again"""
+    global _pool, _pool_workers
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+    _pool = None
+    _pool_workers = 1
+
+
+def seed_simulations(seed):
+    """
+    Makes every later simulation that isn't given its own seed draw one from a stream started from seed, so a run of
+    many simulations can be repeated. A seed of None goes back to unseeded simulations
+    """
+    global _seeds
+    _seeds = None if seed is None else Random(seed)
+
+
+def _worker_seeds(seed, workers):
+    """Returns one seed for each worker, so each one samples a different random stream"""
+    if np is not None:
+        return np.random.SeedSequence(seed).spawn(workers)
+
+    rng = Random(seed)
+    return [rng.getrandbits(64) for _ in range(workers)]
+
+
+def confident(wins, sim_count, thresholds):
+    """
+    Returns True if the win probability from wins out of sim_count runouts has a small enough standard error, and is
+    far enough from every threshold that more sampling wouldn't move it to the other side
+    """
+    p = wins / sim_count
+    error = sqrt(max(p * (1 - p), 1 / sim_count) / sim_count)
+    if error > MAX_ERROR:
+        return False
+    return all(abs(p - threshold) > Z_SCORE * error for threshold in thresholds)
+
+
+def _simulate_counts(hole, board, playercount, min_sims, min_time, seed, thresholds=None, max_time=None,
+                     prior=(0, 0)):
+    """
+    Does the work of simulate, returning the number of wins, draws and runouts instead of probabilities. prior is a
+    (wins, runouts) pair played before, which counts towards stopping early but isn't included in the result
+    """
+    deck = remaining_cards(hole, board)
+    if max_time is None:
+        max_time = min_time
+
+    if np is not None:
+        rng = np.random.default_rng(seed)
+        deck = np.array(deck, dtype=np.int64)
+        play_batch = _batch_numpy
+        batch_size = BATCH_SIZE
+    else:
+        rng = Random(seed)
+        play_batch = _batch_python
+        batch_size = 256
+
+    max_batch_size = batch_size
+    if thresholds is not None:
+        # Starts small and grows, in case the first few runouts are enough
+        batch_size = max(min(batch_size // 8, 1 << min_sims.bit_length()), 1)
+
+    sim_count = 0
+    total_win = 0
+    total_draw = 0
+    start_time = time()
+    while True:
+        wins, draws = play_batch(hole, board, playercount, deck, batch_size, rng)
+        total_win += wins
+        total_draw += draws
+        sim_count += batch_size
+        batch_size = min(batch_size * 2, max_batch_size)
+
+        if thresholds is None:
+            if sim_count > min_sims and time() > start_time + min_time:
+                return total_win, total_draw, sim_count
+
+        elif sim_count > min_sims and confident(total_win + prior[0], sim_count + prior[1], thresholds) or \
+                time() > start_time + max_time:
+            return total_win, total_draw, sim_count
+
+
+def simulate(hole, board, playercount=1, min_sims=100, min_time=5, seed=None, exact=True, thresholds=None,
+             max_time=None, prior=None):
+    """
+    Simulates many rounds of poker and returns a tuple of win probability and draw probability, and sim count.
+    hole and board are lists of card ids. Sampling carries on until more than min_sims runouts have been played and
+    min_time seconds have passed. seed can be given to get a repeatable result (see also seed_simulations).
+    If exact is True and every outcome can be checked in under EXACT_LIMIT evaluations, the exact probabilities are
+    returned instead, and sim count is the number of outcomes.
+    If thresholds (a list of win probabilities) is given, sampling stops once the win probability is confidently on one
+    side of every threshold, or after max_time seconds (which defaults to min_time).
+    prior is an earlier (win probability, draw probability, sim count) result for the same hand, such as a cached one.
+    Its runouts count towards being confident about the thresholds, but only the new runouts are returned
+    """
+    hole = list(hole)
+    board = list(board)
+
+    if exact and uses_exact(len(board), playercount):
+        total_win, total_draw, count = exact_counts(hole, board, playercount)
+        return total_win / count, total_draw / count, count
+
+    if seed is None and _seeds is not None:
+        seed = _seeds.getrandbits(64)
+    prior_counts = (0, 0) if prior is None else (prior[0] * prior[2], prior[2])
+
+    if _pool is not None:
+        workers = _pool_workers
+        seeds = _worker_seeds(seed, workers)
+        worker_prior = (prior_counts[0] / workers, prior_counts[1] / workers)  # Each worker's share of the runouts
+        try:
+            futures = [_pool.submit(_simulate_counts, hole, board, playercount, ceil(min_sims / workers), min_time, s,
+                                    thresholds, max_time, worker_prior)
+                       for s in seeds]
+            results = [future.result() for future in futures]
+        except BrokenProcessPool:
+            print("Simulation process pool broke, simulating in this process")
+            stop_process_pool()
+        else:
+            sim_count = sum(r[2] for r in results)
+            return sum(r[0] for r in results) / sim_count, sum(r[1] for r in results) / sim_count, sim_count
+
+    total_win, total_draw, sim_count = _simulate_counts(hole, board, playercount, min_sims, min_time, seed,
+                                                        thresholds, max_time, prior_counts)
+    return total_win / sim_count, total_draw / sim_count, sim_count
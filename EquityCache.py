@@ -0,0 +1,110 @@
+"""
+In-process cache of equity results, so the same hand doesn't have to be simulated again. Results are keyed by the
+suit-isomorphic canonical hand (see Isomorphism) and the number of other players, so hands that are the same up to
+suits share an entry.
+
+Entries keep the number of wins, draws and runouts rather than probabilities. A result with only a few runouts can
+then be refined by adding more runouts to it later. The cache has a maximum size, and the least recently used entry is
+removed when it is full.
+"""
+import threading
+from collections import OrderedDict
+
+import Isomorphism
+
+DEFAULT_SIZE = 100000
+CONFIDENT_SIMS = 10000  # Entries with at least this many runouts are used without simulating more
+
+
+class EquityCache:
+    """A size bounded LRU cache of equity results"""
+
+    def __init__(self, max_size=DEFAULT_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()  # key: [wins, draws, sim count, exact]
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.refinements = 0
+
+    @staticmethod
+    def key(hole, board, playercount):
+        return Isomorphism.encode(hole, board), playercount
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, hole, board, playercount, min_sims=0):
+        """
+        Returns (win probability, draw probability, sim count) for a hand, or None if it isn't cached or was worked
+        out from fewer than min_sims runouts. Exact results are always returned. Counts as a hit or a miss
+        """
+        key = self.key(hole, board, playercount)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (entry[2] < min_sims and not entry[3]):
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._result(entry)
+
+    def peek(self, hole, board, playercount, min_sims=0):
+        """The same as get, but isn't counted as a hit or a miss and doesn't mark the entry as recently used"""
+        with self._lock:
+            entry = self._entries.get(self.key(hole, board, playercount))
+            if entry is None or (entry[2] < min_sims and not entry[3]):
+                return None
+            return self._result(entry)
+
+    @staticmethod
+    def _result(entry):
+        wins, draws, sim_count, _ = entry
+        return wins / sim_count, draws / sim_count, sim_count
+
+    def add(self, hole, board, playercount, result, exact=False):
+        """
+        Adds a (win probability, draw probability, sim count) result for a hand. If the hand is already cached, the
+        runouts are added to the ones there. An exact result replaces whatever was there.
+        Returns the cached entry for the hand afterwards, as (win probability, draw probability, sim count)
+        """
+        win, draw, sim_count = result
+        wins = round(win * sim_count)
+        draws = round(draw * sim_count)
+        key = self.key(hole, board, playercount)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not exact:
+                if entry[3]:
+                    return self._result(entry)
+                entry[0] += wins
+                entry[1] += draws
+                entry[2] += sim_count
+                self.refinements += 1
+                self._entries.move_to_end(key)
+                return self._result(entry)
+
+            entry = [wins, draws, sim_count, exact]
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return self._result(entry)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Returns a dict of the cache counters"""
+        lookups = self.hits + self.misses
+        return {"size": len(self._entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "refinements": self.refinements,
+                "hit_rate": self.hits / lookups if lookups else 0}
+
+
+CACHE = EquityCache()  # Shared by every AI in this process
@@ -0,0 +1,206 @@
+"""
+Fast poker hand evaluator. Takes 5, 6 or 7 cards coded as integers and returns one integer strength, where a larger
+strength is always a better hand.
+
+Cards are coded the same way that a new Deck is ordered: card id = suit index * 13 + value index, using the suit
+order "SCDH" and the value order "23456789TJQKA". So "2S" is 0, "AS" is 12, "2C" is 13 and "AH" is 51.
+
+A strength is packed as category << 20 followed by up to five 4 bit values, most important first. The categories
+are numbered so that a higher category always beats a lower one. Hands without a flush are looked up in a table
+keyed by the counts of each value, and flushes are looked up in a table keyed by a bitmask of the values in the suit.
+"""
+VALUES = "23456789TJQKA"
+SUITS = "SCDH"
+
+# Categories, in order of strength. There is no separate category for a royal flush, it is the best straight flush
+HIGH, PAIR, TWO_PAIR, THREE_OAK, STRAIGHT, FLUSH, FULL_HOUSE, FOUR_OAK, STRAIGHT_FLUSH = range(9)
+
+# Names used by Hand.hand_types for each category
+CATEGORY_NAMES = ["High", "Pair", "2Pair", "3OAK", "Straight", "Flush", "FullH", "4OAK", "StraightF"]
+
+CATEGORY_SHIFT = 20
+
+CARD_IDS = {value + suit: s * 13 + v for s, suit in enumerate(SUITS) for v, value in enumerate(VALUES)}
+CARD_FACES = [value + suit for suit in SUITS for value in VALUES]
+
+RANK_OF = [c % 13 for c in range(52)]
+SUIT_OF = [c // 13 for c in range(52)]
+BIT_OF = [1 << (c % 13) for c in range(52)]
+
+# Each card adds 5 ** value to the key of a hand, so the key is the count of each value written in base 5
+RANK_KEY_OF = [5 ** (c % 13) for c in range(52)]
+
+
+def card_id(face):
+    """Returns the integer id of a card given as a string such as 'QH', or a Card object"""
+    if type(face) is not str:
+        face = face.face
+    return CARD_IDS[face]
+
+
+def pack(category, values):
+    """Packs a category and a list of at most 5 values (most important first) into one strength"""
+    strength = category
+    for i in range(5):
+        strength <<= 4
+        if i < len(values):
+            strength |= values[i]
+    return strength
+
+
+def category_of(strength):
+    """Returns the category of a strength"""
+    return strength >> CATEGORY_SHIFT
+
+
+def values_of(strength):
+    """Returns the list of 5 values packed in a strength, most important first"""
+    return [(strength >> (16 - 4 * i)) & 15 for i in range(5)]
+
+
+def _straight_high(mask):
+    """Returns the value of the highest card in the best straight in a value bitmask, or -1 if there is no straight"""
+    for high in range(12, 3, -1):
+        run = 0b11111 << (high - 4)
+        if mask & run == run:
+            return high
+
+    if mask & 0b1000000001111 == 0b1000000001111:  # A2345, the ace plays low
+        return 3
+
+    return -1
+
+
+def _top_values(mask, n):
+    """Returns the n highest values in a value bitmask, highest first"""
+    output = []
+    for value in range(12, -1, -1):
+        if mask & (1 << value):
+            output.append(value)
+            if len(output) == n:
+                break
+    return output
+
+
+def _build_straight_table():
+    return [_straight_high(mask) for mask in range(1 << 13)]
+
+
+STRAIGHT_TABLE = _build_straight_table()
+POPCOUNT_TABLE = [bin(mask).count("1") for mask in range(1 << 13)]
+
+
+def _build_flush_table():
+    """Strength of the best flush or straight flush for each value bitmask of 5 or more cards in one suit"""
+    table = [0] * (1 << 13)
+    for mask in range(1 << 13):
+        if POPCOUNT_TABLE[mask] < 5:
+            continue
+
+        high = STRAIGHT_TABLE[mask]
+        if high >= 0:
+            table[mask] = pack(STRAIGHT_FLUSH, [high])
+        else:
+            table[mask] = pack(FLUSH, _top_values(mask, 5))
+    return table
+
+
+def _strength_from_counts(counts):
+    """Strength of a hand that is not a flush, given how many cards there are of each value"""
+    mask = 0
+    quads = []
+    trips = []
+    pairs = []
+    for value in range(12, -1, -1):
+        count = counts[value]
+        if count:
+            mask |= 1 << value
+            if count == 2:
+                pairs.append(value)
+            elif count == 3:
+                trips.append(value)
+            elif count == 4:
+                quads.append(value)
+
+    if quads:
+        kickers = _top_values(mask & ~(1 << quads[0]), 1)
+        return pack(FOUR_OAK, [quads[0]] + kickers)
+
+    if trips and (len(trips) > 1 or pairs):
+        two = max(trips[1:] + pairs)
+        return pack(FULL_HOUSE, [trips[0], two])
+
+    high = STRAIGHT_TABLE[mask]
+    if high >= 0:
+        return pack(STRAIGHT, [high])
+
+    if trips:
+        kickers = _top_values(mask & ~(1 << trips[0]), 2)
+        return pack(THREE_OAK, [trips[0]] + kickers)
+
+    if len(pairs) >= 2:
+        kickers = _top_values(mask & ~(1 << pairs[0]) & ~(1 << pairs[1]), 1)
+        return pack(TWO_PAIR, pairs[:2] + kickers)
+
+    if pairs:
+        kickers = _top_values(mask & ~(1 << pairs[0]), 3)
+        return pack(PAIR, [pairs[0]] + kickers)
+
+    return pack(HIGH, _top_values(mask, 5))
+
+
+def _build_rank_table():
+    """Strength of every hand of 5 to 7 cards with no flush, keyed by the counts of each value in base 5"""
+    table = {}
+    counts = [0] * 13
+
+    def fill(value, cards_left, key):
+        # Chooses how many cards of each value to have, from the highest value down
+        if value < 0:
+            if cards_left <= 2:  # 5, 6 and 7 card hands
+                table[key] = _strength_from_counts(counts)
+            return
+
+        for count in range(min(4, cards_left) + 1):
+            counts[value] = count
+            fill(value - 1, cards_left - count, key + count * RANK_KEY_OF[value])
+        counts[value] = 0
+
+    fill(12, 7, 0)
+    return table
+
+
+FLUSH_TABLE = _build_flush_table()
+RANK_TABLE = _build_rank_table()
+
+
+def evaluate(cards):
+    """
+    Returns the strength of the best 5 card hand from 5, 6 or 7 card ids. A larger strength is a better hand and two
+    hands of equal strength split the pot
+    """
+    key = 0
+    suit_masks = [0, 0, 0, 0]
+    for c in cards:
+        key += RANK_KEY_OF[c]
+        suit_masks[SUIT_OF[c]] |= BIT_OF[c]
+
+    strength = RANK_TABLE[key]
+    for mask in suit_masks:
+        if POPCOUNT_TABLE[mask] >= 5:
+            # With at most 7 cards a flush can't also be a full house or 4 of a kind, so the flush is the best hand
+            return FLUSH_TABLE[mask]
+    return strength
+
+
+def evaluate_faces(faces):
+    """Same as evaluate, but takes Card objects or strings such as 'QH'"""
+    return evaluate([card_id(face) for face in faces])
+
+
+def hand_type(strength):
+    """Returns the name of the hand type of a strength, as used in Hand.hand_types"""
+    category = category_of(strength)
+    if category == STRAIGHT_FLUSH and values_of(strength)[0] == 12:
+        return "RoyalF"
+    return CATEGORY_NAMES[category]
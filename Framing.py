@@ -0,0 +1,77 @@
+"""
+Message framing for the connection between House and Player. TCP is a stream, so several messages sent quickly can
+arrive in one recv, or one message can be split over two. Every message is sent as a 4 byte big endian length
+followed by that many bytes of message, so the receiver always knows where each message ends.
+
+The server uses read_frame with asyncio streams, and the client uses FramedSocket with a blocking socket. What is
+inside each frame is encoded by a codec from Wire.
+"""
+import asyncio
+import json
+import struct
+
+import Wire
+
+HEADER = struct.Struct("!I")
+MAX_FRAME = 1 << 20  # Longest message in bytes. Anything longer is treated as a broken connection
+
+
+def pack(payload):
+    """Returns the frame of a message given as bytes"""
+    return HEADER.pack(len(payload)) + payload
+
+
+def encode(obj):
+    """Returns the frame of an object, encoded as JSON. Used before the codec of a connection is agreed"""
+    return pack(json.dumps(obj).encode())
+
+
+async def read_frame(reader):
+    """Reads one message from an asyncio stream. Returns it as bytes, or None if the connection closed or broke"""
+    try:
+        header = await reader.readexactly(HEADER.size)
+        length = HEADER.unpack(header)[0]
+        if length > MAX_FRAME:
+            return None
+        return await reader.readexactly(length)
+    except (asyncio.IncompleteReadError, ConnectionResetError, ConnectionAbortedError):
+        return None
+
+
+class FramedSocket:
+    """A blocking socket that sends and receives whole messages, encoded by codec"""
+
+    def __init__(self, sock, codec=None):
+        self.socket = sock
+        self.codec = codec if codec is not None else Wire.JsonCodec()
+        self._buffer = bytearray()
+
+    def send(self, obj):
+        """Sends an object"""
+        self.socket.sendall(pack(self.codec.encode(obj)))
+
+    def receive(self):
+        """
+        Waits for the next message and returns it, decoded. Messages that arrived together are kept in a buffer
+        and returned by the next calls. Raises ConnectionError if the server closed the connection, and ValueError
+        if the message can't be decoded
+        """
+        while True:
+            if len(self._buffer) >= HEADER.size:
+                length = HEADER.unpack_from(self._buffer)[0]
+                if length > MAX_FRAME:
+                    raise ConnectionError("Message from the server is too long")
+
+                end = HEADER.size + length
+                if len(self._buffer) >= end:
+                    payload = bytes(self._buffer[HEADER.size:end])
+                    del self._buffer[:end]
+                    return self.codec.decode(payload)
+
+            data = self.socket.recv(65536)
+            if not data:
+                raise ConnectionError("The server closed the connection")
+            self._buffer += data
+
+    def close(self):
+        self.socket.close()
@@ -0,0 +1,268 @@
+"""
+Hand history. Every hand a table plays can be written to a log as one small binary record, so hands can be looked at
+or analysed later. Records are encoded by the table when the hand ends, and written to disk by a background thread,
+so the table never waits on the disk.
+
+Logs are append only, and a new file is started when the current one reaches max_bytes. Files are named
+<prefix>-000001.hh, <prefix>-000002.hh and so on, and a writer never appends to a file from an earlier run.
+A typical hand is about 130 bytes, so a million hands fit in about 130 MB.
+
+File format (all little endian):
+    header: 4 bytes b"PKHH", uint16 format version, 2 bytes unused
+    records: uint16 length of the body, followed by the body
+
+Record body, format version 1 ("varint" is an unsigned LEB128 integer, and a seat is an index into the players):
+    uint32 time the hand ended, in seconds since the epoch
+    varint min bet (the big blind. Seats 0 and 1 post the small and big blind)
+    uint8 player count, then for each player in seat order:
+        uint8 name length, name in UTF-8
+        uint8 flags (bit 0 set for an AI)
+        int16 cockyness in thousandths, for AIs only
+        varint money at the start of the hand, varint money at the end of the hand
+        2 hole card ids
+    for each of the 4 streets (preflop, flop, turn, river): varint action count, then for each action:
+        uint8 seat, uint8 action (index into ACTIONS), and varint amount if the action is a bet
+    uint8 board card count, then the board card ids
+    uint8 player count, then the seats of the players still in at the end of the hand
+    uint8 winner count, then the seats of the winners
+    uint8 hand type of the winning hand (index into HAND_TYPES)
+    varint pot
+
+A torn record at the end of a file (from a crash) is ignored by read_file.
+"""
+import os
+import queue
+import struct
+import threading
+from time import time
+
+import Evaluator
+
+MAGIC = b"PKHH"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHxx")
+LENGTH = struct.Struct("<H")
+MAX_FILE_BYTES = 64 << 20  # Size at which a new file is started
+BUFFER_BYTES = 1 << 16  # Bytes buffered before they are written to the file
+SUFFIX = ".hh"
+
+ACTIONS = "BFQ"
+STREETS = ["preflop", "flop", "turn", "river"]
+HAND_TYPES = Evaluator.CATEGORY_NAMES + ["RoyalF"]  # The names used by Hand.hand_types
+
+_TIME = struct.Struct("<I")
+_COCKYNESS = struct.Struct("<h")
+
+
+def _pack_varint(data, n):
+    if type(n) is not int or n < 0:
+        raise ValueError(f"{n!r} isn't a whole number of at least 0")
+    while n >= 0x80:
+        data.append(n & 0x7F | 0x80)
+        n >>= 7
+    data.append(n)
+
+
+def _unpack_varint(data, offset):
+    n = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        n |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return n, offset
+        shift += 7
+
+
+def encode(players, min_bet, streets, board, showdown, winners, hand_type, pot, ended=None):
+    """
+    Returns the record of a hand as bytes, including its length. players is a list of dicts in seat order, with the
+    keys "name", "ai", "cockyness" (for AIs), "money" and "end_money" (at the start and end of the hand), and "hole"
+    (2 card ids). streets is a list of 4 lists of actions, each {"N": name, "Act": action, "Am": amount} as sent to
+    the players. board is a list of card ids, showdown and winners are lists of names, and hand_type is a name from
+    HAND_TYPES. ended defaults to now. Raises ValueError if an amount of money isn't a whole number of at least 0
+    """
+    seats = {player["name"]: seat for seat, player in enumerate(players)}
+
+    data = bytearray(_TIME.pack(int(time() if ended is None else ended)))
+    _pack_varint(data, min_bet)
+
+    data.append(len(players))
+    for player in players:
+        name = player["name"].encode()[:255]
+        data.append(len(name))
+        data += name
+        data.append(bool(player["ai"]))
+        if player["ai"]:
+            data += _COCKYNESS.pack(max(-32768, min(32767, round(player["cockyness"] * 1000))))
+        _pack_varint(data, player["money"])
+        _pack_varint(data, player["end_money"])
+        data += bytes(player["hole"])
+
+    for actions in streets:
+        _pack_varint(data, len(actions))
+        for action in actions:
+            data.append(seats[action["N"]])
+            data.append(ACTIONS.index(action["Act"]))
+            if action["Act"] == "B":
+                _pack_varint(data, action["Am"])
+
+    data.append(len(board))
+    data += bytes(board)
+    data.append(len(showdown))
+    data += bytes(seats[name] for name in showdown)
+    data.append(len(winners))
+    data += bytes(seats[name] for name in winners)
+    data.append(HAND_TYPES.index(hand_type))
+    _pack_varint(data, pot)
+
+    if len(data) > 0xFFFF:
+        raise ValueError("Hand record too long")
+    return LENGTH.pack(len(data)) + bytes(data)
+
+
+def decode(data, offset=0):
+    """
+    Returns the hand whose record (including its length) starts at offset of data, as a dict with the same keys as
+    the arguments of encode, plus "ended". Seats are used in place of names in streets, showdown and winners, and
+    actions are (seat, action, amount) tuples
+    """
+    offset += LENGTH.size
+    ended = _TIME.unpack_from(data, offset)[0]
+    min_bet, offset = _unpack_varint(data, offset + _TIME.size)
+
+    players = []
+    count = data[offset]
+    offset += 1
+    for _ in range(count):
+        length = data[offset]
+        player = {"name": bytes(data[offset + 1: offset + 1 + length]).decode(errors="replace")}
+        offset += 1 + length
+        player["ai"] = bool(data[offset] & 1)
+        offset += 1
+        if player["ai"]:
+            player["cockyness"] = _COCKYNESS.unpack_from(data, offset)[0] / 1000
+            offset += _COCKYNESS.size
+        player["money"], offset = _unpack_varint(data, offset)
+        player["end_money"], offset = _unpack_varint(data, offset)
+        player["hole"] = list(data[offset: offset + 2])
+        offset += 2
+        players.append(player)
+
+    streets = []
+    for _ in STREETS:
+        actions = []
+        count, offset = _unpack_varint(data, offset)
+        for _ in range(count):
+            seat, action = data[offset], ACTIONS[data[offset + 1]]
+            offset += 2
+            amount = 0
+            if action == "B":
+                amount, offset = _unpack_varint(data, offset)
+            actions.append((seat, action, amount))
+        streets.append(actions)
+
+    board = list(data[offset + 1: offset + 1 + data[offset]])
+    offset += 1 + data[offset]
+    showdown = list(data[offset + 1: offset + 1 + data[offset]])
+    offset += 1 + data[offset]
+    winners = list(data[offset + 1: offset + 1 + data[offset]])
+    offset += 1 + data[offset]
+    hand_type = HAND_TYPES[data[offset]]
+    pot, offset = _unpack_varint(data, offset + 1)
+
+    return {"ended": ended, "min_bet": min_bet, "players": players, "streets": streets, "board": board,
+            "showdown": showdown, "winners": winners, "hand_type": hand_type, "pot": pot}
+
+
+def check_header(data, path=""):
+    """Raises ValueError if data doesn't start with the header of a hand history file of this version"""
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path} is not a hand history file")
+    magic, version = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError(f"{path} is not a version {FORMAT_VERSION} hand history file")
+
+
+def record_offsets(data):
+    """Yields the offset of each whole record in the contents of a file, stopping at a torn record"""
+    offset = HEADER.size
+    while offset + LENGTH.size <= len(data):
+        end = offset + LENGTH.size + LENGTH.unpack_from(data, offset)[0]
+        if end > len(data):
+            return
+        yield offset
+        offset = end
+
+
+def read_file(path):
+    """Yields each hand in a hand history file, decoded"""
+    with open(path, "rb") as file:
+        data = file.read()
+    check_header(data, path)
+    for offset in record_offsets(data):
+        yield decode(data, offset)
+
+
+def log_files(directory, prefix="hands"):
+    """Returns the paths of the hand history files in a directory, oldest first"""
+    names = [name for name in os.listdir(directory) if name.startswith(prefix + "-") and name.endswith(SUFFIX)]
+    return [os.path.join(directory, name) for name in sorted(names)]
+
+
+class HandHistory:
+    """
+    Writes hand records to a directory in a background thread. record can be called from any thread, and only puts the
+    record in a queue. Can be shared by many tables
+    """
+
+    def __init__(self, directory, prefix="hands", max_bytes=MAX_FILE_BYTES):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.recorded = 0  # Hands written so far
+        files = log_files(directory, prefix)
+        self._number = int(os.path.basename(files[-1])[len(prefix) + 1: -len(SUFFIX)]) if files else 0  # Last file
+        self._file = None
+        self._size = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._write_records, name="HandHistory", daemon=True)
+        self._thread.start()
+
+    def record(self, record):
+        """Queues a record from encode to be written"""
+        self._queue.put(record)
+
+    def close(self):
+        """Writes every queued record, then closes the file"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _open_next(self):
+        if self._file is not None:
+            self._file.close()
+        self._number += 1
+        path = os.path.join(self.directory, f"{self.prefix}-{self._number:06d}{SUFFIX}")
+        self._file = open(path, "xb", buffering=BUFFER_BYTES)
+        self._file.write(HEADER.pack(MAGIC, FORMAT_VERSION))
+        self._size = HEADER.size
+
+    def _write_records(self):
+        while True:
+            record = self._queue.get()
+            if record is None:
+                break
+
+            if self._file is None or self._size + len(record) > self.max_bytes:
+                self._open_next()
+            self._file.write(record)
+            self._size += len(record)
+            self.recorded += 1
+
+            if self._queue.empty():  # Nothing else waiting, so the buffer is written out while the table plays
+                self._file.flush()
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -1,11 +1,34 @@
-from random import choice, shuffle, random, sample
-from time import time, sleep
-from itertools import combinations
+from random import choice, shuffle, random, randrange
+from time import sleep
 import json
 from math import floor, log10
-import threading
+import asyncio
+import os
+import argparse
 import socket
-from typing import List, Any
+from concurrent.futures import ThreadPoolExecutor
+
+import Equity
+import EquityCache
+import Evaluator
+import Framing
+import HandHistory
+import Preflop
+import Range
+import Speculation
+import Timing
+import Wire
+
+PORT = 54321
+ACTION_TIME = 15  # Seconds a human has for each action before their time bank is used
+TIME_BANK = 60  # Extra seconds each human starts with, for actions that take longer than ACTION_TIME
+BANK_REFILL = 5  # Seconds added to each human's time bank every round, up to TIME_BANK
+HANDSHAKE_TIMEOUT = 30  # Seconds a new player has to choose a name before being disconnected
+MAX_PENDING = 64  # Most handshakes going on at once. More new players than this are turned away until some finish
+LISTEN_BACKLOG = 128  # Connections the OS queues before they are accepted
+MAX_WRITE_BUFFER = 1 << 20  # Bytes waiting to be sent to a player before they are treated as disconnected
+FAST_SIM_TIME = 0.0005  # Most seconds each fast AI (see fast_ai) simulates for each bet
+FAST_MIN_SIMS = 32  # Fewest runouts each fast AI simulates for each bet
 
 
 def round_sig_figs(n, sig_figs):
@@ -40,31 +63,62 @@ def int_to_base(integer, base=256):
 class Card:
     """
     Class for the card object. Has attributes that can be called to look at a cards face value or suit
+
+    There is only ever one Card object for each of the 52 cards, so cards can be compared with 'is', and making a card
+    just looks it up. Cards shouldn't be changed after they are made.
     """
 
-    def __init__(self, face=""):
+    __slots__ = ("face", "value", "suit", "face_value", "id")
+    _pool = {}  # Map of every string that has been used to make a card to the card
+    _all = []  # Every card, in card id order
+
+    def __new__(cls, face=""):
         """
         Takes the input of a card in the form of a string (eg 'JC' or 'TH' or '6D'). Random face if input left emtpy
         returns a card object.
         """
         if face and len(face) == 2:
-            if face[0] in "SCDH":  # corrects the order if the user has entered the card incorrectly
-                face = face[::-1]
-
-            self.face = face.upper()
-
-        else:
-            self.face = choice("23456789TJQKA") + choice("SCDH")  # Randomly genarates a card
-
-        self.value = self.face[0]
-        self.suit = self.face[1]
-        self.face_value = "23456789TJQKA".index(self.value)
+            card = cls._pool.get(face)
+            if card is None:
+                normalised = face[::-1] if face[0] in "SCDH" else face  # corrects the order if the user has entered the
+                # card incorrectly
+                card = cls._pool.get(normalised.upper())
+                if card is None:
+                    raise ValueError(f"{face} is not a card")
+                cls._pool[face] = card
+            return card
+
+        return choice(cls._all)  # Randomly picks a card
+
+    def __reduce__(self):
+        return Card, (self.face,)
+
+    @classmethod
+    def _make_all(cls):
+        """Makes the 52 cards. Only called once, when this module is loaded"""
+        for face in Evaluator.CARD_FACES:
+            card = object.__new__(cls)
+            card.face = face
+            card.value = face[0]
+            card.suit = face[1]
+            card.face_value = "23456789TJQKA".index(card.value)
+            card.id = Evaluator.CARD_IDS[face]
+            cls._pool[face] = card
+            cls._all.append(card)
+
+
+Card._make_all()
+CARDS = Card._all  # The Card object for each card id
 
 
 class Deck:
     """
     An object to simulate a deck of cards. Has attributes and methods for shuffling the deck and
     returning a given number of cards
+
+    The deck is stored as a list of card ids with a cursor to the next card to deal, so no Card objects are made or
+    copied. Removed cards leave a -1 hole in the list, which is skipped when dealing. A shuffled deck isn't shuffled all
+    at once, instead each card is picked at random from the cards left when it is taken (a partial Fisher-Yates shuffle)
     """
 
     def __init__(self, shuffled=False):
@@ -72,20 +126,67 @@ class Deck:
         Input suffled -> boolean
         if suffled is True then the deck will be shuffled after genarated
         """
-        self.deck = []
-        for suit in "SCDH":
-            for value in "23456789TJQKA":
-                self.deck.append(Card(value + suit))
-
-        if shuffled:
-            shuffle(self.deck)
+        self._ids = list(range(52))
+        self._where = list(range(52))  # Index of each card id in self._ids, or -1 if it isn't in the deck
+        self._cursor = 0  # Index of the next card to deal
+        self._holes = 0  # Number of removed cards at or after the cursor
+        self._shuffled = shuffled  # If True, cards after the cursor are dealt in a random order
+
+    def __len__(self):
+        return len(self._ids) - self._cursor - self._holes
+
+    @property
+    def deck(self):
+        """The list of Card objects left in the deck, in the order they will be dealt"""
+        self._finish_shuffle()
+        return [CARDS[i] for i in self._ids[self._cursor:] if i >= 0]
+
+    @deck.setter
+    def deck(self, cards):
+        self._ids = [card.id for card in cards]
+        self._where = [-1] * 52
+        for index, i in enumerate(self._ids):
+            self._where[i] = index
+        self._cursor = 0
+        self._holes = 0
+        self._shuffled = False
+
+    def _finish_shuffle(self):
+        """Puts the cards left in a random order, so that the order of the list is the order they will be dealt"""
+        if self._shuffled:
+            rest = self._ids[self._cursor:]
+            shuffle(rest)
+            self._ids[self._cursor:] = rest
+            for index in range(self._cursor, len(self._ids)):
+                if self._ids[index] >= 0:
+                    self._where[self._ids[index]] = index
+            self._shuffled = False
+
+    def take_id(self):
+        """Takes the next card of the deck and returns its card id, or -1 if there are no cards in the deck"""
+        while self._cursor < len(self._ids):
+            if self._shuffled:
+                # Swap a random card from the ones left to the cursor
+                j = randrange(self._cursor, len(self._ids))
+                a, b = self._ids[j], self._ids[self._cursor]
+                self._ids[self._cursor], self._ids[j] = a, b
+                if b >= 0:
+                    self._where[b] = j
+
+            i = self._ids[self._cursor]
+            self._cursor += 1
+            if i >= 0:
+                self._where[i] = -1
+                return i
+            self._holes -= 1
+        return -1
 
     def take(self):
         """Takes the first card of the deck and returns it. Returns false if there are not cards in the deck"""
-        try:
-            return self.deck.pop(0)
-        except IndexError:
+        i = self.take_id()
+        if i < 0:
             return False
+        return CARDS[i]
 
     def take_n(self, number):
         """
@@ -106,12 +207,16 @@ class Deck:
         if type(card) is not Card:
             return False
 
-        self.deck.append(card)
+        self._finish_shuffle()
+        i = card.id
+        self.remove_id(i)  # A card can only be in the deck once
+        self._where[i] = len(self._ids)
+        self._ids.append(i)
         return True
 
     def shuffle_deck(self):
         """Shuffles the deck"""
-        shuffle(self.deck)
+        self._shuffled = True
 
     def str_deck(self, mn=0, mx=-1):
         """
@@ -119,49 +224,38 @@ class Deck:
         mn -> int: is the index of the first card to include in the string. Defaults to the start of the deck
         mx -> int: is the index of the first card to NOT include in the string. Defaults to inlude the end of the deck.
         """
+        deck = self.deck
         if mx < 0 or type(mx) is not int:
-            mx = len(self.deck)
+            mx = len(deck)
         if mn < 0 or type(mn) is not int:
             mx = 0
 
-        string = ", ".join([card.face for card in self.deck[mn: mx]])
+        string = ", ".join([card.face for card in deck[mn: mx]])
 
         return string
 
+    def remove_id(self, i):
+        """Removes a card id from the deck. Returns False if the card wasn't in the deck"""
+        index = self._where[i]
+        if index < 0:
+            return False
+
+        self._ids[index] = -1
+        self._where[i] = -1
+        self._holes += 1
+        return True
+
     def remove_card(self, card):
         """
         Removes a given card form the deck
         card -> Card or string in form 'QH', 'TS', '3C'
         """
-        deck_str = self.str_deck()
-        if type(card) is Card:  # Convets card from a Card object to string
-            card = card.face
+        if type(card) is Card:
+            return self.remove_id(card.id)
 
-        deck_str = deck_str.split(", ")
-        try:
-            deck_str.remove(card)
-        except ValueError:
+        if card not in Evaluator.CARD_IDS:
             return False
-
-        self.deck = list(map(Card, deck_str))  # Converts a list of strings to a list of cards
-        return True
-
-
-def get_value(value):
-    """
-    Returns int the value of the a card, unless value is not in a valid format, in which case it returns false
-    value -> Card, string
-    """
-    if type(value) is Card:
-        value = value.face
-
-    if type(value) is str:
-        value = value[0]
-
-    if type(value) is not str:
-        return False
-
-    return "23456789TJQKA".index(value)
+        return self.remove_id(Evaluator.CARD_IDS[card])
 
 
 class Hand:
@@ -258,74 +352,11 @@ class Hand:
         """Returns the full list of cards in play, sorted by value"""
         return sorted(self.in_play(), key=lambda x: "23456789TJQKA".index(x.value))
 
-    def is_straight(self, cards):
-        """Takes an input of 5 cards and returns weather or not it's a stright"""
-        values = self.hand_values(cards)
-        if values in "23456789TJQKA":
-            return True
-
-        if values in ["2JQKA", "23QKA", "234KA", "2345A"]:
-            return True
-
-        return False
-
-    def combo(self):
-        """Returns all the 5 card combonates of a hand with length 5 to 7"""
-        hand_combinations = []
-        sorted_hand = self.sort_hand()
-
-        if len(sorted_hand) > 7:
-            print("Combo has problem")
-            return []
-        if len(sorted_hand) == 5:
-            hand_combinations.append(sorted_hand)
-
-        elif len(sorted_hand) == 6:
-            index = 0
-            while index < 6:
-                copy = sorted_hand[:]
-                copy.pop(index)
-                hand_combinations.append(copy)
-                index += 1
-
-        elif len(sorted_hand) == 7:
-            indexs = [0, 1]
-            done = False
-            while not done:
-                copy = sorted_hand[:]
-                copy.pop(indexs[0])
-                copy.pop(indexs[1] - 1)
-                hand_combinations.append(copy)
-
-                if indexs == [5, 6]:
-                    done = True
-
-                elif indexs[1] == 6:
-                    indexs[0] += 1
-                    indexs[1] = indexs[0] + 1
-
-                else:
-                    indexs[1] += 1
-        return hand_combinations
-
-    def pair(self, full_hand=None):
+    def strength(self):
         """
-        Returns highest pair of cards from a list of cards; full_hand. If no full_hand is specifyed, the full_hand defaults
-        to the current hand
+        Returns the strength of the best hand as an integer from Evaluator.evaluate. A larger strength is a better hand
         """
-        if full_hand is None:
-            full_hand = self.in_play()
-
-        pairs = []
-        for combo in combinations(full_hand, 2):
-            if combo[0].value == combo[1].value:
-                pairs.append(combo)
-
-        if pairs:
-            pairs = sorted(pairs, key=lambda x: x[0].face_value)
-            return pairs[-1]
-        else:
-            return False
+        return Evaluator.evaluate([card.id for card in self.in_play()])
 
     def best(self):
         """
@@ -349,286 +380,54 @@ class Hand:
         Pair      | the value of the card of the pair
         High      | the value of the highest card
         """
-        for t in self.hand_types:
-            # Loop though each type and check the hand for the best thing in a hand
+        in_play = self.in_play()
+        strength = Evaluator.evaluate([card.id for card in in_play])
+        t = Evaluator.hand_type(strength)
+        values = Evaluator.values_of(strength)
+
+        if t in ["RoyalF", "StraightF", "Flush"]:
+            suits = self.hand_suits(in_play)
+            flush_suit = max("SCDH", key=suits.count)
+            in_play = [card for card in in_play if card.suit == flush_suit]
+
+        if t in ["RoyalF", "StraightF", "Straight"]:
+            high = values[0]
+            straight_values = [high - i for i in range(5)]
+            if high == 3:  # A2345, the ace plays low
+                straight_values = [3, 2, 1, 0, 12]
+
+            cards = {}
+            for card in in_play:
+                if card.face_value in straight_values:
+                    cards[card.face_value] = card
+            cards = sorted(cards.values(), key=lambda x: x.face_value)
+
             if t == "RoyalF":
-                # 1 find all states of all TJQKA
-
-                l: List[Any] = self.sort_hand()
-
-                while l and "23456789TJQKA".index(l[0].value) < "23456789TJQKA".index("T"):
-                    l.pop(0)
-
-                all_present = True  # Weather or not all of T, J, Q, K, A are in the hand
-                values = self.hand_values(l)
-                for v in "TJQKA":
-                    if v not in values:
-                        all_present = False
-                        break
-
-                if len(l) >= 5 and all_present:
-                    strates = []
-                    if len(l) == 5:
-                        strates.append(l)
-
-                    if len(l) == 6:
-                        last = ""
-                        repeated = ""
-                        for i in range(6):
-                            if last == l[i].value:
-                                repeated = last
-                                break
-                            last = l[i].value
-
-                        repeated_index = values.index(repeated)
-                        strates.append(l[:repeated_index] + l[repeated_index + 1:])
-                        strates.append(l[:repeated_index + 1] + l[repeated_index + 2:])
-
-                    if len(l) == 7:
-                        last = []  # List of index of repeated values of cards
-                        for i in range(6):
-                            if l[i].value == l[i + 1].value:
-                                last.append(i)
-
-                        if last[1] - last[0] == 1:
-                            x = last[0]
-                            left = l[:x]
-                            right = l[x + 3:]
-                            mid = l[x: x + 3]
-                            for i in range(3):
-                                strates.append(left + [mid[i]] + right)
-
-                        else:
-                            for i in range(4):
-                                l_copy = l[:]
-
-                                if i % 2:
-                                    l_copy.pop(last[0])
-                                else:
-                                    l_copy.pop(last[0] + 1)
-
-                                if i // 2:
-                                    l_copy.pop(last[1] - 1)
-                                else:
-                                    l_copy.pop(last[1])
-
-                                strates.append(l_copy)
-
-                    # Found all possible royal flushes
-                    for s in strates:
-                        i = 0
-                        while i < 4 and s[i].suit == s[i + 1].suit:
-                            i += 1
-
-                        if i == 4:
-                            return t, s[0].suit, s
-
-            if t == "StraightF":
-                flushes = []
-
-                for copy in self.combo():
-
-                    if self.is_straight(copy):  # If it is a straight
-                        flush = True
-                        for x in range(4):
-                            if copy[x].suit != copy[x + 1].suit:
-                                flush = False
-                                break
-
-                        if flush:
-                            flushes.append(copy)
-
-                if flushes:
-                    highest = flushes[0]
-                    for flu in flushes[1:]:
-                        # is flu sorted?
-                        s_ranking = ["2345A", "23456", "34567", "45678", "56789", "6789T", "789TJ", "89TJQ", "9TJQK",
-                                     "234KA", "23QKA", "2JQKA"]
-
-                        if self.hand_values(highest) in s_ranking:
-                            highest_ranking = s_ranking.index(self.hand_values(highest))
-                        else:
-                            highest_ranking = 20
-
-                        if self.hand_values(flu) in s_ranking:
-                            flu_ranking = s_ranking.index(self.hand_values(highest))
-                        else:
-                            flu_ranking = 20
-
-                        if flu_ranking > highest_ranking:
-                            highest = flu
-
-                    return t, self.hand_values(highest), highest
-
-            if t == "4OAK":
-                string = self.hand_values(sort=False)
-                counts = {}
-                for chrt in string:
-                    counts[chrt] = string.count(chrt)
-
-                repeated = ""
-                for value, count in counts.items():
-                    if count == 4:
-                        repeated = value
-
-                if repeated:
-                    indexs = []
-                    for i in range(len(string)):
-                        if string[i] == repeated:
-                            indexs.append(i)
-
-                    if len(indexs) == 4:
-                        cards = []
-                        for index in indexs:
-                            cards.append(self.in_play()[index])
-
-                        return t, cards[0].value, cards
-
-            if t == "FullH":
-                houses = []
-                for copy in self.combo():
-                    string = self.hand_values(copy)
-                    low_first = string[0] * 2 + string[2] * 3
-                    high_first = string[0] * 3 + string[3] * 2
-                    if string == low_first or string == high_first:
-                        houses.append(copy)
-
-                if houses:
-                    highest_house = houses[0]
-                    low = self.hand_values(highest_house)[0]
-                    high = self.hand_values(highest_house)[-1]
-                    mid = self.hand_values(highest_house)[2]  # the vaule of the card there is 3 of
-                    for house in houses[1:]:
-                        string = self.hand_values(house)
-                        if "23456789TJQKA".index(mid) < "23456789TJQKA".index(string[2]):
-                            highest_house = house
-                            low = self.hand_values(highest_house)[0]
-                            high = self.hand_values(highest_house)[-1]
-                            mid = self.hand_values(highest_house)[2]
-                        elif "23456789TJQKA".index(mid) == "23456789TJQKA".index(string[2]):
-                            if mid == low:
-                                two = high  # two is the vaule of the card there is 2 of
-                            else:
-                                two = low
-
-                            if string[2] == string[0]:
-                                two_of_check = string[-1]
-                            else:
-                                two_of_check = string[0]
-
-                            if "23456789TJQKA".index(two) < "23456789TJQKA".index(two_of_check):
-                                highest_house = house
-                                low = self.hand_values(highest_house)[0]
-                                high = self.hand_values(highest_house)[-1]
-                                mid = self.hand_values(highest_house)[2]
-
-                    if mid == low:
-                        two = high  # two is the vaule of the card there is 2 of
-                    else:
-                        two = low
-                    return t, mid + two, highest_house
-
-            if t == "Flush":
-                flushs = []
-                for combo in self.combo():
-                    fs = ["SSSSS", "HHHHH", "DDDDD", "CCCCC"]
-                    if self.hand_suits(combo) in fs:
-                        flushs.append(combo)
-
-                if flushs:
-                    highest = flushs[0]
-                    for flu in flushs[1:]:
-                        i = 1
-                        while i < 5 and get_value(self.hand_values(highest)[-i]) == get_value(
-                                self.hand_values(flu)[-i]):
-                            i += 1
-
-                        if get_value(self.hand_values(highest)[-i]) < get_value(self.hand_values(flu)[-i]):
-                            highest = flu
-
-                    return t, self.hand_values(highest), highest
-
-            if t == "Straight":
-                straights = []
-                for com in self.combo():
-                    if self.is_straight(com):
-                        straights.append(com)
-
-                if straights:
-                    highest = straights[0]
-                    for flu in straights[1:]:
-                        # is flu sorted?
-                        s_ranking = ["2345A", "23456", "34567", "45678", "56789", "6789T", "789TJ", "89TJQ", "9TJQK"]
-
-                        if self.hand_values(highest) in s_ranking:
-                            highest_ranking = s_ranking.index(self.hand_values(highest))
-                        else:
-                            highest_ranking = 20
-
-                        if self.hand_values(flu) in s_ranking:
-                            flu_ranking = s_ranking.index(self.hand_values(flu))
-                        else:
-                            flu_ranking = 20
-
-                        if flu_ranking > highest_ranking:
-                            highest = flu
-
-                    return t, self.hand_values(highest), highest
-
-            if t == "3OAK":
-                string = self.hand_values(sort=False)
-                counts = {}
-                for chrt in string:
-                    counts[chrt] = string.count(chrt)
-
-                repeated = ""
-                for value, count in counts.items():
-                    if count == 3:
-                        repeated = value
-
-                if repeated:
-                    indexs = []
-                    for i in range(len(string)):
-                        if string[i] == repeated:
-                            indexs.append(i)
-
-                    if len(indexs) == 3:
-                        cards = []
-                        for index in indexs:
-                            cards.append(self.in_play()[index])
-
-                        return t, cards[0].value, cards
-
-            if t == "2Pair":
-                first = self.pair()
-                if first:
-                    hand = self.in_play()
-                    for item in first:
-                        hand.remove(item)
-
-                    second = self.pair(hand)
-                    if second:
-                        first_value = first[0].value
-                        second_value = second[0].value
-
-                        if "23456789TJQKA".index(first_value) > "23456789TJQKA".index(second_value):
-                            string = first_value + second_value
-                        else:
-                            string = second_value + first_value
-
-                        return t, string, first + second
-
-            if t == "Pair":
-                pair = self.pair()
-                if pair:
-                    return t, pair[0].value, list(pair)
-
-            if t == "High":
-                highest = self.in_play()[0]
-                for card in self.in_play()[1:]:
-                    if card.face_value > highest.face_value:
-                        highest = card
-                return t, highest.value, [highest]
+                return t, cards[0].suit, cards
+            return t, self.hand_values(cards, sort=False), cards
+
+        if t == "Flush":
+            cards = sorted([card for card in in_play if card.face_value in values], key=lambda x: x.face_value)
+            return t, self.hand_values(cards, sort=False), cards
+
+        if t == "FullH":
+            three = [card for card in in_play if card.face_value == values[0]]
+            two = [card for card in in_play if card.face_value == values[1]][:2]
+            cards = sorted(three + two, key=lambda x: x.face_value)
+            return t, three[0].value + two[0].value, cards
+
+        if t == "2Pair":
+            first = [card for card in in_play if card.face_value == values[0]]
+            second = [card for card in in_play if card.face_value == values[1]]
+            return t, first[0].value + second[0].value, first + second
+
+        if t == "High":
+            highest = max(in_play, key=lambda x: x.face_value)
+            return t, highest.value, [highest]
+
+        # 4OAK, 3OAK and Pair
+        cards = [card for card in in_play if card.face_value == values[0]]
+        return t, cards[0].value, cards
 
 
 class Player:
@@ -647,6 +446,17 @@ class Player:
         self.hand = Hand()
         self.name = name
         self.money = 10 ** 3 * min_bet
+        self.headless = False  # If True, the player doesn't print anything or wait
+
+    def say(self, *args):
+        """Prints a message, unless the player is headless"""
+        if not self.headless:
+            print(*args)
+
+    def pause(self, seconds):
+        """Waits for a number of seconds, unless the player is headless"""
+        if not self.headless:
+            sleep(seconds)
 
     def give_hole(self, cards):
         """Given the player their hole cards. input must be a list of 2 card objects"""
@@ -689,32 +499,92 @@ class Player:
         string = self.name + " folds with a " + self.hand.str_hand()
         if reason:
             string += " due to " + reason
-        print(string)
+        self.say(string)
         return {"N": self.name, "Act": "F"}
 
 
 class Human(Player):
     """Subclass of Player. One Human object will be created for each non-AI player in the game"""
 
-    def __init__(self, name, player_socket: socket.socket, min_bet=None):
+    def __init__(self, name, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, min_bet=None, codec=None):
         """
-        Creates a Human object. name is a string, player_socket is a socket object, and min_bet is a int
-        player_socket is the end point for the connection on the client side
+        Creates a Human object. name is a string, reader and writer are the asyncio streams of the connection to the
+        player, and min_bet is a int. codec is the encoding agreed with the player (see Wire), JSON by default
         """
         Player.__init__(self, name, min_bet=min_bet)
-        self._player_socket = player_socket
+        self._reader = reader
+        self._writer = writer
+        self.codec = codec if codec is not None else Wire.JsonCodec()
+        self._pending = []  # Frames waiting to be written together by flush
+        self.time_bank = TIME_BANK  # Seconds left for actions that take longer than the table's action time
+        self.question = 0  # Number of the last bet asked for. Answers must send it back as "S"
+
+        # Messages are read as soon as they arrive, so a disconnect is noticed even when the player isn't being asked
+        self._messages = asyncio.Queue()
+        self._reading = asyncio.get_running_loop().create_task(self._read_messages())
+
+    async def _read_messages(self):
+        while True:
+            mes = await Framing.read_frame(self._reader)
+            self._messages.put_nowait(mes)
+            if mes is None:
+                return
 
     def send_summary(self, summary):
         """
-        Sends an json encoded object to the player. Returns True if the object is sent successfully, returns False
-        otherwise
+        Sends an object to the player, encoded by the player's codec (see Wire). Returns True if the object is sent
+        successfully, returns False otherwise, and never raises. This doesn't wait for the player to receive it, so a
+        slow connection doesn't hold up the table. If too much is waiting to be sent, the player is treated as
+        disconnected.
+        Everything sent before the table next waits is batched into one write (see flush)
         """
-        try:
-            self._player_socket.send(json.dumps(summary).encode())
-            return True
-        except ConnectionResetError or ConnectionAbortedError:
+        if self._writer.is_closing() or self._writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
             return False
 
+        if not self._pending:
+            asyncio.get_running_loop().call_soon(self.flush)
+        self._pending.append(Framing.pack(self.codec.encode(summary)))
+        return True
+
+    def flush(self):
+        """Writes all of the frames waiting to be sent"""
+        if self._pending and not self._writer.is_closing():
+            self._writer.write(b"".join(self._pending))
+        self._pending = []
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+        self._reading.cancel()
+
+    async def receive(self, timeout):
+        """
+        Waits up to timeout seconds for the next message from the player, and returns it undecoded. Returns None if the
+        player disconnected, and raises asyncio.TimeoutError if the time ran out
+        """
+        mes = await asyncio.wait_for(self._messages.get(), timeout)
+        if mes is None:  # The connection was closed
+            self._messages.put_nowait(None)
+            self.close()
+        return mes
+
+    def clear_messages(self):
+        """Throws away messages sent when the player wasn't being asked, such as an answer that came too late"""
+        while not self._messages.empty():
+            if self._messages.get_nowait() is None:
+                self._messages.put_nowait(None)
+                return
+
+    def timed_out(self, min_bet):
+        """Returns the action made for the player when they run out of time: a check if they can, otherwise a fold"""
+        if min_bet == 0:
+            res = {"N": self.name, "Act": "B", "Am": 0}
+        else:
+            res = {"N": self.name, "Act": "F"}
+        print(self.name, "ran out of time")
+        self.send_summary({"TimedOut": res})
+        return res
+
     def update(self, res):
         """
         Updates the player on the action (res) of another player.
@@ -732,57 +602,60 @@ class Human(Player):
             # print("Not sending", res, "to", self.name, " Res:", res)
             return True
 
-    def ask_bet(self, min_bet):
+    async def ask_bet(self, min_bet, time_allowed=ACTION_TIME):
         """
         Asks a human player for a bet. Returns a dictionary with the betting infomation.
         Returns the bet equivlant to quit ({"N": self.name, "Act": "Q"}) if a error occurs with the connection
+        If the player hasn't made a valid bet within time_allowed seconds, they check or fold (see timed_out)
+        Each question is numbered ("S"), and answers with a different number are ignored, so an answer that was too
+        late for an earlier question can't be taken as the answer to this one
+        This is a coroutine, so the table can keep serving other connections while waiting for the player
         """
-        sleep(0.1)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + time_allowed
+        self.question = (self.question + 1) % 65536
+        self.clear_messages()
+        ask = True
         while True:
-            try:
-                self.send_summary({"N": self.name, "MakeBet": min_bet, "yMoney": self.money})
-            except ConnectionResetError or ConnectionAbortedError:
+            time_left = deadline - loop.time()
+            if ask and not self.send_summary({"N": self.name, "MakeBet": min_bet, "yMoney": self.money,
+                                              "T": Wire.tenths(max(time_left, 0)), "S": self.question}):
                 return {"N": self.name, "Act": "Q"}
+            ask = True
 
             try:
-                mes = self._player_socket.recv(512).decode()
-            except ConnectionResetError or ConnectionAbortedError:
-                return {"N": self.name, "Act": "Q"}
-            except socket.timeout:
-                print(self.name, "timed out")
-                self._player_socket.close()
+                mes = await self.receive(time_left)
+            except asyncio.TimeoutError:
+                return self.timed_out(min_bet)
+            if mes is None:
                 return {"N": self.name, "Act": "Q"}
 
             # Send a reqeast to the player, and wait for a response
 
             try:
-                mes = json.loads(mes)
-            except json.JSONDecodeError:
+                mes = self.codec.decode(mes)
+            except ValueError:
                 print("Json Decode error")
-                try:
-                    self._player_socket.send(json.dumps({"Error": "Json Error"}).encode())
-                except ConnectionResetError or ConnectionAbortedError:
+                if not self.send_summary({"Error": "Json Error"}):
                     return {"N": self.name, "Act": "Q"}
                 continue
 
-            if "N" not in mes or "Act" not in mes:
-                try:
-                    self._player_socket.send(json.dumps({"Error": "Incorrect dict format"}).encode())
-                except ConnectionResetError or ConnectionAbortedError:
+            if type(mes) is not dict or "N" not in mes or "Act" not in mes or "S" not in mes:
+                if not self.send_summary({"Error": "Incorrect dict format"}):
                     return {"N": self.name, "Act": "Q"}
                 continue
 
+            if mes.pop("S") != self.question:
+                ask = False  # An answer to an earlier question, so this one is still waiting
+                continue
+
             if mes["N"] != self.name:
-                try:
-                    self._player_socket.send(json.dumps({"Error": "Wrong Name"}).encode())
-                except ConnectionResetError or ConnectionAbortedError:
+                if not self.send_summary({"Error": "Wrong Name"}):
                     return {"N": self.name, "Act": "Q"}
                 continue
 
-            if mes["Act"] == "B" and "Am" not in mes:
-                try:
-                    self._player_socket.send(json.dumps({"Error": "Incorrect dict format"}).encode())
-                except ConnectionResetError or ConnectionAbortedError:
+            if mes["Act"] == "B" and ("Am" not in mes or type(mes["Am"]) is not int):
+                if not self.send_summary({"Error": "Incorrect dict format"}):
                     return {"N": self.name, "Act": "Q"}
                 continue
 
@@ -790,17 +663,13 @@ class Human(Player):
             # between the min_bet and the players money, and they haven't gone all in.)
             if mes["Act"] == "B" and not (min_bet <= mes["Am"] <= self.money):
                 if mes["Am"] != self.money:
-                    try:
-                        print("Am:", mes["Am"], "  self.money:", self.money, "  min_bet:", min_bet)
-                        print(min_bet <= mes["Am"] <= self.money)
-                        self._player_socket.send(json.dumps({"Error": "Wrong amount of money"}).encode())
-                    except ConnectionResetError or ConnectionAbortedError:
+                    print("Am:", mes["Am"], "  self.money:", self.money, "  min_bet:", min_bet)
+                    print(min_bet <= mes["Am"] <= self.money)
+                    if not self.send_summary({"Error": "Wrong amount of money"}):
                         return {"N": self.name, "Act": "Q"}
                     continue
 
-            try:
-                self._player_socket.send(json.dumps({"Accepted": True}).encode())
-            except ConnectionResetError or ConnectionAbortedError:
+            if not self.send_summary({"Accepted": True}):
                 return {"N": self.name, "Act": "Q"}
 
             # End of test connections
@@ -841,62 +710,56 @@ class AI(Player):
         self.starting_money = self.money
         self.is_bluffing = {}
         self.am_i_bluffing = False
+        self.sim_time = 1  # Most seconds to spend simulating for each bet
+        self.min_sims = 100  # Fewest runouts to simulate for each bet
+        self.exact = True  # Whether to work out the exact equity when it is cheap enough (see Equity.simulate)
+
+        # Parameters for how the AI plays, which can be changed to try out different AIs (see Arena.py)
+        self.fold_threshold = 0.8  # Folds if its confidence is below fold_threshold / player_count
+        self.bluff_chance = 0.1  # Chance of starting to bluff each bet
+        self.conf_exponent = 0.7  # Exponent of the fraction of money bet, when estimating other player's confidence
+        self.value_exponent = 0.6  # Exponent of the confidence when working out how much a hand is worth
 
     def update_player_count(self, new_player_count):
         """Updates the player count"""
         self.player_count = new_player_count
 
-    def sim(self, playercount=1, min_sims=100, min_time=5):
-        """Simulates many rounds of poker and returns a tuple of win probability and draw probability, and sim count"""
+    def sim(self, playercount=1, min_sims=100, min_time=5, thresholds=None, max_time=None):
+        """
+        Simulates many rounds of poker and returns a tuple of win probability and draw probability, and sim count
+        If thresholds (a list of win probabilities) is given, simulating stops as soon as the win probability is
+        clearly on one side of all of them, or after max_time seconds, instead of after min_time seconds
+        """
 
         if playercount < 1:
             return False
 
-        sim_deck = Deck()
-        sim_table = Table(create_socket=False)
-
-        sim_count = 0
-        for card in self.hand.in_play():
-            sim_deck.remove_card(card)
-
-        sim_players = [Player() for _ in range(playercount)]
-        num_cards = 2 * playercount + 5 - len(self.hand.on_table)
-        total_win = 0
-        total_draw = 0
-        for player in sim_players:
-            player.hand.clear()
-            player.add_flop(self.hand.on_table[:])
-
-        starting_table_cards = self.hand.on_table[:]
-        self_starting_hole_cards = self.hand.hole[:]
-
-        start_time = time()
-        while True:
-            cards = sample(sim_deck.deck, num_cards)
-            for player in sim_players:
-                player.hand.clear()
-                player.add_flop(starting_table_cards[:])
-                player.give_hole(cards[:2])
-                cards = cards[2:]
-
-            self.hand.clear()
-            self.add_flop(starting_table_cards[:])
-            self.give_hole(self_starting_hole_cards)
-
-            for player in sim_players + [self]:
-                player.add_flop(cards)
-
-            b = sim_table.best_player(sim_players + [self])
-            sim_count += 1
-            if b == self:
-                total_win += 1
-
-            elif type(b) is list and self in b:
-                total_draw += 1
-
-            if sim_count > min_sims and time() > start_time + min_time:
-                self.hand.on_table = starting_table_cards[:]
-                return total_win / sim_count, total_draw / sim_count, sim_count
+        hole = [card.id for card in self.hand.hole]
+        board = [card.id for card in self.hand.on_table]
+
+        if not board:
+            precomputed = Preflop.lookup(hole, playercount)  # Looked up in the preflop table, if it has been made
+            if precomputed:
+                return precomputed
+
+        # Exact results, and results with enough runouts, are used as they are
+        cached = EquityCache.CACHE.get(hole, board, playercount, min_sims=max(min_sims, EquityCache.CONFIDENT_SIMS))
+        if cached:
+            return cached
+
+        # The cache may also have fewer runouts, from earlier or from the Speculator while other players were thinking.
+        # They are used if they are enough to decide, and otherwise more runouts are added to them
+        cached = EquityCache.CACHE.peek(hole, board, playercount)
+        if cached:
+            win, _, sim_count = cached
+            if thresholds is not None and sim_count >= min_sims and \
+                    Equity.confident(win * sim_count, sim_count, thresholds):
+                return cached
+
+        result = Equity.simulate(hole, board, playercount, min_sims=min_sims, min_time=min_time, exact=self.exact,
+                                 thresholds=thresholds, max_time=max_time, prior=cached)
+        exact = self.exact and Equity.uses_exact(len(board), playercount)
+        return EquityCache.CACHE.add(hole, board, playercount, result, exact=exact)
 
     def update(self, res):
         """Updates the self.player_bets dictionary based other players choices"""
@@ -912,16 +775,17 @@ class AI(Player):
                 pass
 
             else:
-                print("res is for a player we don't know about. res", res)
-                print(self.players_bets)
+                self.say("res is for a player we don't know about. res", res)
+                self.say(self.players_bets)
                 # If this triggers, then the res will be for a player we don't know about
 
-    def est_player_conf(self):
+    def est_player_conf(self, mark_bluffs=True):
         """
         Works out how confidenct each other player as in there hands
         Returns a dict in form {name: conf} of all active players
+        If mark_bluffs is False nothing is changed: no more players are decided to be bluffing, and random isn't used
         """
-        conf_dict = {player: pow(self.players_bets[player] / self.players_starting_money[player], 0.7)
+        conf_dict = {player: pow(self.players_bets[player] / self.players_starting_money[player], self.conf_exponent)
                      for player in self.players_bets if self.players_starting_money[player] != 0}
 
         # This deals with the edje case of players that have gone all in
@@ -936,12 +800,12 @@ class AI(Player):
         # if the player is bluffing.
         # The chance depending of the confidnece, with 0.05 chance for a 0.7, and 0.15 for a 1.0
 
-        for player in [p for p in conf_dict if conf_dict[p] >= 0.7 and not self.is_bluffing[p]]:
+        for player in [p for p in conf_dict if mark_bluffs and conf_dict[p] >= 0.7 and not self.is_bluffing[p]]:
             # for player that I don't think are bluffing, but could be...
             bluff_prob = 0.05 * (1 + ((conf_dict[player] - 0.7) / 0.3) * 2)
-            print("there is a", round(bluff_prob, 4), "chance that", player, "is bluffing")
+            self.say("there is a", round(bluff_prob, 4), "chance that", player, "is bluffing")
             if random() < bluff_prob or round(bluff_prob, 4) == 0.15:
-                print(self.name, "thinks that", player, "is bluffing")
+                self.say(self.name, "thinks that", player, "is bluffing")
                 self.is_bluffing[player] = True
 
         for player in conf_dict:
@@ -980,12 +844,30 @@ class AI(Player):
 
     def hand_value(self):
         """Returns the float number of money that the AI 'thinks' that the hand is worth"""
-        power = 0.6 + 0.2 * self.cockyness
+        power = self.value_exponent + 0.2 * self.cockyness
         if self.starting_money < 20 * self.starting_min_bet:
             return self.money * pow(self.conf, power) * 0.2
         else:
             return 0.2 * (self.starting_min_bet * 20 + self.starting_money) / 2 * pow(self.conf, power)
 
+    def decision_thresholds(self, noise, averaging, best_confs):
+        """
+        Returns the list of win probabilities from sim at which ask_bet would switch between folding and betting.
+        noise is the random amount added to the win probability, averaging is whether the new confidence is averaged
+        with the old one, and best_confs is a list of the highest confidences est_player_conf could give
+        """
+        points = [self.fold_threshold / self.player_count]
+        points += [conf * 0.8 for conf in best_confs]
+
+        if self.am_i_bluffing:
+            # A conf below 0.6 is mapped to conf / 3 + 0.6, which moves where each point is crossed
+            points = [3 * (p - 0.6) for p in points] + [0.6] + points
+
+        if averaging:
+            points = [2 * p - self.conf for p in points]
+
+        return [p - noise for p in points if 0 < p - noise < 1]
+
     def begin_round(self, player_list):
         """To be called before any betting is done"""
         self.is_bluffing = {player.name: False for player in player_list if player != self}
@@ -997,30 +879,45 @@ class AI(Player):
         """
 
         if len(self.players_bets) == 0 or self.money == 0:
-            sleep(0.2)
-            print("Betting automaticly")
+            self.pause(0.2)
+            self.say("Betting automaticly")
             return {"N": self.name, "Act": "B", "Am": 0}
 
-        new = self.sim(self.player_count - 1, min_time=1)[0] + (random() - 0.5) * self.cockyness
+        noise = (random() - 0.5) * self.cockyness
+        averaging = self.player_count == len(self.players_bets)
+
+        if random() < self.bluff_chance and not self.am_i_bluffing:
+            self.say("I'm going to bluff")
+            self.am_i_bluffing = True
+
+        # est_player_conf can decide that players are bluffing, which halves their confidence, but only once the hand
+        # hasn't been folded. Any mix of players could be decided on, so any of their confidences, halved or not, could
+        # be the highest. They are all worked out here, without changing anything
+        other_confs = self.est_player_conf(mark_bluffs=False)
+        best_confs = set(other_confs.values())
+        best_confs |= {conf * 0.5 for p, conf in other_confs.items() if conf >= 0.7 and not self.is_bluffing[p]}
+
+        # Simulates only until it's clear which side of the folding thresholds the hand is on, or for self.sim_time
+        thresholds = self.decision_thresholds(noise, averaging, best_confs)
+        win, draw, sim_count = self.sim(self.player_count - 1, min_sims=self.min_sims, thresholds=thresholds,
+                                        max_time=self.sim_time)
+
+        new = win + noise
         new = max(min(new, 1), 0)
         # new is a messure of hand confience
 
-        if self.player_count == len(self.players_bets):
+        if averaging:
             self.conf = (self.conf + new) / 2
         else:
             self.conf = new
 
-        if random() < 0.1 and not self.am_i_bluffing:
-            print("I'm going to bluff")
-            self.am_i_bluffing = True
-
         if self.am_i_bluffing and self.conf < 0.6:
             # adjusts the self.conf if I'm bluffing
             # Liner fuction y = (1/3)x + 0.6. x is current self.conf, y is new self.conf
             self.conf = (1 / 3) * self.conf + 0.6
 
-        if self.conf < 0.8 / self.player_count:  # If the conf falls below a curten threshold, fold
-            return self.fold("conf <" + str(round(0.8 / self.player_count, 3)))
+        if self.conf < self.fold_threshold / self.player_count:  # If the conf falls below a curten threshold, fold
+            return self.fold("conf <" + str(round(self.fold_threshold / self.player_count, 3)))
 
         if self.conf < max(self.est_player_conf().values()) * 0.8:
             # If the conf is less then 80% of max estimated player confidences
@@ -1034,13 +931,13 @@ class AI(Player):
         if amount_to_bet and (self.starting_money - self.money) / abs(amount_to_bet) > 20 and self.money >= min_bet:
             # If the amount to bet is very small, then bet the min amount
             self.bet(min_bet)
-            print(self.name, "bets", min_bet)
+            self.say(self.name, "bets", min_bet)
             return {"N": self.name, "Act": "B", "Am": min_bet}
 
         amount_to_bet = max(amount_to_bet, 0)
 
         if min_bet == 0 == amount_to_bet:
-            print(self.name, "bets", min_bet)
+            self.say(self.name, "bets", min_bet)
             return {"N": self.name, "Act": "B", "Am": min_bet}
 
         if amount_to_bet == 0:
@@ -1048,7 +945,7 @@ class AI(Player):
 
         if min_bet and 0.8 < amount_to_bet / min_bet < 1.2:
             self.bet(min_bet)
-            print(self.name, "bets", min_bet)
+            self.say(self.name, "bets", min_bet)
             return {"N": self.name, "Act": "B", "Am": min_bet}
 
         players_betting_max = [p for p in self.players_bets if self.players_bets[p] == max(self.players_bets.values())]
@@ -1056,14 +953,14 @@ class AI(Player):
                                                  players_betting_max] and min_bet > amount_to_bet:
             # Are all the players that have bet the largest amount bluffing and the min_bet is greater then I value
             # my hand
-            print("I'm calling this bluff")
+            self.say("I'm calling this bluff")
 
-            print("MinBet", min_bet, "Money", self.money)
+            self.say("MinBet", min_bet, "Money", self.money)
             if min_bet < self.money:
-                print(self.name, "bets", min_bet)
+                self.say(self.name, "bets", min_bet)
                 self.bet(min_bet)
                 return {"N": self.name, "Act": "B", "Am": min_bet}
-            print(self.name, "bets", self.money)
+            self.say(self.name, "bets", self.money)
             x = self.money
             self.bet(x)
             return {"N": self.name, "Act": "B", "Am": x}
@@ -1073,11 +970,11 @@ class AI(Player):
 
         if amount_to_bet > self.money:
             self.bet(self.money)
-            print(self.name, "bets", self.money)
+            self.say(self.name, "bets", self.money)
             return {"N": self.name, "Act": "B", "Am": self.money}
 
         self.bet(amount_to_bet)  # Subtracks the amount to bet from AI's money
-        print(self.name, "bets", amount_to_bet)
+        self.say(self.name, "bets", amount_to_bet)
         return {"N": self.name, "Act": "B", "Am": amount_to_bet}
 
     def update_win_loss(self, winning_player):
@@ -1090,36 +987,92 @@ class AI(Player):
         self.cockyness = max(min(self.cockyness, 0.9), 0.1)
 
 
+def fast_ai(min_bet, current_names):
+    """
+    Makes an AI that only simulates a few runouts for each bet, and no exact equities, so hands are played hundreds of
+    times faster. Its equities are a lot noisier, so it doesn't play like a normal AI. Only used by tables made with
+    fast_ais=True, for things like soak tests where how well the AIs play doesn't matter
+    """
+    ai = AI(min_bet, current_names)
+    ai.sim_time = FAST_SIM_TIME
+    ai.min_sims = FAST_MIN_SIMS
+    ai.exact = False
+    return ai
+
+
+def refuse(writer, error):
+    """Tells a new connection why it can't join, and closes it"""
+    writer.write(Framing.encode({"Accepted": False, "Error": error}))
+    writer.close()
+
+
+def server_socket(port=PORT):
+    """
+    Makes the non-blocking listening socket of the server. Returns (socket, code) where code is the server code players
+    type in to join, which is the ip address in base 36
+    """
+    ip = socket.gethostbyname(socket.gethostname())
+    ip = [int(x) for x in ip.split(".")]
+    ip = ip[::-1]
+    ip = sum([value * 256 ** power for power, value in enumerate(ip)])
+    # ip is now a integer
+    ip = int_to_base(ip, 36)
+    ip = ["0123456789abcdefghijklmnopqrstuvwxyz"[x] for x in ip]
+    code = "".join(ip)
+
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)  # So the server can restart straight away
+    server.bind((socket.gethostname(), port))
+    server.listen(LISTEN_BACKLOG)
+    server.setblocking(False)
+    return server, code
+
+
 class Table:
     """ Will contain all of the information in a table. No GUI"""
 
-    def __init__(self, create_socket=True):
-        """Creates a Table object. If create_socket is set to False, then the table will not create a socket"""
-        if create_socket:
-            ip = socket.gethostbyname(socket.gethostname())
-            ip = [int(x) for x in ip.split(".")]
-            ip = ip[::-1]
-            ip = sum([value * 256 ** power for power, value in enumerate(ip)])
-            # ip is now a integer
-            ip = int_to_base(ip, 36)
-            ip = ["0123456789abcdefghijklmnopqrstuvwxyz"[x] for x in ip]
-            code = "".join(ip)
-
-            print("Code:", code)
-
-            self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self._socket.bind((socket.gethostname(), 54321))
-            self._socket.listen(10)
-            self.code = code
+    def __init__(self, create_socket=True, headless=False, fast_ais=False):
+        """
+        Creates a Table object. If create_socket is set to False, then the table will not create a socket
+        If headless is True, the table has no socket and doesn't print anything or wait, so AI players can play as fast
+        as possible (see play_headless). The AIs still decide the same way as at a normal table.
+        If fast_ais is True, the table makes fast AIs (see fast_ai) that play much faster but much worse
+        """
+        self.headless = headless
+        if create_socket and not headless:
+            self._socket, self.code = server_socket()
+            self.say("Code:", self.code)
         else:
             self.code = ""
             self._socket = False
         self.player_list = []
         self.players_to_add = []
         self.min_bet = 10
+        self.rounds_played = 0  # Rounds played by play_headless, used for doubling the min bet
+        self.ai_factory = fast_ai if fast_ais else AI  # Called with (min_bet, current_names) to make a new AI
+        self.executor = None  # Runs the AI decisions off the event loop. Made when the table starts playing
+        self._player_joined = None  # asyncio.Event set when a human joins, or a handshake ends
+        self.joining = 0  # Handshakes with new players that haven't finished yet
+        self.max_humans = None  # Most humans at the table, or None for no limit
+        self.action_time = ACTION_TIME  # Seconds each human has to act before their time bank is used
+        self.speculator = None  # Works out AI equities while humans think. Made when the table starts playing
+        self.history = None  # HandHistory that each hand is written to, or None to not keep a history
+
+    def say(self, *args):
+        """Prints a message, unless the table is headless"""
+        if not self.headless:
+            print(*args)
+
+    async def pause(self, seconds):
+        """Waits for a number of seconds, unless the table is headless. Other connections are served while waiting"""
+        if not self.headless:
+            started = Timing.TIMINGS.start()
+            await asyncio.sleep(seconds)
+            Timing.TIMINGS.stop("sleep", started)
 
     def add_player(self, player):
         if isinstance(player, Player):
+            player.headless = self.headless
             self.players_to_add.append(player)
 
     def game_summary(self):
@@ -1129,297 +1082,118 @@ class Table:
         return [len(self.player_list + self.players_to_add), [[p.name, type(p).__name__, p.money]
                                                               for p in self.player_list + self.players_to_add]]
 
-    def make_human_player(self, player_socket):
-        """Takes to a player though the player_socket to set up the name and add them to the players to add"""
+    def human_count(self):
+        """Returns the number of humans at the table, including ones joining"""
+        return len([p for p in self.player_list + self.players_to_add if isinstance(p, Human)]) + self.joining
+
+    def admission_error(self):
+        """Returns why a new player can't join right now, or None if they can"""
+        if self.joining >= MAX_PENDING:
+            return "Too many players joining, try again soon"
+        if self.max_humans is not None and self.human_count() >= self.max_humans:
+            return "Table full"
+        return None
+
+    async def make_human_player(self, reader, writer):
+        """
+        Takes to a player though the connection's reader and writer to set up the name and add them to the players to
+        add. Used as the connection handler of the asyncio server, so each new player is handled in its own task, and
+        one slow player doesn't hold up the others. A player who hasn't chosen a name within HANDSHAKE_TIMEOUT seconds
+        is disconnected. Returns True if the player joined
+        """
+        error = self.admission_error()
+        if error is not None:
+            refuse(writer, error)
+            return False
+
+        # The seat is taken before anything is awaited, so the table can't close while the player is joining
+        self.joining += 1
+        try:
+            return await asyncio.wait_for(self._handshake(reader, writer), HANDSHAKE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.say("Connection from new player timed out")
+            writer.close()
+            return False
+        finally:
+            self.joining -= 1
+            if self._player_joined is not None:
+                self._player_joined.set()
+
+    async def _handshake(self, reader, writer):
+        address = writer.get_extra_info("peername")
+        self.say("Connection from", address)
+
+        def send(obj):
+            writer.write(Framing.encode(obj))
+
         new_name = ""
-        player_socket.send("Send Name".encode())
+        wire = Wire.JsonCodec.name
+        send("Send Name")
         while not new_name or new_name in [p.name for p in self.players_to_add + self.player_list]:
+            mes = await Framing.read_frame(reader)
+            if mes is None:
+                writer.close()
+                return False
+
             try:
-                mes = player_socket.recv(512)
-                responce = json.loads(mes.decode())
+                responce = json.loads(mes)
             except json.decoder.JSONDecodeError:
                 responce = ""
-                player_socket.send(json.dumps({"Accepted": False, "Error": "Not valid dict"}).encode())
-            except socket.timeout:
-                print("Connection from new player timed out")
-                player_socket.close()
-                return False
+                send({"Accepted": False, "Error": "Not valid dict"})
 
-            if type(responce) is dict and "MyName" in responce and len(responce) == 1:
+            if type(responce) is dict and "MyName" in responce and set(responce) <= {"MyName", "Wire"}:
                 new_name = responce["MyName"]  # I don't think that pycharm should be yelling at me
+                wire = responce.get("Wire", Wire.JsonCodec.name)
+                if not isinstance(wire, str):
+                    wire = Wire.JsonCodec.name  # Anything that isn't a codec name gets JSON, like unknown names
 
             if new_name in [p.name for p in self.players_to_add + self.player_list]:
-                player_socket.send(json.dumps({"Accepted": False, "Error": "Name Taken"}).encode())
+                send({"Accepted": False, "Error": "Name Taken"})
 
             if "MyName" not in responce or type(responce) is not dict:
-                player_socket.send(json.dumps({"Accepted": False, "Error": "Not valid dict"}).encode())
+                send({"Accepted": False, "Error": "Not valid dict"})
 
-        player_socket.send(json.dumps({"Accepted": True}).encode())
-        print("Player from", player_socket.getpeername(), "has the name", new_name)
-        new_player = Human(new_name, player_socket, min_bet=self.min_bet)
+        codec = Wire.make_codec(wire)
+        send({"Accepted": True, "Wire": codec.name})
+        self.say("Player from", address, "has the name", new_name, "using", codec.name)
+        new_player = Human(new_name, reader, writer, min_bet=self.min_bet, codec=codec)
         self.players_to_add.append(new_player)
         new_player.send_summary(self.game_summary())
+        return True
 
-    def listen_for_new_players(self):
-        """Handles new connections from new players"""
-        t = time()
-        while self._socket:
-            clientsocket, address = self._socket.accept()
-            clientsocket.settimeout(120)
-            print("Connection from", address)
-            self.make_human_player(clientsocket)
-            if t + 5 < time():
-                t = time()
-                print("listening...")
+    async def listen_for_new_players(self):
+        """Handles new connections from new players, until the table stops"""
+        server = await asyncio.start_server(self.make_human_player, sock=self._socket)
+        async with server:
+            await server.serve_forever()
 
     @staticmethod
     def best_of_2(player1, player2):
         """Returns that player with the best hand, or both in a list if they draw"""
         # https://youtu.be/S2lMEkvnfno
         # Poker hand rankings. Can only use 5 cards
-        handtypes = player1.hand.hand_types
-        player1_best_hand = player1.hand.best()
-        player2_best_hand = player2.hand.best()
-        if handtypes.index(player1_best_hand[0]) > handtypes.index(player2_best_hand[0]):
-            return player2
+        # The strength includes the type of hand and all the kickers, so equal strengths are a true draw
+        player1_strength = player1.hand.strength()
+        player2_strength = player2.hand.strength()
 
-        elif handtypes.index(player1_best_hand[0]) < handtypes.index(player2_best_hand[0]):
+        if player1_strength > player2_strength:
             return player1
-
-        # If it reaches this point, both players have the same type of hand
-
-        t = player1_best_hand[0]
-
-        if t == "High":
-            player1_values = player1.hand.hand_values()[::-1]
-            player2_values = player2.hand.hand_values()[::-1]
-
-            i = 0
-            while i < 5 and player1_values[i] == player2_values[i]:
-                i += 1
-
-            if i < 5:
-                if "23456789TJQKA".index(player1_values[i]) > "23456789TJQKA".index(player2_values[i]):
-                    return player1
-                elif "23456789TJQKA".index(player1_values[i]) < "23456789TJQKA".index(player2_values[i]):
-                    return player2
-
-        if t == "Pair":
-            player1_pair = player1_best_hand[1]
-            player2_pair = player2_best_hand[1]
-
-            if "23456789TJQKA".index(player1_pair) > "23456789TJQKA".index(player2_pair):
-                return player1
-            elif "23456789TJQKA".index(player1_pair) < "23456789TJQKA".index(player2_pair):
-                return player2
-
-            # Know kickers are used
-
-            player1_values = player1.hand.hand_values()[::-1]
-            player2_values = player2.hand.hand_values()[::-1]
-
-            player1_values = list(player1_values)
-            player1_values.remove(player1_pair)
-            player1_values.remove(player1_pair)
-            player1_values = "".join(player1_values)
-
-            player2_values = list(player2_values)
-            player2_values.remove(player2_pair)
-            player2_values.remove(player2_pair)
-            player2_values = "".join(player2_values)
-
-            i = 0
-            while i < 3 and player1_values[i] == player2_values[i]:
-                i += 1
-
-            if "23456789TJQKA".index(player1_values[i]) > "23456789TJQKA".index(player2_values[i]):
-                return player1
-            elif "23456789TJQKA".index(player1_values[i]) < "23456789TJQKA".index(player2_values[i]):
-                return player2
-
-        if t == "2Pair":
-            player1_2pair = player1_best_hand[1]
-            player2_2pair = player2_best_hand[1]
-
-            if get_value(player1_2pair[0]) > get_value(player2_2pair[0]):
-                return player1
-            elif get_value(player1_2pair[0]) < get_value(player2_2pair[0]):
-                return player2
-
-            if get_value(player1_2pair[1]) > get_value(player2_2pair[1]):
-                return player1
-            elif get_value(player1_2pair[1]) < get_value(player2_2pair[1]):
-                return player2
-
-            player1_values = player1.hand.hand_values()[::-1]
-            player2_values = player2.hand.hand_values()[::-1]
-
-            player1_values = list(player1_values)
-            player1_values.remove(player1_2pair[0])
-            player1_values.remove(player1_2pair[0])
-            player1_values.remove(player1_2pair[1])
-            player1_values.remove(player1_2pair[1])
-            player1_values = "".join(player1_values)
-
-            player2_values = list(player2_values)
-            player2_values.remove(player2_2pair[0])
-            player2_values.remove(player2_2pair[0])
-            player2_values.remove(player2_2pair[1])
-            player2_values.remove(player2_2pair[1])
-            player2_values = "".join(player2_values)
-
-            if get_value(player1_values[0]) > get_value(player2_values[0]):
-                return player1
-            elif get_value(player1_values[0]) < get_value(player2_values[0]):
-                return player2
-
-        if t == "3OAK":
-            if get_value(player1_best_hand[1]) > get_value(player2_best_hand[1]):
-                return player1
-            if get_value(player1_best_hand[1]) < get_value(player2_best_hand[1]):
-                return player2
-
-            player1_values = player1.hand.hand_values()[::-1]
-            player2_values = player2.hand.hand_values()[::-1]
-
-            player1_values = list(player1_values)
-            player1_values.remove(player1_best_hand[1])
-            player1_values.remove(player1_best_hand[1])
-            player1_values.remove(player1_best_hand[1])
-            player1_values = "".join(player1_values)
-
-            player2_values = list(player2_values)
-            player2_values.remove(player2_best_hand[1])
-            player2_values.remove(player2_best_hand[1])
-            player2_values.remove(player2_best_hand[1])
-            player2_values = "".join(player2_values)
-
-            i = 0
-            while i < len(player1_values) - 1 and player1_values[i] == player2_values[i]:
-                i += 1
-
-            if get_value(player1_values[i]) > get_value(player2_values[i]):
-                return player1
-            elif get_value(player1_values[i]) < get_value(player2_values[i]):
-                return player2
-
-        if t == "Straight":
-            ranking = ["2345A", "23456", "34567", "45678", "56789", "6789T", "789TJ", "89TJQ", "9TJQK", "234KA",
-                       "23QKA", "2JQKA", "TJQKA"]
-
-            if ranking.index(player1_best_hand[1]) > ranking.index(player2_best_hand[1]):
-                return player1
-            if ranking.index(player1_best_hand[1]) < ranking.index(player2_best_hand[1]):
-                return player2
-
-            player1_values = list(player1.hand.hand_values()[::-1])
-            player2_values = list(player2.hand.hand_values()[::-1])
-
-        if t == "Flush":
-            player1_flush = player1_best_hand[1]
-            player2_flush = player2_best_hand[1]
-
-            i = 0
-            while i < 5 and player1_flush[i] == player2_flush[i]:
-                i += 1
-
-            if i < 5:
-                if get_value(player1_flush[i]) > get_value(player2_flush[i]):
-                    return player1
-                if get_value(player1_flush[i]) < get_value(player2_flush[i]):
-                    return player2
-
-            """
-            # This code make it so that flushes have much stricter bar for drawing
-            
-            # Eg.  say you have a flush on the table of AH, 6H, 5H, 9H, JH  with no other players having any other
-            # Hearts. If this code isn't used, then you don't split the pot, UNLESS all players have idetical 
-            # values of cards.
-            # I think that this is wrong, which is why it's commented
-            
-            
-            
-            player1_values = list(player1.hand.hand_values()[::-1])
-            player2_values = list(player2.hand.hand_values()[::-1])
-
-            for item in player1_best_hand[1]:
-                player1_values.remove(item)
-                player2_values.remove(item)
-
-            i = 0
-            while i < len(player1_values) - 1 and player1_values[i] == player2_values[i]:
-                i += 1
-
-            if get_value(player1_values[i]) > get_value(player2_values[i]):
-                return player1
-            elif get_value(player1_values[i]) < get_value(player2_values[i]):
-                return player2
-            """
-
-        if t == "FullH":
-            if get_value(player1_best_hand[1][0]) > get_value(player2_best_hand[1][0]):
-                return player1
-            if get_value(player1_best_hand[1][0]) < get_value(player2_best_hand[1][0]):
-                return player2
-
-            if get_value(player1_best_hand[1][1]) > get_value(player2_best_hand[1][1]):
-                return player1
-            if get_value(player1_best_hand[1][1]) < get_value(player2_best_hand[1][1]):
-                return player2
-
-        if t == "4OAK":
-            if get_value(player1_best_hand[1]) > get_value(player2_best_hand[1]):
-                return player1
-            if get_value(player1_best_hand[1]) < get_value(player2_best_hand[1]):
-                return player2
-
-            player1_values = list(player1.hand.hand_values())
-            player2_values = list(player2.hand.hand_values())
-
-            for i in range(4):
-                player1_values.remove(player1_best_hand[1])
-                player2_values.remove(player2_best_hand[1])
-
-            if get_value(player1_values[0]) > get_value(player2_values[0]):
-                return player1
-            if get_value(player1_values[0]) < get_value(player2_values[0]):
-                return player2
-
-        if t == "StraightF":
-            s_ranking = ["2345A", "23456", "34567", "45678", "56789", "6789T", "789TJ", "89TJQ", "9TJQK"]
-
-            if player1_best_hand[1] in s_ranking:
-                player1_ranking = s_ranking.index(player1_best_hand[1])
-            else:
-                player1_ranking = 20
-
-            if player2_best_hand[1] in s_ranking:
-                player2_ranking = s_ranking.index(player2_best_hand[1])
-            else:
-                player2_ranking = 20
-
-            if player1_ranking > player2_ranking:
-                return player1
-
-            if player1_ranking < player2_ranking:
-                return player2
+        if player1_strength < player2_strength:
+            return player2
 
         return [player1, player2]
 
-    def best_player(self, player_list):
+    @staticmethod
+    def best_player(player_list):
         """Returns the player with the best hand from the player_list or a list of player if they have drawn"""
         if len(player_list) == 0:
             return False
         if len(player_list) == 1:
             return player_list[0]
 
-        winners = [player_list[0]]
-        for player in player_list[1:]:
-            b = self.best_of_2(player, winners[0])
-            if type(b) is list:
-                winners.append(player)
-            elif b != winners[0]:
-                winners = [b]
+        strengths = [player.hand.strength() for player in player_list]
+        best_strength = max(strengths)
+        winners = [player for player, strength in zip(player_list, strengths) if strength == best_strength]
 
         if len(winners) == 1:
             return winners[0]
@@ -1429,15 +1203,15 @@ class Table:
     def send_cards(self, players):
         """Sends the card information to the human players"""
         if not players:
-            print("The players list doesn't seem to exist. Check input")
+            self.say("The players list doesn't seem to exist. Check input")
             raise Exception("Error in Table.send_cards")
 
         cards = [[card.face for card in p.hand.on_table] for p in players]
         # cards should look something like [["JC", "KD", "3C"], ["JC", "KD", "3C"], ["JC", "KD, "3C"]]
         # All items in cards should be idenitcal, this section checks it
         if min(cards) != max(cards):
-            print("The cards don't seem to match")
-            print("Cards:", cards)
+            self.say("The cards don't seem to match")
+            self.say("Cards:", cards)
             raise Exception("Cards don't seem to match, check before error")
 
         cards_to_send = cards[0]
@@ -1448,16 +1222,14 @@ class Table:
         players_left = []
         for player in [p for p in players if isinstance(p, Human)]:
             # Send bytes to players
-            try:
-                player.send_summary(bytes_to_send)
-            except ConnectionResetError:
+            if not player.send_summary(bytes_to_send):
                 players_left.append(player)
 
         return players_left
 
     def create_ai(self):
-        a = AI(self.min_bet, [p.name for p in self.player_list + self.players_to_add])
-        print(f"{a.name} joined")
+        a = self.ai_factory(self.min_bet, [p.name for p in self.player_list + self.players_to_add])
+        self.say(f"{a.name} joined")
         self.add_player(a)
 
     @staticmethod
@@ -1469,9 +1241,54 @@ class Table:
         return [0] * (len(active_players) - 1) == sorted([p.money for p in active_players])[:-1]
         # Translates to: If all but one player has any money?
 
-    def betting_round(self, active=None, min_bet=10, start=False):
+    def speculate(self, players):
         """
-        Completes a betting round
+        Called when a street is dealt. Starts working out the equity of each AI still in the hand in the background,
+        against the number of opponents now and one fewer, so it is ready when the AI is asked. Only done when there
+        are humans in the hand, as that is when the table has time to spare
+        """
+        if self.speculator is None or not [p for p in players if isinstance(p, Human)]:
+            return
+
+        opponents = len(players) - 1
+        hands = [([card.id for card in ai.hand.hole], [card.id for card in ai.hand.on_table])
+                 for ai in players if isinstance(ai, AI)]
+        self.speculator.start(self, hands, range(opponents, max(opponents - 2, 0), -1))
+
+    async def ask_human(self, player, min_bet):
+        """
+        Asks a human for a bet on the clock. They have action_time seconds, and then their time bank. Every other
+        human is sent the clock as {"Clock": [name, seconds]}, so they can see who is acting and for how long
+        """
+        time_allowed = self.action_time + player.time_bank
+        for other in self.player_list:
+            if isinstance(other, Human) and other is not player:
+                other.send_summary({"Clock": [player.name, Wire.tenths(time_allowed)]})
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        res = await player.ask_bet(min_bet, time_allowed)
+        used = loop.time() - started
+        player.time_bank = max(player.time_bank - max(used - self.action_time, 0), 0)
+        return res
+
+    async def ask_player(self, player, min_bet):
+        """
+        Asks a player for a bet. Humans are waited for without blocking the event loop, and AIs think in the executor
+        so their simulations don't stop the table from serving connections
+        """
+        if isinstance(player, Human):
+            return await self.ask_human(player, min_bet)
+        if self.executor is None:  # Headless, so there is nothing else to serve
+            return player.ask_bet(min_bet)
+        if self.speculator is None:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, player.ask_bet, min_bet)
+        with self.speculator.paused(self):
+            return await asyncio.get_running_loop().run_in_executor(self.executor, player.ask_bet, min_bet)
+
+    async def betting_round(self, active=None, min_bet=10, start=False, actions=None):
+        """
+        Completes a betting round. If actions is a list, each action made is added to it
         returns tuple: (players still in the game, total of bets in the game)
         """
         if active is None:
@@ -1502,18 +1319,16 @@ class Table:
 
         if start:  # Is this the first betting round i.e do we need to distribute the blinds
             blinds = [int(min_bet / 2), min_bet]
+            started = Timing.TIMINGS.start()
             for hum_player in [h for h in self.player_list if isinstance(h, Human)]:
                 cards = hum_player.hand.in_play()
                 cards = [c.face for c in cards]
                 cards = cards[0] + cards[1]  # Four digit string of a players cards eg. 3DJS, which, in this case, is
                 # the three of diamonds and the jack of spades
 
-                try:
-                    hum_player.send_summary([cards, [a.name for a in active[:2]], min_bet])
-                except ConnectionResetError:
-                    starting_players.remove(hum_player)
-                    del player_bets[hum_player]
-            sleep(1)
+                # A player who can't be sent their cards still pays their blind, and quits when they are asked to bet
+                hum_player.send_summary([cards, [a.name for a in active[:2]], min_bet])
+            Timing.TIMINGS.stop("send_summary", started)
 
             for player, blind_amount in zip(active[:2], blinds):
                 if player.money < blind_amount:
@@ -1523,7 +1338,7 @@ class Table:
                     player_bets[player] += blind_amount
                     player.bet(blind_amount)
 
-            print("Blinds: ", [p.name for p in active[:2]])
+            self.say("Blinds: ", [p.name for p in active[:2]])
 
             for ai in [player for player in active if isinstance(player, AI)]:
                 ai.blinds(active[:2], min_bet)
@@ -1534,14 +1349,17 @@ class Table:
         count = 0
         while True:
             count += 1
-            print("Round:", count, "Order", [p.name for p in active])
+            self.say("Round:", count, "Order", [p.name for p in active])
             if count > 20:
                 # debug = True  # This is for testing reasons
                 pass
             if active[0].money > 0:
-                print("Asking", active[0].name)
-                res = active[0].ask_bet(max(player_bets.values()) - player_bets[active[0]])
+                self.say("Asking", active[0].name)
+                started = Timing.TIMINGS.start()
+                res = await self.ask_player(active[0], max(player_bets.values()) - player_bets[active[0]])
+                Timing.TIMINGS.stop("ask_bet " + type(active[0]).__name__, started)
 
+                started = Timing.TIMINGS.start()
                 for player in active:
                     if isinstance(player, Human):
                         did_send = player.update(res)
@@ -1549,8 +1367,9 @@ class Table:
                             res = {"N": res["N"], "Act": "Q"}
                     else:
                         player.update(res)
-
-                sleep(1)
+                Timing.TIMINGS.stop("update", started)
+                if actions is not None:
+                    actions.append(res)
 
                 if active[0] not in asked_players:
                     asked_players.add(active[0])
@@ -1590,10 +1409,10 @@ class Table:
 
             return active, sum(player_bets.values()), True
 
-    def round(self, count):
+    async def round(self, count):
         """ Plays a round of poker """
-        print("\nCode:", self.code)
-        sleep(3)  # Stops message overlap on slow connections.
+        round_started = Timing.TIMINGS.start()
+        self.say("\nCode:", self.code)
         pot = 0
         d = Deck(True)
 
@@ -1601,95 +1420,124 @@ class Table:
             ai.begin_round(self.player_list)
 
         for hum in [h for h in self.player_list if isinstance(h, Human)]:
-            hum.send_summary({"Start Round": self.game_summary()})
+            hum.time_bank = min(hum.time_bank + BANK_REFILL, TIME_BANK)
 
-        sleep(1)  # This is so that there is a delay in sending the "Start Round" and the next round at the same time
+        started = Timing.TIMINGS.start()
+        for hum in [h for h in self.player_list if isinstance(h, Human)]:
+            hum.send_summary({"Start Round": self.game_summary()})
+        Timing.TIMINGS.stop("send_summary", started)
 
         for player in self.player_list:
             player.hand.give_hole(d.take_n(2))
+        self.speculate(self.player_list)
+
+        seats = self.player_list[:]  # Players in the hand, for the hand history
+        seated = [{"name": p.name, "ai": isinstance(p, AI), "cockyness": getattr(p, "cockyness", 0), "money": p.money,
+                   "hole": [card.id for card in p.hand.hole]} for p in seats]
+        streets = [[] for _ in HandHistory.STREETS] if self.history is not None else [None] * 4
 
         table_cards = d.take_n(5)
 
         # input("First Betting round...")
-        print("First Betting round...")
+        self.say("First Betting round...")
 
-        results = self.betting_round(start=True, min_bet=self.min_bet)
+        started = Timing.TIMINGS.start()
+        results = await self.betting_round(start=True, min_bet=self.min_bet, actions=streets[0])
+        Timing.TIMINGS.stop("street preflop", started)
         active_players = results[0]
         pot += results[1]
         for player in self.player_list:
             player.add_flop(table_cards[:3])
+        self.speculate(active_players)
 
         if not self.non_round(active_players):
+            started = Timing.TIMINGS.start()
             left = self.send_cards(active_players)
+            Timing.TIMINGS.stop("send_summary", started)
             for p in left:
                 self.player_list.remove(p)
                 active_players.remove(p)
 
         # input("Second Betting round...")
-        print("Second Betting round...")
-        results = self.betting_round(active=active_players, min_bet=0)
+        self.say("Second Betting round...")
+        started = Timing.TIMINGS.start()
+        results = await self.betting_round(active=active_players, min_bet=0, actions=streets[1])
+        Timing.TIMINGS.stop("street flop", started)
         active_players = results[0]
         pot += results[1]
         for player in self.player_list:
             player.add_turn(table_cards[3])
+        self.speculate(active_players)
 
         if not self.non_round(active_players):
+            started = Timing.TIMINGS.start()
             left = self.send_cards(active_players)
+            Timing.TIMINGS.stop("send_summary", started)
             for p in left:
                 self.player_list.remove(p)
                 active_players.remove(p)
 
         # input("Third Betting round...")
-        print("Third Betting round...")
-        results = self.betting_round(active=active_players, min_bet=0)
+        self.say("Third Betting round...")
+        started = Timing.TIMINGS.start()
+        results = await self.betting_round(active=active_players, min_bet=0, actions=streets[2])
+        Timing.TIMINGS.stop("street turn", started)
         active_players = results[0]
         pot += results[1]
         for player in self.player_list:
             player.add_river(table_cards[4])
+        self.speculate(active_players)
 
         if not self.non_round(active_players):
+            started = Timing.TIMINGS.start()
             left = self.send_cards(active_players)
+            Timing.TIMINGS.stop("send_summary", started)
             for p in left:
                 self.player_list.remove(p)
                 active_players.remove(p)
 
         # input("Final Round...")
-        print("Final Round...")
-        results = self.betting_round(active=active_players, min_bet=0)
+        self.say("Final Round...")
+        started = Timing.TIMINGS.start()
+        results = await self.betting_round(active=active_players, min_bet=0, actions=streets[3])
+        Timing.TIMINGS.stop("street river", started)
         active_players = results[0]
         pot += results[1]
 
+        started = Timing.TIMINGS.start()
         b = self.best_player(active_players)
         if isinstance(b, Player):
             best_hand_type = b.hand.best()[0]
         else:
             best_hand_type = b[0].hand.best()[0]
+        Timing.TIMINGS.stop("showdown", started)
 
         for ai in [a for a in self.player_list if isinstance(a, AI)]:
             ai.update_win_loss(b)
 
-        print("\n\n\n")
+        self.say("\n\n\n")
         if type(b) is not list:
-            print("Table: " + self.player_list[0].hand.str_hand(table_cards))
+            self.say("Table: " + self.player_list[0].hand.str_hand(table_cards))
             for player in active_players:
-                print(player.name + ": " + player.hand.str_hand(player.hand.hole))
-            print("Best:", b.name, "with a", best_hand_type)
+                self.say(player.name + ": " + player.hand.str_hand(player.hand.hole))
+            self.say("Best:", b.name, "with a", best_hand_type)
             pass
 
         if type(b) is list:
-            print("Table: " + self.player_list[0].hand.str_hand(table_cards))
+            self.say("Table: " + self.player_list[0].hand.str_hand(table_cards))
             for player in self.player_list:
-                print(player.name + ": " + player.hand.str_hand(player.hand.hole))
+                self.say(player.name + ": " + player.hand.str_hand(player.hand.hole))
 
             string = ""
             for item in b:
                 string += item.name + ", "
             string = string.strip(", ")
 
-            print("Draw between", string)
+            self.say("Draw between", string)
             pass
 
         active_players_cards = {p.name: "".join([c.face for c in p.hand.hole]) for p in active_players}
+        board = [card.id for card in active_players[0].hand.on_table]
         table_cards = "".join([card.face for card in active_players[0].hand.on_table])
 
         for player in self.player_list:
@@ -1713,7 +1561,11 @@ class Table:
         if isinstance(b, Player):
             b = [b]
 
+        if self.history is not None:
+            self.record_hand(seats, seated, streets, board, active_players, b, best_hand_type, pot)
+
         # Sends infomation to the human players about the state of the game
+        started = Timing.TIMINGS.start()
         for player in [p for p in self.player_list if isinstance(p, Human)]:
             ending_info = (  # Info about the end of a round of poker.
                 active_players_cards,
@@ -1735,51 +1587,193 @@ class Table:
             did_send = player.send_summary({"EndRound": ending_info})
             if not did_send:
                 self.player_list.remove(player)
-
-        sleep(1)
+        Timing.TIMINGS.stop("send_summary", started)
 
         if count % 5 == 0:
-            print("Updating min_bet to", self.min_bet * 2)
+            self.say("Updating min_bet to", self.min_bet * 2)
             self.min_bet *= 2
             self.min_bet = round_sig_figs(self.min_bet, 2)
 
         for player in self.player_list:
             if player.money < self.min_bet:
                 if isinstance(player, Human):
-                    try:
-                        player.send_summary({"NoMoney": ""})
-                    except ConnectionResetError:
-                        pass
+                    player.send_summary({"NoMoney": ""})  # They leave either way, so it doesn't matter if it isn't sent
                 self.player_list.remove(player)
-        sleep(1)
 
-        print("")
-        print("-" * 40)
-        print("Players remaining")
+        self.say("")
+        self.say("-" * 40)
+        self.say("Players remaining")
         for item in self.player_list:
-            print("{}: ${}".format(item.name, item.money))
+            self.say("{}: ${}".format(item.name, item.money))
 
-        sleep(1)  # Allows players to look at the result of the game
+        await self.pause(1)  # Allows players to look at the result of the game
 
-        print("Starting next round")
+        self.say("Starting next round")
+        Timing.TIMINGS.stop("round", round_started)
 
-    def play(self):
-        """Main fuction that plays poker on a table"""
+    def record_hand(self, seats, seated, streets, board, showdown, winners, hand_type, pot):
+        """
+        Adds a finished hand to the hand history. seated is the players' details from the start of the hand, in the
+        form HandHistory.encode takes, without their money at the end. The record is made here, and written to disk
+        in the background
+        """
+        for player, details in zip(seats, seated):
+            details["end_money"] = player.money
+        try:
+            record = HandHistory.encode(seated, self.min_bet, streets, board, [p.name for p in showdown],
+                                        [p.name for p in winners], hand_type, pot)
+        except ValueError as e:
+            print("Hand not written to the hand history:", e)
+            return
+        self.history.record(record)
+
+    async def play(self, executor=None, stop_when_empty=False):
+        """
+        Main fuction that plays poker on a table. Listens for new players at the same time, if the table has a socket,
+        and only plays rounds while a human is at the table.
+        executor runs the AI decisions, and can be shared between tables. If it is None the table makes its own.
+        If stop_when_empty is True, this returns once there are no humans left at the table or joining it
+        """
+        self._player_joined = asyncio.Event()
+        own_executor = executor is None
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix="AI") if own_executor else executor
+        own_speculator = self.speculator is None
+        if own_speculator:
+            self.speculator = Speculation.Speculator()
+        listener = asyncio.create_task(self.listen_for_new_players()) if self._socket else None
 
-        threading.Thread(target=self.listen_for_new_players).start()
+        try:
+            count = 1
+            while True:
+                while len([p for p in self.player_list + self.players_to_add if isinstance(p, AI)]) < 3:
+                    self.create_ai()
+
+                if self.players_to_add:
+                    self.player_list.extend(self.players_to_add)
+                    self.players_to_add = []
+
+                if True in [isinstance(player, Human) for player in self.player_list]:
+                    await self.round(count)
+                    count += 1
+                elif stop_when_empty and self.human_count() == 0:
+                    return
+                else:
+                    self._player_joined.clear()
+                    await self._player_joined.wait()
+        finally:
+            if listener is not None:
+                listener.cancel()
+            if own_executor:
+                self.executor.shutdown(wait=False)
+            self.executor = None
+            if own_speculator:
+                self.speculator.shutdown()
+                self.speculator = None
+            else:
+                self.speculator.forget(self)
 
-        count = 1
-        while True:
-            while len([p for p in self.player_list + self.players_to_add if isinstance(p, AI)]) < 3:
+    def play_headless(self, rounds, ai_count=3, after_hand=None):
+        """
+        Plays a number of rounds between AI players only, on a headless table. Bankrupt AIs are replaced, just like in
+        play. If after_hand is given, it is called with the table after each round. Returns the number of rounds played
+        """
+        return asyncio.run(self._play_headless(rounds, ai_count, after_hand))
+
+    async def _play_headless(self, rounds, ai_count, after_hand=None):
+        for _ in range(rounds):
+            self.rounds_played += 1
+            while len([p for p in self.player_list + self.players_to_add if isinstance(p, AI)]) < ai_count:
                 self.create_ai()
 
             if self.players_to_add:
                 self.player_list.extend(self.players_to_add)
                 self.players_to_add = []
 
-            if True in [isinstance(player, Human) for player in self.player_list]:
-                self.round(count)
-                count += 1
+            await self.round(self.rounds_played)
+            if after_hand is not None:
+                after_hand(self)
+
+        return rounds
+
+
+class Lobby:
+    """
+    Hosts many tables in one process. The lobby owns the listening socket, sends each new player to a table with a free
+    seat, and makes new tables and closes empty ones as players come and go.
+
+    The AI decisions of every table run in one shared pool of threads. Each table only waits on one AI at a time, and
+    the pool runs them in the order they were asked for, so a table with slow AIs can't starve the others
+    """
+
+    def __init__(self, max_humans=6, max_tables=50, ai_workers=None, history_dir=None):
+        """
+        max_humans is the most humans at each table (as well as the 3 AIs), max_tables the most tables at once and
+        ai_workers the number of threads running AI decisions, which defaults to the CPU count. If history_dir is
+        given, every hand is written to a hand history there (see HandHistory)
+        """
+        self._socket, self.code = server_socket()
+        self.max_humans = max_humans
+        self.max_tables = max_tables
+        self.tables = []
+        self.executor = ThreadPoolExecutor(ai_workers or os.cpu_count(), thread_name_prefix="AI")
+        self.speculator = Speculation.Speculator()
+        self.history = HandHistory.HandHistory(history_dir) if history_dir else None
+
+    def free_table(self):
+        """
+        Returns the fullest table with a free seat, so players are not spread thinly, making a new table if they are
+        all full. Returns None if there are already max_tables full tables
+        """
+        open_tables = [table for table in self.tables if table.admission_error() is None]
+        if open_tables:
+            return max(open_tables, key=Table.human_count)
+
+        if len(self.tables) >= self.max_tables:
+            return None
+
+        table = Table(create_socket=False)
+        table.code = self.code
+        table.max_humans = self.max_humans
+        table.speculator = self.speculator
+        table.history = self.history
+        self.tables.append(table)
+        asyncio.create_task(self.run_table(table))
+        print(f"Opened a table, {len(self.tables)} tables open")
+        return table
+
+    async def run_table(self, table):
+        """Plays a table until every human has left it, then closes it"""
+        try:
+            await table.play(self.executor, stop_when_empty=True)
+        finally:
+            self.tables.remove(table)
+            print(f"Closed a table, {len(self.tables)} tables open")
+
+    async def join(self, reader, writer):
+        """Handles a new connection by sending it to a table"""
+        if sum(table.joining for table in self.tables) >= MAX_PENDING:
+            refuse(writer, "Too many players joining, try again soon")
+            return
+
+        table = self.free_table()
+        if table is None:
+            refuse(writer, "Server full")
+            return
+
+        await table.make_human_player(reader, writer)
+
+    async def serve(self):
+        """Accepts players until stopped"""
+        print("Code:", self.code)
+        server = await asyncio.start_server(self.join, sock=self._socket)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.executor.shutdown(wait=False)
+            self.speculator.shutdown()
+            if self.history is not None:
+                self.history.close()
 
 
 def stringToCards(string):
@@ -1807,8 +1801,40 @@ class Cheater:
         self.ai.hand.clear()
         print()
 
+    @staticmethod
+    def range_cheat():
+        """
+        Works out the equity of a range against another range, such as "QQ+, AKs" against "22+, ATs+, KQo" (see
+        Range.parse). A single hand can be typed as its cards, such as AHKH
+        """
+        try:
+            mine = Range.parse(input("Range: "))
+            theirs = Range.parse(input("Against: "))
+            board = [card.id for card in stringToCards(input("Table: "))]
+            win, draw, boards = Range.equity(mine, theirs, board)
+        except ValueError as e:
+            print("Can't work that out:", e)
+        else:
+            print(f"Win: {win:.2%}  Draw: {draw:.2%}  Equity: {win + draw / 2:.2%}  ({boards} boards)")
+        print()
+
 
 if __name__ == "__main__":
-    c = Cheater()
-    while True:
-        c.cheat()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Runs a poker server")
+    parser.add_argument("--cheat", action="store_true", help="work out the equity of hands typed in instead")
+    parser.add_argument("--range", action="store_true", help="with --cheat, work out the equity of ranges of hands")
+    parser.add_argument("--max-humans", type=int, default=6, help="most humans at each table")
+    parser.add_argument("--max-tables", type=int, default=50, help="most tables at once")
+    parser.add_argument("--history", metavar="DIR", help="write every hand to a hand history in DIR")
+    args = parser.parse_args()
+
+    Equity.use_process_pool()  # Spreads the simulations over all the CPUs
+    if args.cheat and args.range:
+        while True:
+            Cheater.range_cheat()
+    elif args.cheat:
+        c = Cheater()
+        while True:
+            c.cheat()
+    else:
+        asyncio.run(Lobby(args.max_humans, args.max_tables, history_dir=args.history).serve())
\ No newline at end of file
@@ -0,0 +1,217 @@
+"""
+Suit isomorphism. Swapping the suits around doesn't change how strong a hand is, so AH KH on 2H 7C 9D plays the same as
+AS KS on 2S 7D 9C. This module maps hole cards and a board to one canonical version of them, so caches and tables can
+keep one entry for all of the hands that are the same up to suits.
+
+The order of the board cards is also ignored, as it doesn't matter for working out who wins.
+Cards can be given as Card objects, strings such as 'QH' (the same as Card.face), or card ids as used by Evaluator.
+"""
+from bisect import bisect_right
+from itertools import product
+from math import comb
+
+import Evaluator
+
+
+def _to_ids(cards):
+    return [c if type(c) is int else Evaluator.card_id(c) for c in cards]
+
+
+def canonicalize(hole, board=()):
+    """
+    Returns (hole, board, suit_map) where hole and board are sorted lists of card ids with the suits relabeled into
+    the canonical order, and suit_map maps each old suit index to its new one.
+
+    Each suit gets a signature from the values it has in the hole and on the board. The suit with the largest
+    signature becomes "S", the next "C" and so on. Suits with equal signatures can be swapped without changing the
+    result, so every isomorphic hand ends up the same.
+    """
+    hole = _to_ids(hole)
+    board = _to_ids(board)
+
+    signatures = [0, 0, 0, 0]
+    for c in hole:
+        signatures[Evaluator.SUIT_OF[c]] |= Evaluator.BIT_OF[c] << 13
+    for c in board:
+        signatures[Evaluator.SUIT_OF[c]] |= Evaluator.BIT_OF[c]
+
+    order = sorted(range(4), key=lambda suit: signatures[suit], reverse=True)
+    suit_map = [0, 0, 0, 0]
+    for new_suit, old_suit in enumerate(order):
+        suit_map[old_suit] = new_suit
+
+    def relabel(c):
+        return suit_map[Evaluator.SUIT_OF[c]] * 13 + Evaluator.RANK_OF[c]
+
+    return sorted(map(relabel, hole)), sorted(map(relabel, board)), suit_map
+
+
+def encode(hole, board=()):
+    """
+    Returns the canonical key of the hole cards and board as an integer. Each card id takes 6 bits after a leading 1
+    bit, so the number of cards can be worked out when decoding
+    """
+    hole, board, _ = canonicalize(hole, board)
+    key = 1
+    for c in hole + board:
+        key = key << 6 | c
+    return key
+
+
+def decode(key):
+    """Returns the canonical (hole, board) lists of card ids from a key made by encode"""
+    cards = []
+    while key > 1:
+        cards.append(key & 63)
+        key >>= 6
+    cards.reverse()
+    return cards[:2], cards[2:]
+
+
+def decode_faces(key):
+    """Same as decode, but returns the cards as strings such as 'QH', which can be given to Card"""
+    hole, board = decode(key)
+    return [Evaluator.CARD_FACES[c] for c in hole], [Evaluator.CARD_FACES[c] for c in board]
+
+
+def _combination_rank(cards):
+    """Returns the position of a sorted list of distinct card ids in the colex order of all lists of that length"""
+    return sum(comb(c, i + 1) for i, c in enumerate(cards))
+
+
+def _combination_unrank(rank, size):
+    """Reverse of _combination_rank"""
+    cards = []
+    for i in range(size, 0, -1):
+        c = i - 1
+        while comb(c + 1, i) <= rank:
+            c += 1
+        cards.append(c)
+        rank -= comb(c, i)
+    cards.reverse()
+    return cards
+
+
+def _suit_configs(hole, board):
+    """Returns the (hole value mask, board value mask) of each of the 4 suits"""
+    configs = [[0, 0], [0, 0], [0, 0], [0, 0]]
+    for c in hole:
+        configs[Evaluator.SUIT_OF[c]][0] |= Evaluator.BIT_OF[c]
+    for c in board:
+        configs[Evaluator.SUIT_OF[c]][1] |= Evaluator.BIT_OF[c]
+    return [tuple(config) for config in configs]
+
+
+def _values(mask):
+    return [value for value in range(13) if mask >> value & 1]
+
+
+def _config_rank(hole_mask, board_mask):
+    """
+    Returns the position of one suit's hole and board values among every way of having that many of each in a suit.
+    The board values are ranked among the values not in the hole
+    """
+    free = [value for value in range(13) if not hole_mask >> value & 1]
+    board_positions = [free.index(value) for value in _values(board_mask)]
+    return _combination_rank(_values(hole_mask)) * comb(13 - bin(hole_mask).count("1"), len(board_positions)) + \
+        _combination_rank(board_positions)
+
+
+def _config_unrank(rank, hole_count, board_count):
+    """Reverse of _config_rank. Returns (hole value mask, board value mask)"""
+    hole_rank, board_rank = divmod(rank, comb(13 - hole_count, board_count))
+    hole_values = _combination_unrank(hole_rank, hole_count)
+    free = [value for value in range(13) if value not in hole_values]
+    board_values = [free[i] for i in _combination_unrank(board_rank, board_count)]
+    return sum(1 << v for v in hole_values), sum(1 << v for v in board_values)
+
+
+def _shape_groups(shape):
+    """Returns [((hole count, board count), number of suits with those counts)] of a shape, in a fixed order"""
+    return [(counts, shape.count(counts)) for counts in sorted(set(shape), reverse=True)]
+
+
+def _group_size(counts, suits):
+    """Returns the number of ways suits interchangeable suits can each have counts cards: multisets of configurations"""
+    hole_count, board_count = counts
+    configs = comb(13, hole_count) * comb(13 - hole_count, board_count)
+    return comb(configs + suits - 1, suits)
+
+
+_SHAPES = {}  # board size: (list of shapes, list of the first index of each shape, total size)
+
+
+def _shapes(board_size):
+    """
+    Returns the shapes of a round, the first index of each, and the number of indexes. A shape is how many hole and
+    board cards each suit has, as a sorted tuple of 4 (hole count, board count) pairs. Hands of different shapes can't
+    be the same up to suits, so each shape gets its own block of indexes
+    """
+    if board_size not in _SHAPES:
+        shapes = set()
+        for hole_suits in product(range(4), repeat=2):
+            for board_suits in product(range(4), repeat=board_size):
+                shape = tuple(sorted((hole_suits.count(suit), board_suits.count(suit)) for suit in range(4)))
+                if all(hole + board <= 13 for hole, board in shape):
+                    shapes.add(shape)
+
+        shapes = sorted(shapes)
+        starts = []
+        total = 0
+        for shape in shapes:
+            starts.append(total)
+            size = 1
+            for counts, suits in _shape_groups(shape):
+                size *= _group_size(counts, suits)
+            total += size
+        _SHAPES[board_size] = (shapes, starts, total)
+    return _SHAPES[board_size]
+
+
+def index(hole, board=()):
+    """
+    Returns the index of the hole and board among the hands of a round (0, 3, 4 or 5 board cards), below
+    index_size(len(board)). Hands that are the same up to suits have the same index, and every index is used, so a
+    table indexed by it has one entry for each canonical hand.
+
+    Each suit is described by its hole and board values (its configuration). The hands of one shape (see _shapes) are
+    ranked by the configurations of their suits, where suits with the same counts are interchangeable, so their
+    configurations are ranked as a multiset
+    """
+    hole, board = _to_ids(hole), _to_ids(board)
+    configs = _suit_configs(hole, board)
+    counts = [(bin(h).count("1"), bin(b).count("1")) for h, b in configs]
+    shapes, starts, _ = _shapes(len(board))
+    shape = tuple(sorted(counts))
+
+    i = 0
+    for group_counts, suits in _shape_groups(shape):
+        ranks = sorted(_config_rank(*config) for config, c in zip(configs, counts) if c == group_counts)
+        # A multiset of ranks is ranked as the set of rank + position
+        i = i * _group_size(group_counts, suits) + _combination_rank([r + n for n, r in enumerate(ranks)])
+    return starts[shapes.index(shape)] + i
+
+
+def unindex(i, board_size):
+    """Returns the canonical (hole, board) lists of card ids, the same as from canonicalize, for an index"""
+    shapes, starts, _ = _shapes(board_size)
+    number = bisect_right(starts, i) - 1
+    shape = shapes[number]
+    i -= starts[number]
+
+    configs = []
+    for group_counts, suits in reversed(_shape_groups(shape)):
+        i, group_rank = divmod(i, _group_size(group_counts, suits))
+        ranks = [r - n for n, r in enumerate(_combination_unrank(group_rank, suits))]
+        configs += [_config_unrank(rank, *group_counts) for rank in ranks]
+
+    # Suits are named in signature order, the same as canonicalize does
+    configs.sort(key=lambda config: config[0] << 13 | config[1], reverse=True)
+    hole = [suit * 13 + value for suit, (hole_mask, _) in enumerate(configs) for value in _values(hole_mask)]
+    board = [suit * 13 + value for suit, (_, board_mask) in enumerate(configs) for value in _values(board_mask)]
+    return sorted(hole), sorted(board)
+
+
+def index_size(board_size):
+    """Returns the number of hands of a round (0, 3, 4 or 5 board cards) that are different up to suits"""
+    return _shapes(board_size)[2]
@@ -1,21 +1,24 @@
 import House
+import Framing
+import Wire
 import socket
-import json
 import random
 from time import sleep
 
 
 class MyPlayer:
-    def __init__(self, testing=False, home_ip=False):
+    def __init__(self, testing=False, home_ip=False, wire="binary"):
+        """wire is the encoding to ask the server for (see Wire). The server may answer with JSON instead"""
         self._my_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         if home_ip:  # Is the game hosted on the machine of the player?
             self._my_socket.connect((socket.gethostname(), 54321))
         else:
             self.enter_ip()
+        self._connection = Framing.FramedSocket(self._my_socket)  # Sends and receives whole messages
 
         self.game_summary = [0, []]  # List of players
         self.name = ""
-        self.set_up_name(testing)
+        self.set_up_name(testing, wire)
         self.hand = House.Hand()
 
     def enter_ip(self):
@@ -43,11 +46,15 @@ class MyPlayer:
                 print(coded_ip, "not correct! try again")
                 continue
 
-    def set_up_name(self, test=False):
+    def set_up_name(self, test=False, wire="json"):
         """To be called when a MyPlayer object is created, sets up the name with the sever,
-        and gives the first summary. test to set the a defult name"""
+        and gives the first summary. test to set the a defult name. wire is the encoding to ask for"""
         name_choice = ""
-        mes = self._my_socket.recv(512).decode()
+        mes = self._connection.receive()
+        if type(mes) is dict and "Error" in mes:
+            print("Couldn't join because", mes["Error"])
+            quit()
+
         if mes == "Send Name":
             mes = {"Accepted": False}
             while not mes["Accepted"]:
@@ -61,21 +68,21 @@ class MyPlayer:
                 else:
                     name_choice = input("Name > ")
 
-                self._my_socket.send(json.dumps({"MyName": name_choice}).encode())
-                mes = self._my_socket.recv(512).decode()
+                self._connection.send({"MyName": name_choice, "Wire": wire})
                 try:
-                    mes = json.loads(mes)
-                except json.decoder.JSONDecodeError:
-                    mes = {"Accepted": False}
+                    mes = self._connection.receive()
+                except ValueError:
+                    mes = {"Accepted": False, "Error": "Not valid dict"}
 
                 if not mes["Accepted"]:
                     print("Name not accepted because", mes["Error"])
 
-        mes = self._my_socket.recv(2048).decode()
+            # Everything after the name is accepted uses the encoding the server chose
+            self._connection.codec = Wire.make_codec(mes.get("Wire", "json"))
+
         try:
-            mes = json.loads(mes)
-        except json.decoder.JSONDecodeError:
-            print("Decode error in sending summary\nmes:", mes)
+            mes = self._connection.receive()
+        except ValueError:
             mes = [0, []]
             print("Decode error in sending summary")
 
@@ -87,12 +94,17 @@ class MyPlayer:
 
     def quit_poker(self):
         self.send_to({"N": self.name, "Act": "Q"})
-        self._my_socket.close()
+        self._connection.close()
         quit()
 
     def send_to(self, x):
         """Send a dictioary to the sever"""
-        self._my_socket.send(json.dumps(x).encode())
+        self._connection.send(x)
+
+    def send_answer(self, command, res):
+        """Sends an answer to a MakeBet command, with the number of the question it answers"""
+        res["S"] = command.get("S", 0)
+        self.send_to(res)
 
     def make_bet(self, command):
         """To be called when the command to make a bet is resivened"""
@@ -109,6 +121,9 @@ class MyPlayer:
             return None
 
         # command is in the correct format
+        if "T" in command:
+            print(f"You have {command['T']:.0f} seconds to act, or you will check or fold")
+
         if command["MakeBet"] < command["yMoney"]:
             # will ask the player to make a bet between the min and max values
             made_error = False
@@ -120,7 +135,7 @@ class MyPlayer:
                 if inp and inp[0].lower() == "f":
                     # Sends the fold command to the server
                     try:
-                        self.send_to({"N": self.name, "Act": "F"})
+                        self.send_answer(command, {"N": self.name, "Act": "F"})
                         break
                     except ConnectionAbortedError:
                         print("Connection timed out. Close the program")
@@ -141,13 +156,11 @@ class MyPlayer:
                     continue
 
                 my_bet = {"N": self.name, "Act": "B", "Am": inp}
-                self.send_to(my_bet)
-                mes = self._my_socket.recv(512).decode()
-
+                self.send_answer(command, my_bet)
                 try:
-                    mes = json.loads(mes)
-                except json.JSONDecodeError:
-                    print("mes makes a json decoding error", mes)
+                    mes = self._connection.receive()
+                except ValueError:
+                    print("mes makes a decoding error")
                     mes = ""
                     made_error = True
 
@@ -156,6 +169,10 @@ class MyPlayer:
                     print("I don't know now")
                     made_error = True
 
+                if "TimedOut" in mes:
+                    self.timed_out(mes["TimedOut"])
+                    break
+
                 if "Error" in mes:
                     print("Not accepted because", mes["Error"])
                     made_error = True
@@ -174,30 +191,37 @@ class MyPlayer:
                     continue
 
                 if res[0].lower() == "y":
-                    self.send_to({"N": self.name, "Act": "B", "Am": command["yMoney"]})
+                    self.send_answer(command, {"N": self.name, "Act": "B", "Am": command["yMoney"]})
                 elif res[0].lower() == "q":
                     self.quit_poker()
                 else:
-                    self.send_to({"N": self.name, "Act": "F"})
-
-                mes = self._my_socket.recv(512)
+                    self.send_answer(command, {"N": self.name, "Act": "F"})
 
                 try:
-                    mes = json.loads(mes)
-                except json.JSONDecodeError:
-                    print("Resoponce was not a json object:", mes)
+                    mes = self._connection.receive()
+                except ValueError:
+                    print("Resoponce could not be decoded")
                     raise Exception("Not json object")
 
                 if type(mes) is not dict:
                     print("mes not dict. Mes:", mes)
                     raise Exception("Mes not dict")
 
+                if "TimedOut" in mes:
+                    self.timed_out(mes["TimedOut"])
+                    break
+
                 if "Error" in mes:
                     print("Not accepted because", mes["Error"])
 
                 if "Accepted" in mes and mes["Accepted"]:
                     break
 
+    @staticmethod
+    def timed_out(res):
+        """Tells the player that they ran out of time, and what was done for them"""
+        print("Ran out of time, so you", "checked" if res["Act"] == "B" else "folded")
+
     @staticmethod
     def end_game(ending_info: tuple):
         """Displays and handles infomation form the end of the game"""
@@ -215,8 +239,7 @@ class MyPlayer:
         print("Round Starting")
         # print("Game summary:", self.game_summary)
 
-        blind_info = self._my_socket.recv(512).decode()
-        blind_info = json.loads(blind_info)
+        blind_info = self._connection.receive()
 
         print("Players:")
 
@@ -251,14 +274,12 @@ class MyPlayer:
         # Loop to listen to responces
         # print("Start listening")
         while True:
-            mes = self._my_socket.recv(2048).decode()
-            # print("Mes", len(mes), mes)  # Used for debugging
-
             try:
-                mes = json.loads(mes)
-            except json.JSONDecodeError:
-                print("resived command not a json object\nmes:", mes)
+                mes = self._connection.receive()
+            except ValueError:
+                print("resived command could not be decoded")
                 raise Exception("Resived command is not a json object")
+            # print("Mes", len(mes), mes)  # Used for debugging
 
             if "N" in mes and mes["N"] != self.name and "Act" not in mes:
                 print("I don't think that this should happen")
@@ -277,6 +298,12 @@ class MyPlayer:
             if "MakeBet" in mes:
                 self.make_bet(mes)
 
+            if "Clock" in mes:
+                print(f"{mes['Clock'][0]} has {mes['Clock'][1]:.0f} seconds to act")
+
+            if "TimedOut" in mes:
+                self.timed_out(mes["TimedOut"])
+
             if "cards" in mes:
                 cards_str = mes["cards"]
                 cards = [cards_str[i: i+2] for i in range(0, len(cards_str), 2)]
@@ -293,10 +320,9 @@ class MyPlayer:
     def play_poker(self):
         """Main function to run"""
         while True:
-            mes = self._my_socket.recv(512).decode()
             try:
-                mes = json.loads(mes)
-            except json.JSONDecodeError:
+                mes = self._connection.receive()
+            except ValueError:
                 mes = ""
 
             if "Start Round" in mes:
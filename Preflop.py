@@ -0,0 +1,187 @@
+"""
+Precomputed preflop equity. There are only 169 different starting hands once suits are ignored (13 pairs, 78 suited
+and 78 offsuit hands), so the win and draw probability of each against 1 to 9 random opponents can be worked out once
+and saved to a file. The AI then looks the answer up instead of running a simulation before the flop.
+
+Running this file generates the table. It is run in parallel, and can be stopped and started again without losing
+the hands already done. The table is then memory mapped when this module is imported, so lookups are O(1).
+
+File format (all little endian):
+    header: 4 bytes b"PFEQ", uint16 format version, uint8 max opponents, uint8 unused
+    records: 169 * max opponents records of (float32 win, float32 draw, uint32 sim count), ordered by hand class
+    then by number of opponents. A sim count of 0 means that record has not been worked out yet
+"""
+import argparse
+import mmap
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import Equity
+import Evaluator
+
+MAGIC = b"PFEQ"
+FORMAT_VERSION = 1
+MAX_OPPONENTS = 9
+HEADER = struct.Struct("<4sHBx")
+RECORD = struct.Struct("<ffI")
+CLASS_COUNT = 169
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "preflop_equity.bin")
+
+
+def hand_class(hole):
+    """
+    Returns the class index (0 to 168) of 2 hole card ids. The classes are a 13 by 13 grid: pairs are on the diagonal,
+    suited hands are at high * 13 + low and offsuit hands at low * 13 + high
+    """
+    value1, value2 = Evaluator.RANK_OF[hole[0]], Evaluator.RANK_OF[hole[1]]
+    high, low = max(value1, value2), min(value1, value2)
+    if Evaluator.SUIT_OF[hole[0]] == Evaluator.SUIT_OF[hole[1]]:
+        return high * 13 + low
+    return low * 13 + high
+
+
+def class_name(index):
+    """Returns the usual name of a hand class, such as 'AA', 'AKs' or '72o'"""
+    row, column = divmod(index, 13)
+    high, low = max(row, column), min(row, column)
+    name = Evaluator.VALUES[high] + Evaluator.VALUES[low]
+    if row == column:
+        return name
+    return name + ("s" if row > column else "o")
+
+
+def class_hole(index):
+    """Returns a pair of hole card ids that is in the given class"""
+    row, column = divmod(index, 13)
+    high, low = max(row, column), min(row, column)
+    if row > column:  # suited, both spades
+        return [high, low]
+    return [high, 13 + low]  # a spade and a club
+
+
+class PreflopTable:
+    """A memory mapped preflop equity table file"""
+
+    def __init__(self, path, writable=False):
+        """Opens a table file. If writable is True, records can be saved into it"""
+        self.path = path
+        self._file = open(path, "r+b" if writable else "rb")
+        access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+        self._map = mmap.mmap(self._file.fileno(), 0, access=access)
+
+        if len(self._map) < HEADER.size:
+            self.close()
+            raise ValueError(f"{path} is too short to be a preflop equity table")
+        magic, version, max_opponents = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} preflop equity table")
+
+        # A table cut short would make lookups raise struct.error, so it isn't used at all
+        expected = HEADER.size + RECORD.size * CLASS_COUNT * max_opponents
+        if len(self._map) != expected:
+            self.close()
+            raise ValueError(f"{path} is {len(self._map)} bytes, but a table for {max_opponents} opponents is "
+                             f"{expected} bytes")
+
+        self.max_opponents = max_opponents
+
+    @staticmethod
+    def create(path, max_opponents=MAX_OPPONENTS):
+        """Creates an empty table file, with every record not worked out yet"""
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, max_opponents))
+            f.write(bytes(RECORD.size * CLASS_COUNT * max_opponents))
+
+    @staticmethod
+    def open(path=DEFAULT_PATH):
+        """Returns the table at path, or None if there is no valid table there"""
+        try:
+            return PreflopTable(path)
+        except (OSError, ValueError):
+            return None
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def _offset(self, index, opponents):
+        return HEADER.size + RECORD.size * (index * self.max_opponents + opponents - 1)
+
+    def record(self, index, opponents):
+        """Returns (win, draw, sim count) for a hand class and number of opponents"""
+        return RECORD.unpack_from(self._map, self._offset(index, opponents))
+
+    def save(self, index, opponents, win, draw, sim_count):
+        """Saves a record. Only for tables opened as writable"""
+        RECORD.pack_into(self._map, self._offset(index, opponents), win, draw, sim_count)
+
+    def flush(self):
+        self._map.flush()
+
+    def lookup(self, hole, opponents):
+        """
+        Returns (win, draw, sim count) for 2 hole card ids against a number of opponents, or None if the table doesn't
+        have that record
+        """
+        if not 1 <= opponents <= self.max_opponents:
+            return None
+
+        win, draw, sim_count = self.record(hand_class(hole), opponents)
+        if sim_count == 0:
+            return None
+        return win, draw, sim_count
+
+
+TABLE = PreflopTable.open()  # The default table, or None if it hasn't been generated
+
+
+def lookup(hole, opponents):
+    """Looks up the equity of 2 hole card ids in the default table. Returns None if there is no answer"""
+    if TABLE is None:
+        return None
+    return TABLE.lookup(hole, opponents)
+
+
+def _work_out(index, opponents, sims):
+    """Works out one record. Run in the worker processes"""
+    win, draw, sim_count = Equity.simulate(class_hole(index), [], opponents, min_sims=sims, min_time=0,
+                                           seed=index * 100 + opponents, exact=False)
+    return index, opponents, win, draw, sim_count
+
+
+def generate(path=DEFAULT_PATH, sims=200000, workers=None, max_opponents=MAX_OPPONENTS):
+    """
+    Works out every record not already in the table at path, creating the file if needed. Each record is saved as
+    soon as it is done, so the generation can be stopped and started again
+    """
+    if not os.path.exists(path):
+        PreflopTable.create(path, max_opponents)
+
+    table = PreflopTable(path, writable=True)
+    jobs = [(index, opponents) for index in range(CLASS_COUNT) for opponents in range(1, table.max_opponents + 1)
+            if table.record(index, opponents)[2] == 0]
+    print(f"{len(jobs)} records to work out")
+
+    pool = ProcessPoolExecutor(workers)
+    try:
+        futures = [pool.submit(_work_out, index, opponents, sims) for index, opponents in jobs]
+        for done, future in enumerate(as_completed(futures), 1):
+            index, opponents, win, draw, sim_count = future.result()
+            table.save(index, opponents, win, draw, sim_count)
+            table.flush()
+            print(f"{done}/{len(jobs)} {class_name(index)} against {opponents}: win {win:.4f} draw {draw:.4f}")
+    finally:
+        pool.shutdown(cancel_futures=True)  # Records not done yet are left for the next run
+        table.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generates the preflop equity table")
+    parser.add_argument("path", nargs="?", default=DEFAULT_PATH)
+    parser.add_argument("--sims", type=int, default=200000, help="runouts to simulate for each record")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, defaults to the CPU count")
+    args = parser.parse_args()
+    generate(args.path, args.sims, args.workers)
@@ -0,0 +1,255 @@
+"""
+Ranges of hands, and the equity of one range against another. A range is how likely a player is to have each of the
+1326 possible hole cards (combos), kept as an array of 1326 float weights, where combo i is the pair of card ids
+COMBOS[i]. A single hand is a range with one combo.
+
+parse reads the usual range notation, a list separated by commas of:
+    pairs:      QQ, QQ+ (QQ, KK and AA), 22-55
+    other hands: AK (all 16 combos), AKs (suited), AKo (offsuit), A2s+ (A2s up to AKs), KTo-K7o
+    combos:     AHKH (the same as Card faces, in either case)
+    any:        every combo
+Any part can end with :weight, such as "AKo:0.5", to only count it some of the time.
+
+equity works out how often one range beats another, removing the combos that share cards with the board or with
+the other player's hand. For each board, every combo of the first range is compared with every combo of the second,
+using the totals of the second range's combos below each strength, minus the combos that share a card. So each board
+costs about (size of the first range) * 102 steps, not (size of one range) * (size of the other).
+From the flop on every board completion is checked, so the answer is exact. Before the flop, samples random boards
+are checked instead.
+
+If numpy is installed each board is done with vectorised array operations, otherwise with a python loop, which is a
+lot slower for big ranges.
+"""
+import re
+from array import array
+from itertools import combinations
+from random import Random
+
+import Equity
+import Evaluator
+
+np = Equity.np  # numpy if it is installed, otherwise None
+
+SAMPLES = 2000  # Random boards to check before the flop
+COMBOS = list(combinations(range(52), 2))  # The 2 card ids of each combo, lowest first
+COMBO_INDEX = {combo: i for i, combo in enumerate(COMBOS)}
+CARD_COMBOS = [[i for i, combo in enumerate(COMBOS) if card in combo] for card in range(52)]  # 51 combos per card
+
+_HAND = re.compile(r"^([2-9TJQKA])([2-9TJQKA])([SO]?)(\+?)$")
+_SPAN = re.compile(r"^([2-9TJQKA])([2-9TJQKA])([SO]?)-([2-9TJQKA])([2-9TJQKA])([SO]?)$")
+
+if np is not None:
+    _COMBO_CARDS = np.array(COMBOS, dtype=np.int64)
+    _CARD_COMBOS = np.array(CARD_COMBOS, dtype=np.int64)
+
+
+def combo_index(card1, card2):
+    """Returns the combo number of 2 card ids, in either order"""
+    return COMBO_INDEX[min(card1, card2), max(card1, card2)]
+
+
+def empty():
+    """Returns a range with no combos"""
+    return array("f", bytes(4 * len(COMBOS)))
+
+
+def _value_combos(high, low, suited):
+    """
+    Returns the combo numbers of a hand given by its values (indexes into Evaluator.VALUES). suited is True, False or
+    None for both
+    """
+    combos = []
+    for suit1 in range(4):
+        for suit2 in range(4):
+            card1, card2 = suit1 * 13 + high, suit2 * 13 + low
+            if card1 == card2 or (high == low and suit1 > suit2):
+                continue
+            if suited is None or suited == (suit1 == suit2):
+                combos.append(combo_index(card1, card2))
+    return combos
+
+
+def _hand_combos(part):
+    """Returns the combo numbers of one part of a range, without its weight. Raises ValueError if it isn't a range"""
+    if part in ("ANY", "RANDOM"):
+        return list(range(len(COMBOS)))
+
+    if len(part) == 4 and part[1] in Evaluator.SUITS and part[3] in Evaluator.SUITS:
+        card1, card2 = Evaluator.card_id(part[:2]), Evaluator.card_id(part[2:])
+        if card1 == card2:
+            raise ValueError("uses the same card twice")
+        return [combo_index(card1, card2)]
+
+    values = Evaluator.VALUES
+    match = _HAND.match(part)
+    if match:
+        first, second, kind, plus = match.groups()
+        high, low = sorted((values.index(first), values.index(second)), reverse=True)
+        suited = {"S": True, "O": False, "": None}[kind]
+        if high == low:
+            if kind:
+                raise ValueError("pairs can't be suited or offsuit")
+            pairs = range(high, 13) if plus else [high]
+            return [c for value in pairs for c in _value_combos(value, value, None)]
+        kickers = range(low, high) if plus else [low]
+        return [c for kicker in kickers for c in _value_combos(high, kicker, suited)]
+
+    match = _SPAN.match(part)
+    if match:
+        first1, second1, kind1, first2, second2, kind2 = match.groups()
+        start = [values.index(first1), values.index(second1)]
+        end = [values.index(first2), values.index(second2)]
+        suited = {"S": True, "O": False, "": None}[kind1]
+        if kind1 != kind2:
+            raise ValueError("both ends must be the same kind of hand")
+        if start[0] == start[1] and end[0] == end[1]:  # Pairs, such as 22-55
+            return [c for value in range(min(start[0], end[0]), max(start[0], end[0]) + 1)
+                    for c in _value_combos(value, value, None)]
+        if start[0] == end[0] and start[0] > max(start[1], end[1]):  # Same high card, such as KTs-K7s
+            return [c for kicker in range(min(start[1], end[1]), max(start[1], end[1]) + 1)
+                    for c in _value_combos(start[0], kicker, suited)]
+        raise ValueError("a span must be pairs, or hands with the same high card")
+
+    raise ValueError("not a hand or range")
+
+
+def parse(text):
+    """Returns the range of some range notation, such as "QQ+, AKs, KQo:0.5". Raises ValueError if it can't be read"""
+    weights = empty()
+    for written in re.split(r"[,\s]+", text.strip()):
+        if not written:
+            continue
+        part, _, weight_text = written.upper().partition(":")
+        try:
+            weight = float(weight_text) if weight_text else 1.0
+            if not 0 <= weight <= 1:
+                raise ValueError("the weight must be between 0 and 1")
+            combos = _hand_combos(part)
+        except ValueError as e:
+            raise ValueError(f"{written}: {e}")
+        for combo in combos:
+            weights[combo] = weight
+    return weights
+
+
+def from_hole(hole):
+    """Returns the range of a single hand, given as 2 card ids"""
+    weights = empty()
+    weights[combo_index(*hole)] = 1
+    return weights
+
+
+def size(weights):
+    """Returns the number of combos in a range, counting each by its weight"""
+    return sum(weights)
+
+
+def _boards(board, samples, seed):
+    """Returns the list of boards to check: every completion of board from the flop on, otherwise random boards"""
+    board = list(board)
+    deck = Equity.remaining_cards([], board)
+    missing = 5 - len(board)
+    if len(board) >= 3:
+        return [board + list(completion) for completion in combinations(deck, missing)]
+    rng = Random(seed)
+    return [board + rng.sample(deck, missing) for _ in range(samples)]
+
+
+def _counts_numpy(mine, theirs, boards):
+    """Returns the weight of the deals that mine wins, draws and the weight of all deals, over every board"""
+    mine = np.asarray(mine, dtype=np.float64)
+    theirs = np.asarray(theirs, dtype=np.float64)
+    my_combos = np.flatnonzero(mine)
+    used = np.flatnonzero((mine > 0) | (theirs > 0))  # Only these combos need their strength worked out
+    my_cards = _COMBO_CARDS[my_combos]
+    strengths = np.zeros(len(COMBOS), dtype=np.int64)
+    live = np.ones(len(COMBOS), dtype=bool)
+
+    win = draw = total = 0.0
+    for board in boards:
+        live[:] = True
+        live[_CARD_COMBOS[board].ravel()] = False  # Combos using a board card can't be dealt
+        dealt = used[live[used]]
+        cards = np.empty((len(dealt), 7), dtype=np.int64)
+        cards[:, :2] = _COMBO_CARDS[dealt]
+        cards[:, 2:] = board
+        strengths[dealt] = Equity.evaluate_many(cards)
+        their_weights = np.where(live, theirs, 0)
+        my_weights = np.where(live[my_combos], mine[my_combos], 0)
+        my_strengths = strengths[my_combos]
+
+        # Totals of their weights below, and at or below, each of my strengths
+        order = np.argsort(strengths, kind="stable")
+        sorted_strengths = strengths[order]
+        cumulative = np.concatenate(([0], np.cumsum(their_weights[order])))
+        below = cumulative[np.searchsorted(sorted_strengths, my_strengths, "left")]
+        at_or_below = cumulative[np.searchsorted(sorted_strengths, my_strengths, "right")]
+        everything = cumulative[-1]
+
+        # Take away their combos that share one of my cards. Their copy of my own combo shares both, so it is taken
+        # away twice and added back once
+        for card in (my_cards[:, 0], my_cards[:, 1]):
+            sharing = _CARD_COMBOS[card]
+            weights = their_weights[sharing]
+            shared_strengths = strengths[sharing]
+            below = below - (weights * (shared_strengths < my_strengths[:, None])).sum(axis=1)
+            at_or_below = at_or_below - (weights * (shared_strengths <= my_strengths[:, None])).sum(axis=1)
+            everything = everything - weights.sum(axis=1)
+        at_or_below = at_or_below + their_weights[my_combos]
+        everything = everything + their_weights[my_combos]
+
+        win += float(my_weights @ below)
+        draw += float(my_weights @ (at_or_below - below))
+        total += float(my_weights @ everything)
+
+    return win, draw, total
+
+
+def _counts_python(mine, theirs, boards):
+    """The same as _counts_numpy, one combo at a time"""
+    evaluate = Evaluator.evaluate
+    my_combos = [i for i, weight in enumerate(mine) if weight]
+    their_combos = [i for i, weight in enumerate(theirs) if weight]
+
+    win = draw = total = 0.0
+    for board in boards:
+        board_cards = set(board)
+        strengths = {}
+        for i in set(my_combos) | set(their_combos):
+            if board_cards.isdisjoint(COMBOS[i]):
+                strengths[i] = evaluate(list(COMBOS[i]) + board)
+
+        for i in my_combos:
+            if i not in strengths:
+                continue
+            mine_strength = strengths[i]
+            for j in their_combos:
+                if j not in strengths or not set(COMBOS[i]).isdisjoint(COMBOS[j]):
+                    continue
+                weight = mine[i] * theirs[j]
+                total += weight
+                if mine_strength > strengths[j]:
+                    win += weight
+                elif mine_strength == strengths[j]:
+                    draw += weight
+
+    return win, draw, total
+
+
+def equity(mine, theirs, board=(), samples=SAMPLES, seed=None):
+    """
+    Returns (win probability, draw probability, boards checked) of the range mine against the range theirs, with
+    board a list of up to 5 card ids. Every deal where the two hands and the board don't share a card counts, by the
+    product of the two combos' weights. Raises ValueError if there are no such deals
+    """
+    boards = _boards(board, samples, seed)
+    counts = _counts_numpy if np is not None else _counts_python
+    win, draw, total = counts(mine, theirs, boards)
+    if total <= 0:
+        raise ValueError("The ranges can't be dealt together on this board")
+    return win / total, draw / total, len(boards)
+
+
+def hand_equity(hole, theirs, board=(), samples=SAMPLES, seed=None):
+    """Returns the equity (see equity) of a hand, given as 2 card ids, against a range"""
+    return equity(from_hole(hole), theirs, board, samples, seed)
@@ -0,0 +1,109 @@
+"""
+Works out the AIs' equities in the background while a table waits on its humans. When a street is dealt, the table
+hands the Speculator the hole cards and board of each AI, and the equity of each is simulated for the likely numbers of
+opponents and added to EquityCache.CACHE. When the AI is asked for a bet, AI.sim finds the result in the cache, and
+only simulates more if the cached runouts aren't enough to decide.
+
+Simulating is done in short slices, and a table's jobs stop while one of its AIs is making a decision (see paused), so
+they only use time that table would otherwise spend waiting. While they are stopped, they are put aside and the jobs of
+other tables run instead, and they go back in the queue once the table is done deciding. Jobs from an older street of
+the same table are dropped, as that board can't be asked about any more.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import Equity
+import EquityCache
+import Preflop
+
+SIM_TIME = 1  # Seconds simulated for each hand and number of opponents
+SLICE_TIME = 0.05  # Seconds simulated between checks for whether to stop
+
+
+class Speculator:
+    """Runs speculative equity simulations in a pool of threads. Can be shared by many tables"""
+
+    def __init__(self, workers=1, sim_time=SIM_TIME):
+        self.sim_time = sim_time
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="Speculate")
+        self._streets = {}  # table: number of the latest street it dealt
+        self._lock = threading.Lock()
+        self._deciding = {}  # table: number of its AI decisions going on, for tables with any
+        self._parked = {}  # table: arguments of the jobs put aside while its AIs are deciding
+        self.simulated = 0  # Jobs that ran a simulation
+        self.skipped = 0  # Jobs not needed by the time they started
+
+    def start(self, table, hands, opponent_counts):
+        """
+        Starts simulating each (hole, board) pair of card ids in hands against each number of opponents in
+        opponent_counts, most likely first. Jobs still waiting from the table's last street are dropped
+        """
+        with self._lock:
+            street = self._streets.get(table, 0) + 1
+            self._streets[table] = street
+
+        for opponents in opponent_counts:
+            for hole, board in hands:
+                self._executor.submit(self._work, table, street, hole, board, opponents)
+
+    @contextmanager
+    def paused(self, table):
+        """
+        Stops speculating for table while inside the with block. Used around its AI decisions, so they don't have to
+        wait for the speculation of the hand they are deciding on
+        """
+        with self._lock:
+            self._deciding[table] = self._deciding.get(table, 0) + 1
+        try:
+            yield
+        finally:
+            parked = []
+            with self._lock:
+                self._deciding[table] -= 1
+                if self._deciding[table] == 0:
+                    del self._deciding[table]
+                    parked = self._parked.pop(table, [])
+            for job in parked:
+                try:
+                    self._executor.submit(self._work, *job)
+                except RuntimeError:  # Shut down
+                    break
+
+    def forget(self, table):
+        """Drops the jobs of a table that has closed"""
+        with self._lock:
+            self._streets.pop(table, None)
+            self._parked.pop(table, None)
+
+    def _work(self, table, street, hole, board, opponents, spent=0):
+        if not board and Preflop.lookup(hole, opponents):
+            self.skipped += 1
+            return
+
+        exact = Equity.uses_exact(len(board), opponents)
+        while spent < self.sim_time:
+            with self._lock:
+                if table in self._deciding:
+                    # Put aside without waiting, so other tables' jobs run. paused starts it again when the table is done
+                    self._parked.setdefault(table, []).append((table, street, hole, board, opponents, spent))
+                    return
+
+            if self._streets.get(table) != street or \
+                    EquityCache.CACHE.peek(hole, board, opponents, min_sims=EquityCache.CONFIDENT_SIMS):
+                break
+
+            # Each slice is added to the cache straight away, so an AI asked in the middle can use it
+            result = Equity.simulate(hole, board, opponents, min_sims=0, min_time=SLICE_TIME)
+            EquityCache.CACHE.add(hole, board, opponents, result, exact=exact)
+            spent += SLICE_TIME
+            if exact:
+                break
+
+        if spent:
+            self.simulated += 1
+        else:
+            self.skipped += 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,132 @@
+"""
+Timing of each phase of a hand, so it can be seen where the time goes when a hand is slow: fixed sleeps, AI
+simulations, humans thinking, or sending to sockets.
+
+The Table calls start before a phase and stop after it:
+    started = Timing.TIMINGS.start()
+    ...
+    Timing.TIMINGS.stop("showdown", started)
+When timing is disabled start returns None and stop returns straight away, so this costs almost nothing.
+
+Each phase keeps its most recent durations (a rolling window), and dump prints a summary and a histogram of them.
+A dump can be asked for with dump, on a signal (see dump_on_signal), or every few seconds (see enable).
+"""
+import signal
+import sys
+from collections import deque
+from math import log2
+from time import perf_counter
+
+WINDOW = 1000  # Durations kept for each phase
+BUCKETS = 24  # Histogram buckets, each twice as wide as the last, starting at 1 microsecond
+
+
+class PhaseTimings:
+    """Rolling timings of named phases"""
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self.enabled = False
+        self.dump_every = None  # Seconds between automatic dumps, or None
+        self._last_dump = perf_counter()
+        self._phases = {}  # phase name: deque of durations in seconds
+        self._counts = {}  # phase name: number of times timed since the last reset
+
+    def enable(self, dump_every=None):
+        """Starts timing. If dump_every is given, the timings are dumped every dump_every seconds"""
+        self.enabled = True
+        self.dump_every = dump_every
+        self._last_dump = perf_counter()
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        self._phases = {}
+        self._counts = {}
+
+    def start(self):
+        """Returns the start time of a phase, or None if timing is disabled"""
+        if self.enabled:
+            return perf_counter()
+        return None
+
+    def stop(self, phase, started):
+        """Records the time since started, from start, against phase"""
+        if started is None:
+            return
+
+        durations = self._phases.get(phase)
+        if durations is None:
+            durations = self._phases[phase] = deque(maxlen=self.window)
+            self._counts[phase] = 0
+        durations.append(perf_counter() - started)
+        self._counts[phase] += 1
+
+        if self.dump_every is not None and perf_counter() - self._last_dump >= self.dump_every:
+            self.dump()
+
+    def summary(self):
+        """
+        Returns a dict of phase name: dict of the count since the last reset, and the total, mean, p50, p90, p99 and
+        max of the durations in the window, in seconds
+        """
+        result = {}
+        for phase, durations in list(self._phases.items()):
+            values = sorted(durations)
+            if not values:
+                continue
+
+            def at(fraction):
+                return values[min(int(fraction * len(values)), len(values) - 1)]
+
+            result[phase] = {"count": self._counts[phase], "total": sum(values), "mean": sum(values) / len(values),
+                             "p50": at(0.5), "p90": at(0.9), "p99": at(0.99), "max": values[-1]}
+        return result
+
+    def histogram(self, phase):
+        """Returns a list of counts of the durations in the window, where bucket i is below 2 ** i microseconds"""
+        counts = [0] * BUCKETS
+        for duration in self._phases.get(phase, ()):
+            bucket = 0 if duration <= 1e-6 else int(log2(duration * 1e6)) + 1
+            counts[min(bucket, BUCKETS - 1)] += 1
+        return counts
+
+    def dump(self, file=None):
+        """Prints the summary of every phase, and a histogram of each phase, to file (stdout by default)"""
+        if file is None:
+            file = sys.stdout
+        self._last_dump = perf_counter()
+
+        summary = self.summary()
+        print(f"{'phase':>22} {'count':>8} {'total':>9} {'mean':>9} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}",
+              file=file)
+        for phase in sorted(summary, key=lambda name: -summary[name]["total"]):
+            s = summary[phase]
+            print(f"{phase:>22} {s['count']:>8} " + " ".join(f"{s[key]:9.4f}" for key in
+                                                             ("total", "mean", "p50", "p90", "p99", "max")), file=file)
+
+        for phase in sorted(summary):
+            counts = self.histogram(phase)
+            most = max(counts)
+            print(f"\n{phase} (seconds)", file=file)
+            for bucket, count in enumerate(counts):
+                if count:
+                    print(f"    < {2 ** bucket / 1e6:<10.6g} {count:>6} {'#' * max(1, 40 * count // most)}", file=file)
+        file.flush()
+
+    def dump_on_signal(self, signal_number=None):
+        """
+        Dumps the timings whenever the process gets a signal, SIGUSR1 by default. Returns False on platforms without
+        that signal
+        """
+        if signal_number is None:
+            signal_number = getattr(signal, "SIGUSR1", None)
+            if signal_number is None:
+                return False
+
+        signal.signal(signal_number, lambda *_: self.dump())
+        return True
+
+
+TIMINGS = PhaseTimings()  # Shared by every table in this process
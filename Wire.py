@@ -0,0 +1,269 @@
+"""
+Encodings of the messages sent between House and Player, inside the frames from Framing.
+
+JsonCodec sends every message as JSON, which every client understands. BinaryCodec sends the common messages as small
+structs instead: cards are 6 bit card ids, actions are a few bytes, and players are sent as their seat, the index of
+their name in the last game summary. A game summary only sends the names and types of the players again when they
+change. Any message without a binary form is sent as JSON inside a binary message, so the codec works for everything.
+
+The client asks for the binary encoding when it sends its name ({"MyName": name, "Wire": "binary"}), and the server
+says which encoding it will use in its reply ({"Accepted": True, "Wire": "binary"}). Everything after the reply is
+sent in that encoding. Clients that don't ask get JSON.
+
+Each connection has its own codec object on each side, as the seats depend on what was sent before.
+
+Times ("T" in MakeBet and the seconds in Clock) are sent by BinaryCodec in tenths of a second, so they should be
+rounded with tenths first, which makes them the same in both encodings.
+"""
+import json
+import struct
+
+import Evaluator
+
+# Message types of BinaryCodec, the first byte of each message
+JSON, ACTION, CARDS, DEAL, ASK, ACCEPTED, ERROR, SUMMARY, START, END, NO_MONEY, CLOCK = range(12)
+
+ACTIONS = "BFQ"
+PLAYER_TYPES = ["Human", "AI"]
+HAND_TYPES = Evaluator.CATEGORY_NAMES + ["RoyalF"]
+
+_ACTION = struct.Struct("<BBBIB")  # type, seat, action, amount, flags (HAS_AMOUNT, HAS_QUESTION)
+_ASK = struct.Struct("<BBIIHH")  # type, seat, min bet, player's money, tenths of a second to act, question number
+_CLOCK = struct.Struct("<BBH")  # type, seat, tenths of a second to act
+_DEAL = struct.Struct("<BBBI")  # type, small blind seat, big blind seat, min bet. Followed by the 2 hole cards
+_UINT = struct.Struct("<I")
+_QUESTION = struct.Struct("<H")  # The question number that an action answers, after the action if HAS_QUESTION is set
+
+HAS_AMOUNT, HAS_QUESTION = 1, 2
+
+
+def tenths(seconds):
+    """Returns seconds rounded to tenths of a second, the same way BinaryCodec rounds them"""
+    return round(seconds * 10) / 10
+
+
+def pack_cards(faces):
+    """Packs a string of card faces, such as 'JCKD3C', into a count byte followed by 6 bits for each card"""
+    ids = [Evaluator.CARD_IDS[faces[i: i + 2]] for i in range(0, len(faces), 2)]
+    value = 0
+    for i in ids:
+        value = value << 6 | i
+    return bytes([len(ids)]) + value.to_bytes((6 * len(ids) + 7) // 8, "little")
+
+
+def unpack_cards(data, offset=0):
+    """Returns (string of card faces, offset after the cards) from the cards packed by pack_cards at offset"""
+    count = data[offset]
+    size = (6 * count + 7) // 8
+    value = int.from_bytes(data[offset + 1: offset + 1 + size], "little")
+    faces = [Evaluator.CARD_FACES[value >> (6 * (count - 1 - i)) & 63] for i in range(count)]
+    return "".join(faces), offset + 1 + size
+
+
+def _pack_text(text):
+    data = text.encode()
+    if len(data) > 255:
+        raise ValueError("Text too long")
+    return bytes([len(data)]) + data
+
+
+def _unpack_text(data, offset):
+    end = offset + 1 + data[offset]
+    return data[offset + 1: end].decode(), end
+
+
+class JsonCodec:
+    """Sends everything as JSON"""
+    name = "json"
+
+    @staticmethod
+    def encode(obj):
+        return json.dumps(obj).encode()
+
+    @staticmethod
+    def decode(data):
+        """Returns the message in data. Raises ValueError if it can't be decoded"""
+        return json.loads(data)
+
+
+class BinaryCodec:
+    """Sends the common messages as structs. Keeps track of the seats of one connection"""
+    name = "binary"
+
+    def __init__(self):
+        self.roster = []  # [name, player type] of each seat, from the last game summary
+
+    def seat(self, name):
+        for seat, (seat_name, _) in enumerate(self.roster):
+            if seat_name == name:
+                return seat
+        raise ValueError(f"{name} has no seat")
+
+    def encode(self, obj):
+        """Returns the bytes of a message"""
+        try:
+            data = self._encode(obj)
+        except (ValueError, KeyError, TypeError, IndexError, struct.error):
+            data = None
+        if data is None:
+            return bytes([JSON]) + json.dumps(obj).encode()
+        return data
+
+    def _encode(self, obj):
+        """Returns the binary form of a message, or None if it doesn't have one"""
+        if type(obj) is list:
+            if len(obj) == 3 and type(obj[0]) is str and type(obj[1]) is list:  # Hole cards and blinds
+                return (_DEAL.pack(DEAL, self.seat(obj[1][0]), self.seat(obj[1][1]), obj[2]) +
+                        pack_cards(obj[0]))
+            if len(obj) == 2 and type(obj[1]) is list:
+                return self._encode_summary(SUMMARY, obj)
+            return None
+
+        if type(obj) is not dict:
+            return None
+
+        keys = set(obj)
+        if keys - {"S"} == {"N", "Act"} or keys - {"S"} == {"N", "Act", "Am"}:
+            flags = ("Am" in obj) * HAS_AMOUNT | ("S" in obj) * HAS_QUESTION
+            data = _ACTION.pack(ACTION, self.seat(obj["N"]), ACTIONS.index(obj["Act"]), obj.get("Am", 0), flags)
+            return data + _QUESTION.pack(obj["S"]) if "S" in obj else data
+        if keys == {"N", "MakeBet", "yMoney", "T", "S"}:
+            return _ASK.pack(ASK, self.seat(obj["N"]), obj["MakeBet"], obj["yMoney"], round(obj["T"] * 10), obj["S"])
+        if keys == {"Clock"}:
+            return _CLOCK.pack(CLOCK, self.seat(obj["Clock"][0]), round(obj["Clock"][1] * 10))
+        if keys == {"cards"}:
+            return bytes([CARDS]) + pack_cards(obj["cards"])
+        if obj == {"Accepted": True}:
+            return bytes([ACCEPTED])
+        if keys == {"Error"}:
+            return bytes([ERROR]) + obj["Error"].encode()
+        if keys == {"Start Round"}:
+            return self._encode_summary(START, obj["Start Round"])
+        if keys == {"EndRound"}:
+            return self._encode_end(obj["EndRound"])
+        if obj == {"NoMoney": ""}:
+            return bytes([NO_MONEY])
+        return None
+
+    def _encode_summary(self, message_type, summary):
+        players = summary[1]
+        roster = [[name, player_type] for name, player_type, _ in players]
+        if len(players) != summary[0]:
+            return None
+
+        data = bytearray([message_type, roster != self.roster, len(players)])
+        if roster != self.roster:
+            for name, player_type in roster:
+                data += _pack_text(name) + bytes([PLAYER_TYPES.index(player_type)])
+        for player in players:
+            data += _UINT.pack(player[2])
+
+        self.roster = roster
+        return bytes(data)
+
+    def _encode_end(self, ending_info):
+        players_cards, pot, winners, hand_type, table_cards = ending_info
+        data = bytearray([END, len(players_cards)])
+        for name, cards in players_cards.items():
+            data += bytes([self.seat(name)]) + pack_cards(cards)
+        data += _UINT.pack(pot)
+        data += bytes([len(winners)] + [self.seat(name) for name in winners])
+        data += bytes([HAND_TYPES.index(hand_type)])
+        data += pack_cards(table_cards)
+        return bytes(data)
+
+    def decode(self, data):
+        """Returns the message in data, the same as it would be from JSON. Raises ValueError if it can't be decoded"""
+        try:
+            return self._decode(data)
+        except (IndexError, KeyError, struct.error, UnicodeDecodeError) as e:
+            raise ValueError(f"Bad binary message: {e}")
+
+    def _decode(self, data):
+        message_type = data[0]
+        if message_type == JSON:
+            return json.loads(data[1:])
+
+        if message_type == ACTION:
+            _, seat, action, amount, flags = _ACTION.unpack_from(data)
+            res = {"N": self.roster[seat][0], "Act": ACTIONS[action]}
+            if flags & HAS_AMOUNT:
+                res["Am"] = amount
+            if flags & HAS_QUESTION:
+                res["S"] = _QUESTION.unpack_from(data, _ACTION.size)[0]
+            return res
+
+        if message_type == ASK:
+            _, seat, min_bet, money, tenths, question = _ASK.unpack_from(data)
+            return {"N": self.roster[seat][0], "MakeBet": min_bet, "yMoney": money, "T": tenths / 10, "S": question}
+
+        if message_type == CLOCK:
+            _, seat, tenths = _CLOCK.unpack_from(data)
+            return {"Clock": [self.roster[seat][0], tenths / 10]}
+
+        if message_type == DEAL:
+            _, small_blind, big_blind, min_bet = _DEAL.unpack_from(data)
+            cards, _ = unpack_cards(data, _DEAL.size)
+            return [cards, [self.roster[small_blind][0], self.roster[big_blind][0]], min_bet]
+
+        if message_type == CARDS:
+            return {"cards": unpack_cards(data, 1)[0]}
+        if message_type == ACCEPTED:
+            return {"Accepted": True}
+        if message_type == ERROR:
+            return {"Error": data[1:].decode()}
+        if message_type == NO_MONEY:
+            return {"NoMoney": ""}
+
+        if message_type in (SUMMARY, START):
+            summary = self._decode_summary(data)
+            return summary if message_type == SUMMARY else {"Start Round": summary}
+
+        if message_type == END:
+            return {"EndRound": self._decode_end(data)}
+
+        raise ValueError(f"Unknown message type {message_type}")
+
+    def _decode_summary(self, data):
+        has_roster, count = data[1], data[2]
+        offset = 3
+        if has_roster:
+            roster = []
+            for _ in range(count):
+                name, offset = _unpack_text(data, offset)
+                roster.append([name, PLAYER_TYPES[data[offset]]])
+                offset += 1
+            self.roster = roster
+        elif count != len(self.roster):
+            raise ValueError("Summary doesn't match the seats")
+
+        players = []
+        for name, player_type in self.roster:
+            players.append([name, player_type, _UINT.unpack_from(data, offset)[0]])
+            offset += _UINT.size
+        return [count, players]
+
+    def _decode_end(self, data):
+        count = data[1]
+        offset = 2
+        players_cards = {}
+        for _ in range(count):
+            name = self.roster[data[offset]][0]
+            players_cards[name], offset = unpack_cards(data, offset + 1)
+
+        pot = _UINT.unpack_from(data, offset)[0]
+        offset += _UINT.size
+        winner_count = data[offset]
+        winners = [self.roster[seat][0] for seat in data[offset + 1: offset + 1 + winner_count]]
+        offset += 1 + winner_count
+        hand_type = HAND_TYPES[data[offset]]
+        table_cards, _ = unpack_cards(data, offset + 1)
+        return [players_cards, pot, winners, hand_type, table_cards]
+
+
+CODECS = {JsonCodec.name: JsonCodec, BinaryCodec.name: BinaryCodec}
+
+
+def make_codec(name="json"):
+    """Returns a new codec for a connection. Unknown names get JSON"""
+    return CODECS.get(name, JsonCodec)()
@@ -0,0 +1,52 @@
+import House
+
+
+class Seat:
+    def __init__(self, name, money):
+        self.name = name
+        self.money = money
+
+
+def make_ai(win):
+    """
+    An AI in a hand against 2 players, with sim always returning win. Bob has bet all their money, so is always thought
+    to be bluffing if asked
+    """
+    ai = House.AI()
+    ai.say = lambda *args: None
+    ai.hand.clear()
+    others = [Seat("Bob", 1000), Seat("Ava", 1000)]
+    ai.begin_round(others)
+    ai.start_round(others)
+    ai.players_bets = {"Bob": 1000, "Ava": 100}
+    ai.bluff_chance = 0
+    ai.cockyness = 0
+    ai.sim = lambda *args, **kwargs: (win, 0, 100)
+    return ai
+
+
+def test_folding_early_decides_nobody_is_bluffing():
+    ai = make_ai(0.01)
+    assert ai.ask_bet(900)["Act"] == "F"
+    assert ai.is_bluffing == {"Bob": False, "Ava": False}
+
+
+def test_thresholds_cover_players_that_might_be_bluffing():
+    ai = make_ai(0.5)
+    seen = []
+    ai.sim = lambda *args, thresholds=None, **kwargs: seen.append(thresholds) or (0.5, 0, 100)
+    ai.ask_bet(900)
+    best = 1  # Bob has bet all their money
+    assert any(abs(t - 0.8 * best) < 1e-9 for t in seen[0])
+    assert any(abs(t - 0.4 * best) < 1e-9 for t in seen[0])
+
+
+def test_thresholds_cover_every_mix_of_bluffers():
+    ai = make_ai(0.5)
+    ai.players_bets = {"Bob": 1000, "Ava": 700}  # Both might be thought to be bluffing
+    seen = []
+    ai.sim = lambda *args, thresholds=None, **kwargs: seen.append(thresholds) or (0.5, 0, 100)
+    ai.ask_bet(900)
+    ava = pow(0.7, ai.conf_exponent)
+    for conf in (1, 0.5, ava, ava * 0.5):
+        assert any(abs(t - 0.8 * conf) < 1e-9 for t in seen[0])
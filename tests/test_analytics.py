@@ -0,0 +1,91 @@
+import pytest
+
+import Analytics
+import HandHistory
+
+
+def write_log(directory, hands):
+    """Writes hands of (winner name, loser name, hand type, pot) between two AIs"""
+    history = HandHistory.HandHistory(str(directory))
+    for winner, loser, hand_type, pot in hands:
+        players = [{"name": winner, "ai": True, "cockyness": 0.12, "money": 1000, "end_money": 1000 + pot // 2,
+                    "hole": [0, 1]},
+                   {"name": loser, "ai": True, "cockyness": 0.01, "money": 1000, "end_money": 1000 - pot // 2,
+                    "hole": [2, 3]}]
+        streets = [[{"N": winner, "Act": "B", "Am": pot // 2}, {"N": loser, "Act": "B", "Am": pot // 2}], [], [], []]
+        history.record(HandHistory.encode(players, 10, streets, [20, 21, 22, 30, 40], [winner, loser], [winner],
+                                          hand_type, pot))
+    history.close()
+    return HandHistory.log_files(str(directory))
+
+
+def test_totals(tmp_path):
+    files = write_log(tmp_path, [("AI Bob", "AI Ava", "Pair", 40), ("AI Ava", "AI Bob", "Flush", 100),
+                                 ("AI Bob", "AI Sue", "Pair", 20)])
+    totals = Analytics.analyse(files, player="AI Bob")
+    assert totals["hands"] == 3
+    assert totals["showdowns"] == 3
+    assert totals["hand_types"]["Pair"] == 2 and totals["hand_types"]["Flush"] == 1
+    assert totals["pot_buckets"][3] == 1 and totals["pot_buckets"][4] == 1 and totals["pot_buckets"][2] == 1
+    assert totals["bands"][2]["hands"] == 3 and totals["bands"][2]["wins"] == 3
+    assert totals["bands"][0]["hands"] == 3 and totals["bands"][0]["wins"] == 0
+    bob = totals["player"]
+    assert (bob["hands"], bob["wins"], bob["sum"]) == (3, 2, (20 - 50 + 10) / 10)
+
+
+def test_index(tmp_path):
+    files = write_log(tmp_path, [("AI Bob", "AI Ava", "Pair", 40), ("AI Ava", "AI Bob", "Flush", 100),
+                                 ("AI Bob", "AI Sue", "Pair", 20)])
+    index = Analytics.open_index(files[0])
+    try:
+        assert list(index.hands(Analytics.PLAYER, "AI Sue")) == [2]
+        assert list(index.hands(Analytics.HAND_TYPE, "Pair")) == [0, 2]
+        assert sorted(index.names(Analytics.PLAYER)) == ["AI Ava", "AI Bob", "AI Sue"]
+    finally:
+        index.close()
+
+    assert Analytics.analyse(files, hand_type="Flush")["hands"] == 1
+    assert Analytics.analyse(files, player="AI Ava", hand_type="Pair")["hands"] == 1
+
+    # The index is made again once the log grows
+    with open(files[0], "ab") as file:
+        file.write(HandHistory.encode([{"name": "AI Sue", "ai": True, "cockyness": 0, "money": 5, "end_money": 5,
+                                        "hole": [0, 1]}], 10, [[], [], [], []], [2, 3, 4, 5, 6], [], ["AI Sue"],
+                                      "High", 0))
+    assert Analytics.analyse(files, player="AI Sue")["hands"] == 2
+
+
+def test_full_pass_matches_indexed_pass(tmp_path):
+    files = write_log(tmp_path, [("AI Bob", "AI Ava", "Pair", 40)] * 5 + [("AI Ava", "AI Bob", "High", 10)] * 3)
+    first = Analytics.analyse(files, workers=1)  # Makes the index while reading
+    second = Analytics.analyse(files, workers=1)  # Reads through the index
+    assert first == second
+
+
+def test_short_logs_are_skipped(tmp_path, capsys):
+    files = write_log(tmp_path, [("AI Bob", "AI Ava", "Pair", 40)])
+    empty = tmp_path / "hands-000002.hh"
+    empty.write_bytes(b"")
+    short = tmp_path / "hands-000003.hh"
+    short.write_bytes(HandHistory.MAGIC)
+    files += [str(empty), str(short)]
+
+    assert Analytics.analyse(files, workers=1)["hands"] == 1
+    assert Analytics.analyse(files, player="AI Bob", workers=1)["hands"] == 1
+    assert list(Analytics.read_hands(str(empty))) == []
+    assert "Skipping" in capsys.readouterr().err
+
+
+def test_truncated_index_is_made_again(tmp_path):
+    files = write_log(tmp_path, [("AI Bob", "AI Ava", "Pair", 40), ("AI Ava", "AI Bob", "Flush", 100)])
+    Analytics.open_index(files[0]).close()
+    path = Analytics.index_path(files[0])
+    with open(path, "rb") as file:
+        data = file.read()
+
+    for size in (0, 10, Analytics.INDEX_HEADER.size + 4, len(data) - 1):
+        with open(path, "wb") as file:
+            file.write(data[:size])
+        with pytest.raises(ValueError):
+            Analytics.HandIndex(path)
+        assert Analytics.analyse(files, player="AI Ava")["hands"] == 2
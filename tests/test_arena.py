@@ -0,0 +1,53 @@
+import json
+
+import pytest
+
+import Arena
+
+VARIANTS = {"default": {}, "tight": {"fold_threshold": 1.0}}
+
+
+def play(path, tables, hands=2):
+    return Arena.run(VARIANTS, tables=tables, hands=hands, seats=2, workers=1, path=str(path), sim_time=0.001)
+
+
+def test_resume_after_a_torn_line(tmp_path):
+    path = tmp_path / "results.jsonl"
+    play(path, 2)
+    with open(path, "a") as f:
+        f.write('{"job": 7, "seating": ["def')  # Stopped part way through writing a result
+
+    summary = play(path, 3)
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert lines[0] == {"config": {"variants": VARIANTS, "hands": 2, "seats": 2, "sim_time": 0.001}}
+    assert sorted(line["job"] for line in lines[1:]) == [0, 1, 2]
+    assert sum(n for n, _, _ in summary.values()) > 0
+
+
+def test_different_settings_are_refused(tmp_path):
+    path = tmp_path / "results.jsonl"
+    play(path, 1)
+    with pytest.raises(ValueError):
+        play(path, 1, hands=3)
+    assert len(path.read_text().splitlines()) == 2
+
+
+def test_misspelt_attributes_are_refused(tmp_path):
+    path = tmp_path / "results.jsonl"
+    with pytest.raises(AttributeError):
+        Arena.run({"default": {}, "tight": {"fold_treshold": 1.0}}, tables=1, hands=2, seats=2, workers=1,
+                  path=str(path), sim_time=0.001)
+    assert not path.exists()
+
+
+def test_interval_is_over_tables():
+    tables = [{"results": {"default": {"hands": 10, "sum": 10.0}, "tight": {"hands": 10, "sum": 5.0}}},
+              {"results": {"default": {"hands": 10, "sum": -10.0}, "tight": {"hands": 0, "sum": 0.0}}}]
+    summary = Arena.summarise(tables)
+    assert summary["default"] == (20, 0.0, 1.96)
+    assert summary["tight"] == (10, 0.5, float("inf"))  # Only one table played it
+
+
+def test_every_hand_is_counted_but_the_first():
+    table = Arena.play_table(0, VARIANTS, ["default", "tight"], 5, sim_time=0.001)
+    assert 0 < sum(result["hands"] for result in table["results"].values()) <= 2 * 4
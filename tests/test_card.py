@@ -0,0 +1,23 @@
+import pickle
+
+import pytest
+
+import House
+
+
+def test_cards_are_shared():
+    assert House.Card("AH") is House.Card("AH")
+    assert House.Card("HA") is House.Card("ah") is House.Card("AH")
+    assert pickle.loads(pickle.dumps(House.Card("QC"))) is House.Card("QC")
+
+
+def test_card_details():
+    card = House.Card("TD")
+    assert (card.face, card.value, card.suit, card.face_value) == ("TD", "T", "D", 8)
+    assert card.id == House.Evaluator.CARD_IDS["TD"]
+    assert House.CARDS[card.id] is card
+
+
+def test_bad_face():
+    with pytest.raises(ValueError):
+        House.Card("ZZ")
@@ -0,0 +1,42 @@
+import random
+
+import House
+
+
+def test_new_deck_is_in_card_id_order():
+    deck = House.Deck()
+    assert len(deck) == 52
+    assert [card.face for card in deck.deck] == House.Evaluator.CARD_FACES
+    assert deck.take().face == "2S"
+    assert [card.face for card in deck.take_n(2)] == ["3S", "4S"]
+    assert len(deck) == 49
+
+
+def test_shuffled_deck_deals_every_card_once():
+    random.seed(5)
+    deck = House.Deck(True)
+    faces = [deck.take().face for _ in range(52)]
+    assert sorted(faces) == sorted(House.Evaluator.CARD_FACES)
+    assert faces != House.Evaluator.CARD_FACES
+    assert deck.take() is False
+    assert len(deck) == 0
+
+
+def test_remove_and_add():
+    deck = House.Deck()
+    assert deck.remove_card("AS")
+    assert not deck.remove_card("AS")
+    assert len(deck) == 51
+    assert "AS" not in [card.face for card in deck.deck]
+
+    assert deck.add(House.Card("AS"))
+    assert deck.deck[-1].face == "AS"
+    assert not deck.add("AS")
+    assert len(deck) == 52
+
+
+def test_removed_cards_are_skipped_when_dealing():
+    deck = House.Deck()
+    deck.remove_card("2S")
+    deck.remove_card("4S")
+    assert [card.face for card in deck.take_n(2)] == ["3S", "5S"]
@@ -0,0 +1,14 @@
+import Equity
+
+
+def test_seeded_simulations_repeat():
+    hole, board = [0, 13], [1, 2, 3]
+    try:
+        results = []
+        for _ in range(2):
+            Equity.seed_simulations(7)
+            results.append([Equity.simulate(hole, board, 2, min_sims=1000, min_time=0) for _ in range(3)])
+        assert results[0] == results[1]
+        assert results[0][0] != results[0][1]  # Each simulation still gets its own seed
+    finally:
+        Equity.seed_simulations(None)
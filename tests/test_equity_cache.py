@@ -0,0 +1,47 @@
+import Equity
+import EquityCache
+import House
+
+
+def make_ai(faces):
+    ai = House.AI()
+    cards = [House.Card(face) for face in faces]
+    ai.hand.give_hole(cards[:2])
+    ai.hand.on_table = cards[2:]
+    return ai
+
+
+def test_add_returns_the_merged_entry():
+    cache = EquityCache.EquityCache()
+    assert cache.add([0, 13], [], 1, (0.5, 0.1, 100)) == (0.5, 0.1, 100)
+    assert cache.add([0, 13], [], 1, (0.7, 0.1, 100)) == (0.6, 0.1, 200)
+    assert cache.add([0, 13], [], 1, (0.25, 0.0, 4), exact=True) == (0.25, 0.0, 4)
+    assert cache.add([0, 13], [], 1, (0.9, 0.0, 1000)) == (0.25, 0.0, 4)
+
+
+def test_lookups_are_counted_once(monkeypatch):
+    monkeypatch.setattr(EquityCache, "CACHE", EquityCache.EquityCache())
+    ai = make_ai(["AS", "KD", "2C", "7H", "9D"])
+    ai.sim(3, min_sims=0, min_time=0.01)
+    stats = EquityCache.CACHE.stats()
+    assert (stats["hits"], stats["misses"]) == (0, 1)
+
+    # An entry with too few runouts to use is a miss, and is refined
+    ai.sim(3, min_sims=0, min_time=0.01)
+    stats = EquityCache.CACHE.stats()
+    assert (stats["hits"], stats["misses"], stats["refinements"]) == (0, 2, 1)
+    hole, board = [card.id for card in ai.hand.hole], [card.id for card in ai.hand.on_table]
+    assert EquityCache.CACHE.peek(hole, board, 3)  # Peeking isn't counted
+    assert EquityCache.CACHE.stats()["misses"] == 2
+
+
+def test_exact_results_are_served_from_the_cache(monkeypatch):
+    monkeypatch.setattr(EquityCache, "CACHE", EquityCache.EquityCache())
+    ai = make_ai(["AS", "KD", "2C", "7H", "9D", "JS", "3H"])
+    first = ai.sim(1, min_sims=0, min_time=0.01)
+
+    def simulate(*args, **kwargs):
+        raise AssertionError("The exact result was worked out again")
+    monkeypatch.setattr(Equity, "simulate", simulate)
+    assert ai.sim(1, min_sims=0, min_time=0.01) == first
+    assert EquityCache.CACHE.stats()["hits"] == 1
@@ -0,0 +1,81 @@
+import random
+from itertools import combinations
+
+import Evaluator
+
+
+def reference_strength(cards):
+    """Slow but obvious strength of the best 5 of some card ids, as (category, tie break values)"""
+    best = None
+    for five in combinations(cards, 5):
+        values = sorted((Evaluator.RANK_OF[c] for c in five), reverse=True)
+        counts = {v: values.count(v) for v in values}
+        by_count = sorted(counts, key=lambda v: (counts[v], v), reverse=True)
+        shape = sorted(counts.values(), reverse=True)
+        flush = len({Evaluator.SUIT_OF[c] for c in five}) == 1
+
+        straight_high = None
+        if len(counts) == 5:
+            if values[0] - values[4] == 4:
+                straight_high = values[0]
+            elif values == [12, 3, 2, 1, 0]:  # A2345, the ace plays low
+                straight_high = 3
+
+        if straight_high is not None and flush:
+            strength = (Evaluator.STRAIGHT_FLUSH, [straight_high])
+        elif shape == [4, 1]:
+            strength = (Evaluator.FOUR_OAK, by_count)
+        elif shape == [3, 2]:
+            strength = (Evaluator.FULL_HOUSE, by_count)
+        elif flush:
+            strength = (Evaluator.FLUSH, values)
+        elif straight_high is not None:
+            strength = (Evaluator.STRAIGHT, [straight_high])
+        elif shape == [3, 1, 1]:
+            strength = (Evaluator.THREE_OAK, by_count)
+        elif shape == [2, 2, 1]:
+            strength = (Evaluator.TWO_PAIR, by_count)
+        elif shape == [2, 1, 1, 1]:
+            strength = (Evaluator.PAIR, by_count)
+        else:
+            strength = (Evaluator.HIGH, values)
+
+        if best is None or strength > best:
+            best = strength
+    return best
+
+
+def test_matches_brute_force():
+    rng = random.Random(1)
+    for _ in range(3000):
+        size = rng.choice([5, 6, 7])
+        a, b = rng.sample(range(52), size), rng.sample(range(52), size)
+        strength_a, strength_b = Evaluator.evaluate(a), Evaluator.evaluate(b)
+        reference_a, reference_b = reference_strength(a), reference_strength(b)
+
+        assert Evaluator.category_of(strength_a) == reference_a[0]
+        assert (strength_a > strength_b) == (reference_a > reference_b)
+        assert (strength_a == strength_b) == (reference_a == reference_b)
+
+
+def test_every_category():
+    hands = {
+        "RoyalF": "AH KH QH JH TH 2C 3D",
+        "StraightF": "5S 4S 3S 2S AS KD QD",
+        "4OAK": "9S 9C 9D 9H 2S",
+        "FullH": "9S 9C 9D 2H 2S",
+        "Flush": "2D 5D 8D JD KD",
+        "Straight": "AS 2C 3D 4H 5S",
+        "3OAK": "9S 9C 9D 2H 3S",
+        "2Pair": "9S 9C 2D 2H 3S",
+        "Pair": "9S 9C 2D 4H 3S",
+        "High": "9S TC 2D 4H 3S",
+    }
+    for name, faces in hands.items():
+        assert Evaluator.hand_type(Evaluator.evaluate_faces(faces.split())) == name
+
+
+def test_wheel_is_the_lowest_straight():
+    wheel = Evaluator.evaluate_faces("AS 2C 3D 4H 5S".split())
+    six_high = Evaluator.evaluate_faces("2C 3D 4H 5S 6S".split())
+    assert wheel < six_high
@@ -0,0 +1,63 @@
+import asyncio
+import socket
+
+import pytest
+
+import Framing
+
+
+def test_messages_sent_together_are_split():
+    a, b = socket.socketpair()
+    try:
+        a.sendall(Framing.encode({"N": "Bob"}) + Framing.encode("Send Name") + Framing.encode([1, []]))
+        connection = Framing.FramedSocket(b)
+        assert connection.receive() == {"N": "Bob"}
+        assert connection.receive() == "Send Name"
+        assert connection.receive() == [1, []]
+    finally:
+        a.close()
+        b.close()
+
+
+def test_message_split_over_reads():
+    a, b = socket.socketpair()
+    try:
+        frame = Framing.encode({"cards": "AHKH2C"})
+        connection = Framing.FramedSocket(b)
+        a.sendall(frame[:3])
+        a.sendall(frame[3:])
+        assert connection.receive() == {"cards": "AHKH2C"}
+
+        a.close()
+        with pytest.raises(ConnectionError):
+            connection.receive()
+    finally:
+        b.close()
+
+
+def test_too_long_frame():
+    a, b = socket.socketpair()
+    try:
+        a.sendall(Framing.HEADER.pack(Framing.MAX_FRAME + 1))
+        with pytest.raises(ConnectionError):
+            Framing.FramedSocket(b).receive()
+    finally:
+        a.close()
+        b.close()
+
+
+def test_read_frame():
+    async def read_all(data):
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        frames = []
+        while True:
+            frame = await Framing.read_frame(reader)
+            if frame is None:
+                return frames
+            frames.append(frame)
+
+    data = Framing.pack(b"one") + Framing.pack(b"") + Framing.pack(b"three")
+    assert asyncio.run(read_all(data)) == [b"one", b"", b"three"]
+    assert asyncio.run(read_all(data[:-2])) == [b"one", b""]  # A cut off frame is a broken connection
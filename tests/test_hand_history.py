@@ -0,0 +1,115 @@
+import os
+
+import pytest
+
+import HandHistory
+import House
+
+PLAYERS = [
+    {"name": "Bob", "ai": False, "money": 1000, "end_money": 1030, "hole": [51, 50]},
+    {"name": "AI Ava", "ai": True, "cockyness": -0.042, "money": 950, "end_money": 920, "hole": [0, 13]},
+    {"name": "AI Émile", "ai": True, "cockyness": 0.5, "money": 300, "end_money": 300, "hole": [7, 20]},
+]
+STREETS = [
+    [{"N": "Bob", "Act": "B", "Am": 20}, {"N": "AI Ava", "Act": "B", "Am": 10}, {"N": "AI Émile", "Act": "F"}],
+    [{"N": "Bob", "Act": "B", "Am": 0}, {"N": "AI Ava", "Act": "B", "Am": 200000}, {"N": "Bob", "Act": "B", "Am": 199980}],
+    [],
+    [{"N": "AI Ava", "Act": "Q"}],
+]
+
+
+def encode_example(ended=1700000000):
+    return HandHistory.encode(PLAYERS, 20, STREETS, [1, 2, 3, 4, 5], ["Bob", "AI Ava"], ["Bob"], "Straight", 400030,
+                              ended)
+
+
+def test_round_trip():
+    hand = HandHistory.decode(encode_example())
+    assert hand["ended"] == 1700000000
+    assert hand["min_bet"] == 20
+    assert hand["board"] == [1, 2, 3, 4, 5]
+    assert hand["showdown"] == [0, 1]
+    assert hand["winners"] == [0]
+    assert hand["hand_type"] == "Straight"
+    assert hand["pot"] == 400030
+    assert hand["players"] == PLAYERS
+
+    seats = {player["name"]: seat for seat, player in enumerate(PLAYERS)}
+    assert hand["streets"] == [[(seats[a["N"]], a["Act"], a.get("Am", 0)) for a in street] for street in STREETS]
+
+
+def test_writer_rotates_and_ignores_a_torn_record(tmp_path):
+    record = encode_example()
+    history = HandHistory.HandHistory(str(tmp_path), max_bytes=HandHistory.HEADER.size + 3 * len(record))
+    for _ in range(7):
+        history.record(record)
+    history.close()
+
+    files = HandHistory.log_files(str(tmp_path))
+    assert [os.path.basename(path) for path in files] == ["hands-000001.hh", "hands-000002.hh", "hands-000003.hh"]
+    assert sum(len(list(HandHistory.read_file(path))) for path in files) == 7
+
+    with open(files[-1], "ab") as file:  # As if the writer died half way through a record
+        file.write(record[:len(record) // 2])
+    assert len(list(HandHistory.read_file(files[-1]))) == 1
+
+    # A new writer starts a new file instead of appending to an old one
+    history = HandHistory.HandHistory(str(tmp_path))
+    history.record(record)
+    history.close()
+    assert os.path.basename(HandHistory.log_files(str(tmp_path))[-1]) == "hands-000004.hh"
+
+
+def test_table_history(tmp_path):
+    history = HandHistory.HandHistory(str(tmp_path))
+    table = House.Table(headless=True, fast_ais=True)
+    table.history = history
+    table.play_headless(20)
+    history.close()
+
+    hands = [hand for path in HandHistory.log_files(str(tmp_path)) for hand in HandHistory.read_file(path)]
+    assert len(hands) == 20
+    for hand in hands:
+        assert sum(p["money"] for p in hand["players"]) == sum(p["end_money"] for p in hand["players"])
+        assert len(hand["board"]) == 5
+        assert hand["winners"] and set(hand["winners"]) <= set(hand["showdown"])
+        for player in hand["players"]:
+            assert player["ai"] and len(set(player["hole"]) & set(hand["board"])) == 0
+
+
+def test_cockyness_is_from_the_start_of_the_hand(tmp_path):
+    def make_ai(min_bet, current_names):
+        ai = House.AI(min_bet, current_names)
+        ai.cockyness = -0.05  # update_win_loss puts this up to at least 0.1 after the hand
+        return ai
+
+    history = HandHistory.HandHistory(str(tmp_path))
+    table = House.Table(headless=True)
+    table.history = history
+    table.ai_factory = make_ai
+    table.play_headless(1)
+    history.close()
+
+    hand = next(HandHistory.read_file(HandHistory.log_files(str(tmp_path))[0]))
+    assert [player["cockyness"] for player in hand["players"]] == [-0.05] * 3
+
+
+@pytest.mark.parametrize("amount", [20.5, -1, "20", None])
+def test_amounts_must_be_whole_numbers(amount):
+    streets = [[{"N": "Bob", "Act": "B", "Am": amount}], [], [], []]
+    with pytest.raises(ValueError):
+        HandHistory.encode(PLAYERS, 20, streets, [1, 2, 3, 4, 5], ["Bob"], ["Bob"], "Pair", 20)
+
+
+def test_unwritable_hands_are_skipped(tmp_path, capsys):
+    history = HandHistory.HandHistory(str(tmp_path))
+    table = House.Table(headless=True)
+    table.history = history
+    players = [House.AI(), House.AI()]
+    seated = [{"name": p.name, "ai": True, "cockyness": 0, "money": 100, "hole": [0, 1]} for p in players]
+    streets = [[{"N": players[0].name, "Act": "B", "Am": 20.5}], [], [], []]
+    table.record_hand(players, seated, streets, [2, 3, 4, 5, 6], players, players[:1], "Pair", 20)
+    history.close()
+
+    assert "not written" in capsys.readouterr().out
+    assert all(list(HandHistory.read_file(path)) == [] for path in HandHistory.log_files(str(tmp_path)))
@@ -0,0 +1,34 @@
+import House
+
+
+def test_headless_tables_make_normal_ais():
+    table = House.Table(create_socket=False, headless=True)
+    assert table.ai_factory is House.AI
+    assert table.play_headless(5) == 5
+    ais = [p for p in table.player_list + table.players_to_add if isinstance(p, House.AI)]
+    assert ais
+    normal = House.AI(10, [])
+    for ai in ais:
+        assert (ai.sim_time, ai.min_sims, ai.exact) == (normal.sim_time, normal.min_sims, normal.exact)
+
+
+def test_fast_ais_are_asked_for():
+    table = House.Table(create_socket=False, headless=True, fast_ais=True)
+    assert table.play_headless(20) == 20
+    ais = [p for p in table.player_list + table.players_to_add if isinstance(p, House.AI)]
+    assert ais
+    for ai in ais:
+        assert ai.sim_time == House.FAST_SIM_TIME
+        assert ai.min_sims == House.FAST_MIN_SIMS
+        assert not ai.exact
+
+
+def test_normal_tables_make_normal_ais():
+    assert House.Table(create_socket=False).ai_factory is House.AI
+
+
+def test_after_hand_is_called_for_every_hand():
+    table = House.Table(create_socket=False, headless=True, fast_ais=True)
+    rounds = []
+    table.play_headless(4, after_hand=lambda t: rounds.append(t.rounds_played))
+    assert rounds == [1, 2, 3, 4]
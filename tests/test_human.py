@@ -0,0 +1,88 @@
+import asyncio
+import json
+import socket
+
+import pytest
+
+import Framing
+import House
+
+
+async def ask_with_late_answer():
+    a, b = socket.socketpair()
+    reader, writer = await asyncio.open_connection(sock=a)
+    player_reader, player_writer = await asyncio.open_connection(sock=b)
+    human = House.Human("Bob", reader, writer)
+    human.money = 1000
+
+    # The first question runs out of time before Bob answers it
+    assert await human.ask_bet(20, time_allowed=0.05) == {"N": "Bob", "Act": "F"}
+    asking = asyncio.ensure_future(human.ask_bet(20, time_allowed=5))
+    await asyncio.sleep(0.05)
+
+    # The answer to the first question only arrives once the second has been asked
+    player_writer.write(Framing.encode({"N": "Bob", "Act": "B", "Am": 500, "S": 1}))
+    player_writer.write(Framing.encode({"N": "Bob", "Act": "B", "Am": 30, "S": 2}))
+    res = await asking
+
+    sent = []
+    while len(sent) < 4:
+        sent.append(json.loads(await Framing.read_frame(player_reader)))
+    human.close()
+    player_writer.close()
+    return res, human.money, sent
+
+
+def test_late_answers_are_ignored():
+    res, money, sent = asyncio.run(ask_with_late_answer())
+    assert res == {"N": "Bob", "Act": "B", "Am": 30}
+    assert money == 970
+    assert [m.get("S") for m in sent if "MakeBet" in m] == [1, 2]
+    assert sent[-1] == {"Accepted": True}
+
+
+async def ask_with_a_fractional_bet():
+    a, b = socket.socketpair()
+    reader, writer = await asyncio.open_connection(sock=a)
+    player_reader, player_writer = await asyncio.open_connection(sock=b)
+    human = House.Human("Bob", reader, writer)
+    human.money = 1000
+
+    player_writer.write(Framing.encode({"N": "Bob", "Act": "B", "Am": 20.5, "S": 1}))
+    player_writer.write(Framing.encode({"N": "Bob", "Act": "B", "Am": 20, "S": 1}))
+    res = await human.ask_bet(20, time_allowed=5)
+
+    sent = []
+    while len(sent) < 4:
+        sent.append(json.loads(await asyncio.wait_for(Framing.read_frame(player_reader), 1)))
+    human.close()
+    player_writer.close()
+    return res, sent
+
+
+def test_fractional_bets_are_refused():
+    res, sent = asyncio.run(ask_with_a_fractional_bet())
+    assert res == {"N": "Bob", "Act": "B", "Am": 20}
+    assert {"Error": "Incorrect dict format"} in sent
+
+
+async def join_with_wire(wire):
+    a, b = socket.socketpair()
+    reader, writer = await asyncio.open_connection(sock=a)
+    player_reader, player_writer = await asyncio.open_connection(sock=b)
+    table = House.Table(create_socket=False)
+
+    player_writer.write(Framing.encode({"MyName": "Bob", "Wire": wire}))
+    joined = await asyncio.wait_for(table._handshake(reader, writer), 1)
+    assert json.loads(await Framing.read_frame(player_reader)) == "Send Name"
+    reply = json.loads(await Framing.read_frame(player_reader))
+    table.players_to_add[0].close()
+    player_writer.close()
+    return joined, reply
+
+
+@pytest.mark.parametrize("wire", [["binary"], {"binary": 1}, 2, None])
+def test_wires_that_arent_names_get_json(wire):
+    joined, reply = asyncio.run(join_with_wire(wire))
+    assert joined
+    assert reply == {"Accepted": True, "Wire": "json"}
@@ -0,0 +1,86 @@
+import random
+from itertools import combinations
+
+import pytest
+
+import Evaluator
+import Isomorphism
+
+
+def relabel_suits(cards, permutation):
+    return [permutation[Evaluator.SUIT_OF[c]] * 13 + Evaluator.RANK_OF[c] for c in cards]
+
+
+def test_suit_swaps_give_the_same_index():
+    rng = random.Random(2)
+    for _ in range(500):
+        board_size = rng.choice([0, 3, 4, 5])
+        cards = rng.sample(range(52), 2 + board_size)
+        hole, board = cards[:2], cards[2:]
+        permutation = rng.sample(range(4), 4)
+        swapped_board = relabel_suits(board, permutation)
+        rng.shuffle(swapped_board)
+
+        assert Isomorphism.index(hole, board) == Isomorphism.index(relabel_suits(hole, permutation), swapped_board)
+        assert Isomorphism.encode(hole, board) == Isomorphism.encode(relabel_suits(hole, permutation), swapped_board)
+
+
+def test_canonical_hand_plays_the_same():
+    rng = random.Random(3)
+    for _ in range(500):
+        cards = rng.sample(range(52), 7)
+        hole, board, _ = Isomorphism.canonicalize(cards[:2], cards[2:])
+        assert Evaluator.evaluate(hole + board) == Evaluator.evaluate(cards)
+
+
+def test_round_trips():
+    rng = random.Random(4)
+    for _ in range(200):
+        board_size = rng.choice([0, 3, 4, 5])
+        cards = rng.sample(range(52), 2 + board_size)
+        canonical = Isomorphism.canonicalize(cards[:2], cards[2:])[:2]
+
+        assert Isomorphism.decode(Isomorphism.encode(cards[:2], cards[2:])) == canonical
+        i = Isomorphism.index(cards[:2], cards[2:])
+        assert 0 <= i < Isomorphism.index_size(board_size)
+        assert tuple(Isomorphism.unindex(i, board_size)) == canonical
+
+        i = rng.randrange(Isomorphism.index_size(board_size))
+        assert Isomorphism.index(*Isomorphism.unindex(i, board_size)) == i
+
+
+def test_takes_faces():
+    assert Isomorphism.encode(["AH", "KH"], ["2H", "7C", "9D"]) == Isomorphism.encode(["AS", "KS"], ["2S", "7D", "9C"])
+
+
+def test_index_is_dense_preflop():
+    keys = {Isomorphism.encode(hole) for hole in combinations(range(52), 2)}
+    indexes = {Isomorphism.index(hole) for hole in combinations(range(52), 2)}
+    assert Isomorphism.index_size(0) == len(keys) == 169
+    assert indexes == set(range(169))
+
+
+def test_index_is_dense_on_the_flop():
+    np = pytest.importorskip("numpy")
+
+    # Every hand is the same up to suits as one with canonical hole cards, so only those need to be looked at. Two
+    # hands are the same up to suits when the sorted (hole values, board values) of their suits are the same
+    holes = sorted({tuple(Isomorphism.canonicalize(hole)[0]) for hole in combinations(range(52), 2)})
+    boards = np.array(list(combinations(range(52), 3)), dtype=np.int64)
+    suits, bits = boards // 13, 1 << (boards % 13)
+    board_masks = np.stack([np.where(suits == suit, bits, 0).sum(axis=1) for suit in range(4)], axis=1)
+
+    configs = []
+    for hole in holes:
+        live = ~np.isin(boards, hole).any(axis=1)
+        hole_masks = np.zeros(4, dtype=np.int64)
+        for c in hole:
+            hole_masks[c // 13] |= 1 << (c % 13)
+        configs.append(np.sort(hole_masks << 13 | board_masks[live], axis=1))
+
+    configs = np.concatenate(configs)  # Each config is below 2 ** 26, so two fit in an int64
+    high, low = configs[:, 0] << 26 | configs[:, 1], configs[:, 2] << 26 | configs[:, 3]
+    order = np.lexsort((low, high))
+    high, low = high[order], low[order]
+    classes = 1 + int(((high[1:] != high[:-1]) | (low[1:] != low[:-1])).sum())
+    assert Isomorphism.index_size(3) == classes == 1286792
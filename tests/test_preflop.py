@@ -0,0 +1,23 @@
+import Preflop
+
+
+def test_truncated_tables_are_not_used(tmp_path):
+    path = str(tmp_path / "preflop.bin")
+    Preflop.PreflopTable.create(path, max_opponents=2)
+    table = Preflop.PreflopTable(path, writable=True)
+    table.save(Preflop.hand_class([12, 25]), 1, 0.85, 0.01, 1000)
+    table.flush()
+    table.close()
+
+    table = Preflop.PreflopTable.open(path)
+    win, draw, sim_count = table.lookup([12, 25], 1)
+    assert (round(win, 2), round(draw, 2), sim_count) == (0.85, 0.01, 1000)
+    assert table.lookup([12, 25], 2) is None
+    table.close()
+
+    with open(path, "rb") as f:
+        data = f.read()
+    for size in (0, Preflop.HEADER.size - 1, Preflop.HEADER.size, len(data) - 1):
+        with open(path, "wb") as f:
+            f.write(data[:size])
+        assert Preflop.PreflopTable.open(path) is None
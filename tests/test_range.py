@@ -0,0 +1,50 @@
+import pytest
+
+import Evaluator
+import Range
+
+
+def faces(text):
+    return [Evaluator.card_id(face) for face in text.split()]
+
+
+def test_parse_sizes():
+    sizes = {"AA": 6, "QQ+": 18, "22-55": 24, "AK": 16, "AKs": 4, "AKo": 12, "A2s+": 48, "KTo-K7o": 48,
+             "AHKH": 1, "ahkh": 1, "any": 1326, "QQ+, AKs, KQo": 34, "AKo:0.5": 6, "KA": 16, "55-22": 24}
+    for text, size in sizes.items():
+        assert Range.size(Range.parse(text)) == size, text
+
+
+@pytest.mark.parametrize("text", ["QQs", "AK-QJ", "XX", "AHAH", "AK:2", "AK:x", "AKs-AQo"])
+def test_parse_errors(text):
+    with pytest.raises(ValueError):
+        Range.parse(text)
+
+
+def test_river_is_exact():
+    # The flush beats every hand in the range. AH and 2H are used, so the combos with them are left out
+    board = faces("2H 7H 9H JC 3S")
+    win, draw, boards = Range.hand_equity(faces("AH KH"), Range.parse("AA, 22"), board)
+    assert (win, draw, boards) == (1.0, 0.0, 1)
+
+
+def test_numpy_and_python_agree():
+    mine, theirs = Range.parse("QQ+, AKs, 76s"), Range.parse("KQo, 22-55, AHJD")
+    boards = Range._boards(faces("2H 7C KD"), 0, None)
+    python = Range._counts_python(mine, theirs, boards)
+    if Range.np is not None:
+        numpy = Range._counts_numpy(mine, theirs, boards)
+        assert all(abs(a - b) < 1e-6 for a, b in zip(numpy, python))
+    assert python[2] > 0
+
+
+def test_preflop():
+    win, draw, _ = Range.equity(Range.parse("AA"), Range.parse("KK"), samples=3000, seed=1)
+    assert abs(win + draw / 2 - 0.82) < 0.03
+    win, draw, _ = Range.equity(Range.parse("any"), Range.parse("any"), samples=200, seed=1)
+    assert abs(win + draw / 2 - 0.5) < 1e-9
+
+
+def test_ranges_that_cant_be_dealt():
+    with pytest.raises(ValueError):  # Both players would be dealt the same cards
+        Range.hand_equity(faces("AH KH"), Range.parse("AHKH"))
@@ -0,0 +1,37 @@
+import time
+
+import EquityCache
+import Speculation
+
+HAND_A = ([0, 13], [26, 39, 1])
+HAND_B = ([2, 15], [28, 41, 5])
+
+
+def cached(hand):
+    return EquityCache.CACHE.peek(hand[0], hand[1], 2)
+
+
+def wait_for(condition, timeout=5):
+    """Checks condition until it is true, or until timeout seconds have passed. Returns whether it became true"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_pausing_a_table_only_stops_its_own_jobs():
+    EquityCache.CACHE.clear()
+    speculator = Speculation.Speculator(sim_time=0.1)
+    table_a, table_b = object(), object()
+    try:
+        with speculator.paused(table_a):
+            speculator.start(table_a, [HAND_A], [2])
+            speculator.start(table_b, [HAND_B], [2])
+            assert wait_for(lambda: cached(HAND_B))
+            assert not cached(HAND_A)
+
+        assert wait_for(lambda: cached(HAND_A))
+    finally:
+        speculator.shutdown()
@@ -0,0 +1,79 @@
+import pytest
+
+import Wire
+
+SUMMARY = [3, [["Bob", "Human", 1000], ["AI Ava", "AI", 950], ["Sue", "Human", 0]]]
+MESSAGES = [
+    SUMMARY,
+    {"Start Round": SUMMARY},
+    ["AHKD", ["Bob", "AI Ava"], 20],
+    {"N": "AI Ava", "Act": "B", "Am": 40},
+    {"N": "Bob", "Act": "B", "Am": 0},
+    {"N": "Sue", "Act": "F"},
+    {"N": "Sue", "Act": "Q"},
+    {"N": "Bob", "Act": "B", "Am": 20, "S": 65535},
+    {"N": "Bob", "Act": "F", "S": 3},
+    {"N": "Bob", "MakeBet": 20, "yMoney": 1000, "T": 12.5, "S": 3},
+    {"Clock": ["Sue", 74.9]},
+    {"cards": "2C3D4H"},
+    {"cards": "2C3D4H5S6S"},
+    {"Accepted": True},
+    {"Error": "Not your turn"},
+    {"EndRound": [{"Bob": "AHKD", "AI Ava": "2C2D"}, 120, ["Bob"], "RoyalF", "QHJHTH3C4C"]},
+    {"NoMoney": ""},
+    {"Something": ["new", 1]},  # No binary form, so it goes as JSON
+    "Send Name",
+]
+
+
+def test_binary_round_trip():
+    sender, receiver = Wire.BinaryCodec(), Wire.BinaryCodec()
+    for message in MESSAGES:
+        data = sender.encode(message)
+        assert receiver.decode(data) == message
+
+
+def test_binary_is_smaller():
+    sender = Wire.BinaryCodec()
+    sender.encode(SUMMARY)
+    for message in MESSAGES[2:-2]:
+        assert len(sender.encode(message)) < len(Wire.JsonCodec.encode(message))
+
+
+def test_unknown_players_fall_back_to_json():
+    message = {"N": "Nobody", "Act": "F"}
+    data = Wire.BinaryCodec().encode(message)
+    assert data[0] == Wire.JSON
+    assert Wire.BinaryCodec().decode(data) == message
+
+
+def test_json_round_trip():
+    for message in MESSAGES:
+        assert Wire.JsonCodec.decode(Wire.JsonCodec.encode(message)) == message
+
+
+def test_pack_cards():
+    for faces in ["", "AH", "2S3S", "AHKHQHJHTH", "9C8D7H6S5C4D3H"]:
+        assert Wire.unpack_cards(Wire.pack_cards(faces)) == (faces, len(Wire.pack_cards(faces)))
+
+
+@pytest.mark.parametrize("data", [b"", bytes([Wire.ACTION, 9]), bytes([200])])
+def test_bad_data(data):
+    with pytest.raises(ValueError):
+        Wire.BinaryCodec().decode(data)
+
+
+def test_make_codec():
+    assert isinstance(Wire.make_codec("binary"), Wire.BinaryCodec)
+    assert isinstance(Wire.make_codec("morse"), Wire.JsonCodec)
+
+
+def test_times_are_the_same_in_both_encodings():
+    for seconds in [0, 0.04, 0.05, 0.15, 1.05, 14.999, 29.95, 74.95, 6553.5]:
+        ask = {"N": "Bob", "MakeBet": 20, "yMoney": 1000, "T": Wire.tenths(seconds), "S": 1}
+        clock = {"Clock": ["Sue", Wire.tenths(seconds)]}
+        sender, receiver = Wire.BinaryCodec(), Wire.BinaryCodec()
+        receiver.decode(sender.encode(SUMMARY))
+        for message in (ask, clock):
+            assert receiver.decode(sender.encode(message)) == Wire.JsonCodec.decode(Wire.JsonCodec.encode(message))
+    assert Wire.tenths(29.95) == 30.0